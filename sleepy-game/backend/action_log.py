@@ -0,0 +1,87 @@
+# sleepy-game/backend/action_log.py
+import collections
+import itertools
+
+# How many recent entries stay in game_state["action_log"] (and so in views and updates)
+ACTION_LOG_CAPACITY = 50
+
+class ActionHistoryStore:
+    """
+    Append-only per-room archive for log entries that have rotated out of an ActionLog.
+    `first` is the game-log offset of its first entry: 0 for a new game, later for a
+    room restored from the store, whose older entries were not saved.
+    """
+
+    def __init__(self, first=0):
+        self.first = first
+        self.entries = []
+
+    def append(self, entry):
+        self.entries.append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def page(self, offset, limit):
+        start = max(offset - self.first, 0)
+        return self.entries[start:offset - self.first + limit]
+
+class ActionLog:
+    """
+    Ring buffer holding the last `capacity` log entries. It supports the list
+    operations the game code uses (append, len, indexing, iteration) and counts every
+    entry ever appended in `total`, so updates can send just the entries added since
+    a given total. When an entry is pushed out it is handed to the spill store.
+    """
+    __slots__ = ("entries", "total", "spill")
+
+    def __init__(self, entries=(), capacity=ACTION_LOG_CAPACITY, total=None, spill=None):
+        self.entries = collections.deque(entries, maxlen=capacity)
+        self.total = len(self.entries) if total is None else total
+        self.spill = spill
+
+    def append(self, entry):
+        if len(self.entries) == self.entries.maxlen and self.spill is not None:
+            self.spill.append(self.entries[0])
+        self.entries.append(entry)
+        self.total += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self.entries)[index]
+        return self.entries[index]
+
+    def to_list(self):
+        return list(self.entries)
+
+    def since(self, total):
+        # Entries appended after the log had `total` entries (only as far back as the buffer reaches)
+        count = min(self.total - total, len(self.entries))
+        if count <= 0:
+            return []
+        return list(itertools.islice(self.entries, len(self.entries) - count, None))
+
+    def page(self, offset, limit):
+        """
+        Reads entries [offset, offset + limit) of the whole game's log, from the spill
+        store for old entries and from the buffer for recent ones. Entries older than
+        anything kept are skipped, never shifted: returns (offset of the first entry
+        returned, entries).
+        """
+        first_buffered = self.total - len(self.entries)
+        first_kept = min(self.spill.first, first_buffered) if self.spill is not None else first_buffered
+        stop = offset + limit
+        offset = max(offset, first_kept)
+        result = []
+        if offset < min(stop, first_buffered):
+            result = self.spill.page(offset, min(stop, first_buffered) - offset)
+        start = max(offset, first_buffered) - first_buffered
+        if stop - first_buffered > start:
+            result += list(itertools.islice(self.entries, start, stop - first_buffered))
+        return offset, result
@@ -3,16 +3,41 @@ from flask import Flask, jsonify, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS # Import CORS
 
-import random
+import atexit
+import collections
+import functools
+import hmac
+import logging
+import os
+import time
 import game_logic as gm_lg
-from game_logic import initialize_game, apply_card_effect, check_win_condition, get_game_state_for_player, end_turn, apply_pending_action
+from game_logic import check_win_condition
 import bot_ai # Import the bot_ai module
+import catalog
+import search_bot
+from bot_pool import BotWorkerPool, BotPoolUnavailable, BOT_TIERS
+from bot_scheduler import BotScheduler, DEFAULT_BOT_THINK_TIME, MAX_BOT_THINK_TIME
+import state_sync
+from action_log import ActionHistoryStore
+from room_mailbox import RoomMailboxes, check_revision
+from matchmaking import MatchmakingQueue
+from room_lifecycle import RoomReaper, SidIndex, new_resume_token, RESUME_GRACE_SECONDS, RESUME_HISTORY
+from spectators import SpectatorFeed, spectator_channel
+import fanout
+import game_record
+import metrics
+import room_store
+import sharding
 
 import eventlet 
 import eventlet.wsgi
+import logging_setup
 
 eventlet.monkey_patch() 
 
+logging_setup.configure_logging()
+logger = logging.getLogger("app")
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'a_very_secret_key_for_sleepy_game_development_only' 
 
@@ -21,44 +46,306 @@ CORS(app, resources={r"/*": {"origins": ["http://localhost:3000"]}})
 
 socketio = SocketIO(
     app, 
-    logger=True, 
-    engineio_logger=True, 
+    logger=logging_setup.env_flag('SOCKETIO_LOGGER'), # Protocol-level logging is very chatty; opt in when debugging
+    engineio_logger=logging_setup.env_flag('SOCKETIO_LOGGER'), 
     ping_interval=25, 
     ping_timeout=60,
-    cors_allowed_origins=["http://localhost:3000"] # This is for Socket.IO connections
+    json=fanout, # Lets per-player payloads reuse the JSON of their shared parts
+    cors_allowed_origins=["http://localhost:3000"], # This is for Socket.IO connections
+    **sharding.message_queue_options() # Cross-worker emits when SOCKETIO_MESSAGE_QUEUE is set
 )
 
 game_rooms = {}
-next_room_id = 1000
+room_ids = sharding.allocator_from_env() # Room ids encode the worker (shard) that owns them
+room_repository = room_store.create_room_store() # Rooms survive restarts unless ROOM_STORE=none
+room_mailboxes = RoomMailboxes() # One action at a time per room; see room_action
+player_sids_index = SidIndex() # sid -> (room_id, player_id) of connected human players
+spectator_rooms = {} # sid -> room_id of connected spectators
 
 @app.route('/')
 def home():
     return "Welcome to Sleepy Game Backend!"
 
+@app.route('/metrics')
+def get_metrics():
+    # Prometheus text format; METRICS=0 turns instrumentation off
+    if not metrics.ENABLED:
+        return "Metrics are disabled (METRICS=0).\n", 404, {'Content-Type': 'text/plain'}
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/catalog')
+def get_catalog():
+    # Static card and character data that game payloads refer to by id; clients revalidate with the ETag
+    headers = {'ETag': catalog.CATALOG_ETAG, 'Cache-Control': 'no-cache'}
+    if catalog.CATALOG_ETAG in request.headers.get('If-None-Match', ''):
+        return '', 304, headers
+    return catalog.CATALOG_JSON, 200, dict(headers, **{'Content-Type': 'application/json'})
+
+@app.route('/matchmaking')
+def get_matchmaking_stats():
+    # Queue depth per game size and how long recently matched players waited, in seconds
+    return jsonify({
+        'queue_depth': {total: matchmaker.depth(total) for total in matchmaker.buckets},
+        'wait_seconds': {f'p{round(q * 100)}': wait for q, wait in matchmaker.wait_percentiles().items()},
+        'players_matched': matchmaker.matched
+    })
+
+@app.route('/rooms/<room_id>/record')
+def get_game_record(room_id):
+    # Binary game record of a finished game (see game_record.py); `python game_record.py export` reads it
+    room_data = game_rooms.get(room_id)
+    record = room_data and room_data['game_state'] and room_data['game_state'].get('record')
+    if not record:
+        return jsonify({'message': 'Room not found.'}), 404
+    if 'finished_at' not in room_data:
+        # Set (and the record closed) when the win is broadcast. The seed and moves of a live game
+        # give away every hidden hand and every draw still to come
+        return jsonify({'message': 'The game is still in progress.'}), 403
+    return record.to_bytes(), 200, {'Content-Type': 'application/octet-stream',
+                                    'Content-Disposition': f'attachment; filename="room{room_id}-{record.seed:016x}.sgr"'}
+
+@app.route('/rooms/<room_id>/action_log')
+def get_action_log_page(room_id):
+    # Full game history, paged; game_update only carries the latest entries
+    room_data = game_rooms.get(room_id)
+    if not room_data or not room_data['game_state']:
+        return jsonify({'message': 'Room not found.'}), 404
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    action_log = room_data['game_state']['action_log']
+    offset, entries = action_log.page(offset, limit) # Later than asked when the oldest entries are gone (restored rooms)
+    return jsonify({
+        'room_id': room_id,
+        'offset': offset,
+        'entries': entries,
+        'total': action_log.total
+    })
+
 @socketio.on('connect')
+@metrics.timed(metrics.HANDLER_SECONDS, 'connect')
 def handle_connect():
-    print(f'Client connected: {request.sid}')
+    logger.debug("Client connected: %s", request.sid)
 
 @socketio.on('disconnect')
+@metrics.timed(metrics.HANDLER_SECONDS, 'disconnect')
 def handle_disconnect():
-    print(f'Client disconnected: {request.sid}')
-    for room_id, room_data in list(game_rooms.items()): 
-        human_player_sids = [p_data['sid'] for p_id, p_data in room_data.get('player_sids', {}).items() if not p_data.get('is_bot', False)]
-        
-        if request.sid in human_player_sids:
+    logger.debug("Client disconnected: %s", request.sid)
+    if request.sid in spectator_rooms:
+        stop_spectating(request.sid)
+        return
+    if matchmaker.cancel(request.sid):
+        return
+    seat = player_sids_index.pop(request.sid)
+    if not seat:
+        return
+    room_id, player_id = seat
+    with room_mailboxes.turn(room_id):
+        room_data = game_rooms.get(room_id)
+        if not room_data:
+            return
+        if room_data['waiting_for_players']:
             socketio.emit('player_disconnected', {'message': f'Player {request.sid} disconnected'}, room=room_id)
-            if room_id in game_rooms:
-                del game_rooms[room_id]
-            print(f"Room {room_id} disbanded due to a player disconnect.")
-            break 
+            close_room(room_id, 'lobby_disconnect')
+            logger.info("Room %s disbanded due to a player disconnect.", room_id, extra={'room_id': room_id, 'action': 'disconnect'})
+            return
+        hold_seat(room_id, room_data, player_id)
+        player_name = room_data['game_state']['players'][player_id]['player_name']
+        socketio.emit('player_disconnected', {
+            'message': f'{player_name} lost connection. Holding their seat for {RESUME_GRACE_SECONDS} seconds.',
+            'player_id': player_id,
+            'grace_seconds': RESUME_GRACE_SECONDS
+        }, room=room_id)
+        logger.info("Holding seat %s in room %s for %s s.", player_id, room_id, RESUME_GRACE_SECONDS,
+                    extra={'room_id': room_id, 'player_id': player_id, 'action': 'disconnect'})
+
+def hold_seat(room_id, room_data, player_id):
+    """Keeps a disconnected player's seat for RESUME_GRACE_SECONDS; resume_session reclaims it."""
+    p_data = room_data['player_sids'][player_id]
+    if p_data['sid'] in room_data['human_player_sids']:
+        room_data['human_player_sids'].remove(p_data['sid'])
+    p_data['sid'] = None
+    p_data['disconnected_at'] = disconnected_at = time.monotonic()
+    eventlet.spawn_after(RESUME_GRACE_SECONDS, expire_seat, room_id, player_id, disconnected_at)
+
+def expire_seat(room_id, player_id, disconnected_at):
+    with room_mailboxes.turn(room_id):
+        room_data = game_rooms.get(room_id)
+        p_data = room_data and room_data['player_sids'].get(player_id)
+        if not p_data or p_data.get('disconnected_at') != disconnected_at:
+            return # Resumed in time (or the room is gone)
+
+        if not room_data['human_player_sids']:
+            close_room(room_id, 'abandoned')
+            logger.info("Room %s closed: nobody came back.", room_id, extra={'room_id': room_id, 'player_id': player_id, 'action': 'seat_expired'})
+            return
+        if 'finished_at' in room_data or check_win_condition(room_data['game_state'])['game_over']:
+            return # The reaper closes finished rooms
+
+        # Others are still playing: a bot takes the seat over
+        game_state = room_data['game_state']
+        p_data.update({'is_bot': True, 'token': None})
+        del p_data['disconnected_at']
+        gm_lg.hand_seat_to_bot(game_state, player_id)
+        room_repository.save_players(room_id, room_data)
+        if game_state.get('pending_attack') and game_state['pending_attack']['target_player_id'] == player_id:
+            room_data['game_state'] = game_state = bot_ai.make_bot_move(game_state, player_id) # Answers the attack it was left with
+        broadcast_game_update(room_id, check_win_condition(game_state))
+        logger.info("Bot took over seat %s in room %s.", player_id, room_id, extra={'room_id': room_id, 'player_id': player_id, 'action': 'seat_expired'})
+
+        if game_state['players'][game_state['current_turn']].get('is_bot') and not game_state.get('pending_attack'):
+            schedule_bot_move(room_id)
+
+@socketio.on('resume_session')
+@metrics.timed(metrics.HANDLER_SECONDS, 'resume_session')
+def handle_resume_session(data):
+    room_id = data.get('room_id')
+    player_id = data.get('player_id')
+    token = data.get('token')
+
+    if room_id not in game_rooms and not room_ids.owns(room_id) and room_ids.shard_of(room_id) is not None:
+        return emit('resume_failed', {'message': 'Room is hosted on another server.', 'room_id': room_id, 'shard': room_ids.shard_of(room_id)})
+
+    with room_mailboxes.turn(room_id):
+        room_data = game_rooms.get(room_id)
+        p_data = room_data and room_data['player_sids'].get(player_id)
+        if not p_data or p_data['is_bot'] or not p_data.get('token') or not isinstance(token, str) or not hmac.compare_digest(p_data['token'], token):
+            logger.info("Resume refused for %s in room %s.", player_id, room_id, extra={'room_id': room_id, 'player_id': player_id, 'action': 'resume_session'})
+            return emit('resume_failed', {'message': 'This game session has expired.', 'room_id': room_id})
+
+        if p_data['sid'] and p_data['sid'] != request.sid:
+            # Resuming before the server noticed the old socket drop; the old one no longer counts
+            player_sids_index.pop(p_data['sid'])
+            room_data['human_player_sids'].remove(p_data['sid'])
+        if request.sid not in room_data['human_player_sids']:
+            room_data['human_player_sids'].append(request.sid)
+        p_data['sid'] = request.sid
+        p_data.pop('disconnected_at', None)
+        player_sids_index.add(request.sid, room_id, player_id)
+        join_room(room_id)
+
+        emit('session_resumed', {'room_id': room_id, 'player_id': player_id})
+        send_catch_up(room_data, player_id, data.get('revision'))
+        game_state = room_data['game_state']
+        socketio.emit('player_reconnected', {'player_id': player_id, 'message': f"{game_state['players'][player_id]['player_name']} is back."}, room=room_id, skip_sid=request.sid)
+        logger.info("Player %s resumed in room %s from revision %s (server revision %s).", player_id, room_id, data.get('revision'), game_state['revision'],
+                    extra={'room_id': room_id, 'player_id': player_id, 'action': 'resume_session'})
+
+def send_catch_up(room_data, player_id, client_revision):
+    """
+    Brings a resuming player from the revision they last saw to the current one: a
+    normal game_update delta when that revision is among the recent snapshots, the
+    full view otherwise.
+    """
+    game_state = room_data['game_state']
+    base_snapshot = next((snapshot for snapshot in room_data['recent_snapshots'] if snapshot['revision'] == client_revision), None)
+    win_status = check_win_condition(game_state)
+    if base_snapshot is None:
+        return emit('game_resync', {
+            'player_id': player_id,
+            'game_state': catalog.encode_view(gm_lg.get_game_state_for_player(game_state, player_id)),
+            'win_status': win_status
+        }, room=request.sid)
+    hand = state_sync.build_hand_deltas(base_snapshot, game_state).get(player_id)
+    emit('game_update', {
+        'player_id': player_id,
+        'revision': game_state['revision'],
+        'base_revision': base_snapshot['revision'],
+        'delta': catalog.encode_delta(state_sync.build_public_delta(base_snapshot, game_state)),
+        'hand': hand and catalog.encode_hand(hand),
+        'win_status': win_status
+    }, room=request.sid)
+
+ROOMS_CLOSED = metrics.Counter('sleepy_rooms_closed_total', 'Rooms removed, by reason.', ('reason',))
+
+def close_room(room_id, reason):
+    """Drops a room and everything kept for it. The caller holds the room's mailbox."""
+    room_data = game_rooms.pop(room_id, None)
+    if room_data is None:
+        return
+    ROOMS_CLOSED.inc(reason)
+    save_game_record(room_id, room_data)
+    player_sids_index.remove_room(room_id, room_data)
+    bot_moves.cancel(room_id)
+    room_repository.delete_room(room_id)
+    socketio.close_room(room_id)
+    feed = room_data.get('spectator_feed')
+    if feed:
+        socketio.emit('room_closed', {'room_id': room_id, 'reason': reason}, room=spectator_channel(room_id))
+        for sid in feed.watchers:
+            spectator_rooms.pop(sid, None)
+        spectator_frames.cancel(room_id)
+        socketio.close_room(spectator_channel(room_id))
+
+def save_game_record(room_id, room_data):
+    record = room_data['game_state'] and room_data['game_state'].get('record')
+    if record is None or not record.actions:
+        return
+    try:
+        path = game_record.write_record(room_id, record)
+    except OSError:
+        logger.exception("Could not save the game record of room %s.", room_id, extra={'room_id': room_id, 'action': 'close_room'})
+        return
+    if path:
+        logger.info("Game record of room %s saved to %s.", room_id, path, extra={'room_id': room_id, 'action': 'close_room'})
 
+def evict_room(room_id, reason):
+    # Called by room_reaper; a room busy with an action is left for the next sweep
+    if not room_mailboxes.enter(room_id, blocking=False):
+        return False
+    try:
+        if room_id in game_rooms:
+            socketio.emit('room_closed', {'room_id': room_id, 'reason': reason}, room=room_id)
+            close_room(room_id, reason)
+            logger.info("Room %s closed (%s).", room_id, reason, extra={'room_id': room_id, 'action': 'evict'})
+    finally:
+        room_mailboxes.leave(room_id)
+    return True
+
+room_reaper = RoomReaper(game_rooms, evict_room) # Closes finished and abandoned rooms on a timer
+
+def eventlet_hub_stats():
+    hub = eventlet.hubs.get_hub()
+    return {'timers': hub.get_timers_count(), 'readers': len(hub.get_readers()), 'writers': len(hub.get_writers())}
+
+# Read on every /metrics scrape
+metrics.Gauge('sleepy_rooms_active', 'Rooms in memory on this worker.', lambda: len(game_rooms))
+metrics.Gauge('sleepy_rooms_waiting_for_players', 'Rooms still in the lobby.', lambda: sum(room_data['waiting_for_players'] for room_data in list(game_rooms.values())))
+metrics.Gauge('sleepy_players_connected', 'Human players with a connected socket.', lambda: len(player_sids_index))
+metrics.Gauge('sleepy_spectators_connected', 'Sockets watching a room as spectators.', lambda: len(spectator_rooms))
+metrics.Gauge('sleepy_room_mailboxes_busy', 'Rooms with an action in progress.', lambda: len(room_mailboxes.rooms))
+metrics.Gauge('sleepy_eventlet_hub_timers', 'Scheduled eventlet timers, sleeping green threads included.', lambda: eventlet_hub_stats()['timers'])
+metrics.Gauge('sleepy_eventlet_hub_readers', 'File descriptors the eventlet hub waits to read.', lambda: eventlet_hub_stats()['readers'])
+metrics.Gauge('sleepy_eventlet_hub_writers', 'File descriptors the eventlet hub waits to write.', lambda: eventlet_hub_stats()['writers'])
+
+
+def get_bot_think_time(data):
+    # Seconds each bot waits before moving; 0 makes bots answer immediately (useful for tests)
+    try:
+        think_time = float(data.get('bot_think_time', DEFAULT_BOT_THINK_TIME))
+    except (TypeError, ValueError):
+        think_time = DEFAULT_BOT_THINK_TIME
+    return max(0.0, min(MAX_BOT_THINK_TIME, think_time))
+
+def get_bot_search_ms(data):
+    # Per-move thinking budget of the 'search' tier; capped, as it holds the room (and the event loop too without a bot pool)
+    try:
+        budget_ms = int(data.get('bot_search_ms', search_bot.DEFAULT_SEARCH_BUDGET_MS))
+    except (TypeError, ValueError):
+        budget_ms = search_bot.DEFAULT_SEARCH_BUDGET_MS
+    return max(1, min(search_bot.MAX_SEARCH_BUDGET_MS, budget_ms))
+
+BOT_RETRY_DELAY = 0.01 # Seconds; when a bot's room is busy with a player's action
+
+bot_pool = BotWorkerPool() # Bot turns are computed in worker processes, off the event loop
+BOT_POOL_FALLBACKS = metrics.Counter('sleepy_bot_pool_fallbacks_total', 'Bot turns played by the greedy bot on the event loop because the pool could not answer.', ('reason',))
+metrics.Gauge('sleepy_bot_pool_busy', 'Bot workers computing a turn.', lambda: bot_pool.busy)
+metrics.Gauge('sleepy_bot_pool_queue_depth', 'Bot turns waiting for a free worker.', lambda: bot_pool.waiting)
+POOLED_BOT_TIERS = ('search',) # A greedy turn costs less than shipping the state to a worker
 
 @socketio.on('create_room')
+@metrics.timed(metrics.HANDLER_SECONDS, 'create_room')
 def create_room(data):
-    global next_room_id
-    room_id = str(next_room_id)
-    next_room_id += 1
-    
     total_players = data.get('total_players', 2)
     num_bots = data.get('num_bots', 0)
     num_human_players_needed = total_players - num_bots
@@ -67,74 +354,148 @@ def create_room(data):
         emit('join_error', {'message': 'Invalid configuration: At least one human player is required.'})
         return
 
-    game_rooms[room_id] = {
-        'total_players': total_players,
-        'num_bots': num_bots,
-        'human_player_sids': [], # SIDs of connected human players
-        'player_sids': {}, # Map player_id to sid (e.g., {'player1': {'sid': 'xyz', 'is_bot': False}, 'bot1': {'sid': None, 'is_bot': True}})
-        'game_state': None,
-        'turn': 'player1', # Initial turn holder
-        'waiting_for_players': True
-    }
+    if matchmaker.cancel(request.sid): # A seat here replaces a match still being looked for
+        emit('left_queue', {})
+    room_id = new_room(total_players, num_bots, data)
     
     # Assign first human player as player1
     player_id_counter = 1
-    game_rooms[room_id]['player_sids'][f'player{player_id_counter}'] = {'sid': request.sid, 'is_bot': False}
-    game_rooms[room_id]['human_player_sids'].append(request.sid)
-    join_room(room_id)
+    seat_human(room_id, request.sid, f'player{player_id_counter}')
     
     emit('room_created', {'room_id': room_id, 'player_id': f'player{player_id_counter}', 'players_needed': num_human_players_needed - len(game_rooms[room_id]['human_player_sids'])})
-    print(f'Room {room_id} created by {request.sid} as Player {player_id_counter}. Total players: {total_players}, Bots: {num_bots}')
+    logger.info("Room %s created by %s as Player %s. Total players: %s, Bots: %s", room_id, request.sid, player_id_counter, total_players, num_bots,
+                extra={'room_id': room_id, 'player_id': f'player{player_id_counter}', 'action': 'create_room'})
 
     # If all human players are already accounted for (e.g., 1 human, 1 bot game started by 1 human)
     if len(game_rooms[room_id]['human_player_sids']) == num_human_players_needed:
         start_multiplayer_game(room_id)
 
+def new_room(total_players, num_bots, settings):
+    room_id = room_ids.allocate()
+    game_rooms[room_id] = {
+        'total_players': total_players,
+        'num_bots': num_bots,
+        'human_player_sids': [], # SIDs of connected human players
+        'player_sids': {}, # Map player_id to sid (e.g., {'player1': {'sid': 'xyz', 'is_bot': False}, 'bot1': {'sid': None, 'is_bot': True}})
+        'game_state': None,
+        'turn': 'player1', # Initial turn holder
+        'waiting_for_players': True,
+        'last_activity': time.monotonic(), # Read by room_reaper
+        'bot_think_time': get_bot_think_time(settings),
+        'bot_tier': settings.get('bot_tier') if settings.get('bot_tier') in BOT_TIERS else 'greedy',
+        'bot_search_ms': get_bot_search_ms(settings)
+    }
+    room_reaper.start()
+    return room_id
+
+def seat_human(room_id, sid, player_id):
+    room_data = game_rooms[room_id]
+    room_data['player_sids'][player_id] = {'sid': sid, 'is_bot': False, 'token': new_resume_token()}
+    room_data['human_player_sids'].append(sid)
+    player_sids_index.add(sid, room_id, player_id)
+    socketio.server.enter_room(sid, room_id, namespace='/') # join_room for a socket other than the current request's
+
 @socketio.on('join_room')
+@metrics.timed(metrics.HANDLER_SECONDS, 'join_room')
 def join_game_room(data):
     room_id = data.get('room_id')
     client_sid = request.sid 
 
     room_data = game_rooms.get(room_id)
 
-    if not room_data:
-        emit('join_error', {'message': 'Room not found.'})
-        print(f'Join failed for {client_sid} on room {room_id}: Room not found.')
-        return
-    
-    num_human_players_needed = room_data['total_players'] - room_data['num_bots']
-    
-    if len(room_data['human_player_sids']) >= num_human_players_needed:
-        emit('join_error', {'message': 'Room is full or game has started.'})
-        print(f'Join failed for {client_sid} on room {room_id}: Room full.')
-        return
-    
-    if client_sid in room_data['human_player_sids']:
-        emit('join_error', {'message': 'You are already in this room.'})
-        print(f'Join failed for {client_sid} on room {room_id}: Already in room.')
+    if not room_data and not room_ids.owns(room_id) and room_ids.shard_of(room_id) is not None:
+        # The proxy routed this socket to the wrong worker; the client reconnects to the owner and retries
+        emit('join_error', {'message': 'Room is hosted on another server.', 'room_id': room_id, 'shard': room_ids.shard_of(room_id)})
+        logger.info("Join for room %s sent to shard %s; it belongs to shard %s.", room_id, room_ids.shard_id, room_ids.shard_of(room_id),
+                    extra={'room_id': room_id, 'action': 'join_room'})
         return
 
-    # Assign next available player ID
-    player_id_counter = 1
-    while f'player{player_id_counter}' in room_data['player_sids']:
-        player_id_counter += 1
-    
-    assigned_player_id = f'player{player_id_counter}'
-    room_data['player_sids'][assigned_player_id] = {'sid': client_sid, 'is_bot': False}
-    room_data['human_player_sids'].append(client_sid)
-    join_room(room_id)
-    
-    emit('room_joined', {'room_id': room_id, 'player_id': assigned_player_id}, room=client_sid)
-    print(f'Player {client_sid} joined room {room_id} as {assigned_player_id}.')
-
-    if len(room_data['human_player_sids']) == num_human_players_needed:
-        start_multiplayer_game(room_id)
-    else:
-        socketio.emit('room_created', {'room_id': room_id, 'players_needed': num_human_players_needed - len(room_data['human_player_sids'])}, room=room_id) # Update other players in lobby
+    with room_mailboxes.turn(room_id):
+        room_data = game_rooms.get(room_id) # Re-read: the room may have closed or started while we waited
+        if not room_data:
+            emit('join_error', {'message': 'Room not found.'})
+            logger.info("Join failed for %s on room %s: Room not found.", client_sid, room_id, extra={'room_id': room_id, 'action': 'join_room'})
+            return
+
+        num_human_players_needed = room_data['total_players'] - room_data['num_bots']
+
+        # A started game keeps its seats; disconnected players get theirs back with resume_session, not strangers
+        if not room_data['waiting_for_players'] or room_data['game_state'] is not None or len(room_data['human_player_sids']) >= num_human_players_needed:
+            emit('join_error', {'message': 'Room is full or game has started.', 'room_id': room_id, 'can_spectate': room_data['game_state'] is not None})
+            logger.info("Join failed for %s on room %s: Room full.", client_sid, room_id, extra={'room_id': room_id, 'action': 'join_room'})
+            return
+
+        if client_sid in room_data['human_player_sids']:
+            emit('join_error', {'message': 'You are already in this room.'})
+            logger.info("Join failed for %s on room %s: Already in room.", client_sid, room_id, extra={'room_id': room_id, 'action': 'join_room'})
+            return
+
+        # Assign next available player ID
+        player_id_counter = 1
+        while f'player{player_id_counter}' in room_data['player_sids']:
+            player_id_counter += 1
+
+        assigned_player_id = f'player{player_id_counter}'
+        if matchmaker.cancel(client_sid): # A seat here replaces a match still being looked for
+            emit('left_queue', {})
+        seat_human(room_id, client_sid, assigned_player_id)
+
+        emit('room_joined', {'room_id': room_id, 'player_id': assigned_player_id}, room=client_sid)
+        logger.info("Player %s joined room %s as %s.", client_sid, room_id, assigned_player_id,
+                    extra={'room_id': room_id, 'player_id': assigned_player_id, 'action': 'join_room'})
+
+        if len(room_data['human_player_sids']) == num_human_players_needed:
+            start_multiplayer_game(room_id)
+        else:
+            socketio.emit('room_created', {'room_id': room_id, 'players_needed': num_human_players_needed - len(room_data['human_player_sids'])}, room=room_id) # Update other players in lobby
+
+@socketio.on('find_match')
+@metrics.timed(metrics.HANDLER_SECONDS, 'find_match')
+def handle_find_match(data):
+    # Queue for a game of total_players accepting up to max_bots bots; match_found and game_start follow
+    if player_sids_index.get(request.sid) or request.sid in spectator_rooms:
+        return emit('match_error', {'message': 'Leave your current room before looking for a match.'})
+    try:
+        total_players = int(data.get('total_players', 2))
+        max_bots = int(data.get('max_bots', 0))
+        matchmaker.enqueue(request.sid, total_players, max_bots, data)
+    except (TypeError, ValueError) as e:
+        return emit('match_error', {'message': str(e)})
+
+    waits = matchmaker.wait_percentiles((0.5,))
+    emit('queued', {'total_players': total_players, 'queue_depth': matchmaker.depth(total_players), 'expected_wait_seconds': waits.get(0.5)})
+    logger.info("%s queued for a %s-player game (up to %s bots).", request.sid, total_players, max_bots, extra={'action': 'find_match'})
+
+@socketio.on('leave_queue')
+@metrics.timed(metrics.HANDLER_SECONDS, 'leave_queue')
+def handle_leave_queue(data):
+    if matchmaker.cancel(request.sid):
+        emit('left_queue', {})
+
+MATCH_WAIT_SECONDS = metrics.Histogram('sleepy_matchmaking_wait_seconds', 'Time players waited in the matchmaking queue before a room was formed.',
+                                       ('total_players',), buckets=metrics.WAIT_BUCKETS)
+
+def form_matched_room(tickets, num_bots):
+    # Called by matchmaker with the tickets of one room, oldest first; the first ticket's settings (bot tier...) apply
+    total_players = tickets[0].total_players
+    room_id = new_room(total_players, num_bots, tickets[0].options)
+    now = time.monotonic()
+    for seat, ticket in enumerate(tickets, start=1):
+        player_id = f'player{seat}'
+        seat_human(room_id, ticket.sid, player_id)
+        MATCH_WAIT_SECONDS.observe(now - ticket.enqueued_at, str(total_players))
+        socketio.emit('match_found', {'room_id': room_id, 'player_id': player_id, 'num_bots': num_bots}, room=ticket.sid)
+    logger.info("Matchmaking formed room %s: %s players, %s bots.", room_id, len(tickets), num_bots, extra={'room_id': room_id, 'action': 'match_found'})
+    start_multiplayer_game(room_id)
+
+matchmaker = MatchmakingQueue(form_matched_room) # Forms rooms in batches from its own green thread
+metrics.Gauge('sleepy_matchmaking_queue_depth', 'Players waiting in the matchmaking queue, by game size.',
+              lambda: {(str(total),): matchmaker.depth(total) for total in matchmaker.buckets}, ('total_players',))
 
 def start_multiplayer_game(room_id):
     room_data = game_rooms[room_id]
     room_data['waiting_for_players'] = False
+    room_data['last_activity'] = time.monotonic()
 
     # Assign bot IDs and mark them
     player_id_counter = room_data['total_players'] - room_data['num_bots'] + 1
@@ -147,32 +508,62 @@ def start_multiplayer_game(room_id):
     # Sort player_ids for consistent turn order: player1, player2, ..., playerN
     player_ids_list.sort(key=lambda x: int(x.replace('player', '')))
 
-    initial_game_state = gm_lg.initialize_game(room_data['total_players'], room_data['num_bots'], player_ids_list)
+    seed = game_record.new_seed()
+    initial_game_state = gm_lg.initialize_game(room_data['total_players'], room_data['num_bots'], player_ids_list, seed)
+    initial_game_state['record'] = game_record.GameRecord(seed, room_data['total_players'], room_data['num_bots'], player_ids_list) # Seed + every action, for replays
     room_data['game_state'] = initial_game_state
-
-    # Prepare game states for each player view
-    game_states_for_players = {}
-    for p_id in player_ids_list:
-        game_states_for_players[p_id] = {
-            'sid': room_data['player_sids'][p_id]['sid'] if not room_data['player_sids'][p_id]['is_bot'] else None,
-            'game_state': gm_lg.get_game_state_for_player(initial_game_state, p_id)
-        }
-    
-    # Send initial game state to all clients in the room
-    socketio.emit('game_start', {
-        'initial_game_states': game_states_for_players, # Send full map of player states
-        'room_id': room_id
-    }, room=room_id) 
-    
-    print(f'Game started in room {room_id} with {room_data["total_players"]} players ({room_data["num_bots"]} bots).')
+    initial_game_state['action_log'].spill = room_data['action_history'] = ActionHistoryStore() # Entries rotated out of the live log
+    room_data['last_snapshot'] = state_sync.take_snapshot(initial_game_state) # Base for the next game_update delta
+    room_data['recent_snapshots'] = collections.deque([room_data['last_snapshot']], maxlen=RESUME_HISTORY) # Bases for resume_session deltas
+    room_repository.save_room(room_id, room_data)
+
+    # Everyone sees the same board; only the hand differs per player
+    public_view = fanout.encode_shared(catalog.encode_view(gm_lg.get_game_state_for_player(initial_game_state, None)))
+    fanout.emit_to_players(socketio, 'game_start', room_data, lambda p_id: {
+        'room_id': room_id,
+        'player_id': p_id,
+        'game_state': public_view,
+        'hand': catalog.encode_hand(initial_game_state['players'][p_id]['hand']),
+        'resume_token': room_data['player_sids'][p_id]['token'] # Kept by the client for resume_session
+    })
+
+    logger.info("Game started in room %s with %s players (%s bots).", room_id, room_data["total_players"], room_data["num_bots"],
+                extra={'room_id': room_id, 'action': 'game_start'})
 
     # If the current turn is a bot's, trigger its move immediately
     if room_data['game_state']['players'][room_data['game_state']['current_turn']].get('is_bot'):
-        eventlet.spawn_after(1, trigger_bot_move, room_id)
-
+        schedule_bot_move(room_id)
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 3)
+
+def room_action(handler):
+    """
+    Runs a game action handler inside its room's mailbox, so it never interleaves with
+    another action or a bot move on the same room, and rejects actions made against
+    an older revision before they reach the rules.
+    """
+    @functools.wraps(handler)
+    def wrapper(data):
+        room_id = data.get('room_id')
+        with room_mailboxes.turn(room_id):
+            room_data = game_rooms.get(room_id)
+            if room_data and room_data.get('game_state'):
+                rejection = check_revision(room_data['game_state'], data)
+                if rejection:
+                    logger.info("Rejected %s in room %s: client revision %s, server revision %s.", handler.__name__, room_id, data.get('revision'), rejection['revision'],
+                                extra={'room_id': room_id, 'player_id': data.get('player_id'), 'action': 'stale_action'})
+                    metrics.STALE_ACTIONS.inc(handler.__name__.removeprefix('handle_'))
+                    return emit('error', rejection, room=request.sid)
+            return handler(data)
+    return wrapper
 
 @socketio.on('play_card')
+@metrics.timed(metrics.HANDLER_SECONDS, 'play_card')
+@room_action
 def handle_play_card(data):
+    started = time.perf_counter()
     room_id = data['room_id']
     player_id = data['player_id']
     card_index = data['card_index']
@@ -181,8 +572,10 @@ def handle_play_card(data):
     defending_card_index = data.get('defending_card_index') 
     target_player_for_thief_swap = data.get('target_player_for_thief_swap')
 
-    print(f"Received play_card data (from {request.sid}): player_id={player_id}, card_index={card_index}, target_character_id={target_character_id}, target_card_indices={target_card_indices}, defending_card_index={defending_card_index}, target_player_for_thief_swap={target_player_for_thief_swap}")
- 
+    logger.debug("Received play_card data (from %s): card_index=%s, target_character_id=%s, target_card_indices=%s, defending_card_index=%s, target_player_for_thief_swap=%s",
+                 request.sid, card_index, target_character_id, target_card_indices, defending_card_index, target_player_for_thief_swap,
+                 extra={'room_id': room_id, 'player_id': player_id, 'action': 'play_card'})
+
     room_data = game_rooms.get(room_id)
     if not room_data:
         return emit('error', {'message': 'Room not found.'})
@@ -193,44 +586,39 @@ def handle_play_card(data):
         return emit('error', {'message': 'Not your turn to play a card.'}, room=request.sid)
 
     try:
-        updated_game_state = apply_card_effect(current_game_state, player_id, card_index, target_character_id, target_card_indices, defending_card_index, target_player_for_thief_swap)
+        updated_game_state = gm_lg.apply_action(current_game_state, player_id, {
+            'kind': 'play_card',
+            'card_index': card_index,
+            'target_character_id': target_character_id,
+            'target_card_indices': target_card_indices,
+            'defending_card_index': defending_card_index,
+            'target_player_id': target_player_for_thief_swap
+        })
         room_data['game_state'] = updated_game_state
 
         win_status = check_win_condition(updated_game_state)
-        
-        # Prepare game states for each player view
-        game_states_for_players = {}
-        for p_id in updated_game_state['players'].keys():
-            game_states_for_players[p_id] = {
-                'sid': room_data['player_sids'][p_id]['sid'] if not room_data['player_sids'][p_id]['is_bot'] else None,
-                'game_state': gm_lg.get_game_state_for_player(updated_game_state, p_id)
-            }
-
-        emit('game_update', {
-            'game_states_for_players': game_states_for_players,
-            'current_turn': updated_game_state['current_turn'],
-            'win_status': win_status,
-            'message': updated_game_state['message'],
-            'action_log': updated_game_state['action_log'],
-            'swap_in_progress': updated_game_state.get('swap_in_progress', False), 
-            'selected_cards_for_swap': updated_game_state.get('selected_cards_for_swap', []), 
-            'pending_attack': updated_game_state.get('pending_attack') 
-        }, room=room_id)
+
+        broadcast_game_update(room_id, win_status)
 
         if win_status["game_over"]:
-            print(f"Game over in room {room_id}. Winner: {win_status['winner']}")
+            logger.info("Game over in room %s. Winner: %s", room_id, win_status['winner'],
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'play_card', 'latency_ms': elapsed_ms(started)})
         else:
-            print(f"Player {player_id} played card in room {room_id}. Message: {updated_game_state['message']}")
+            logger.info("Player %s played card in room %s. Message: %s", player_id, room_id, updated_game_state['message'],
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'play_card', 'latency_ms': elapsed_ms(started)})
             # If after playing card, it's now a bot's turn, trigger bot move
             if updated_game_state['current_turn'] != player_id and updated_game_state['players'][updated_game_state['current_turn']].get('is_bot') and not win_status["game_over"]:
-                eventlet.spawn_after(1, trigger_bot_move, room_id)
+                schedule_bot_move(room_id)
 
 
     except ValueError as e:
         emit('error', {'message': str(e)}, room=request.sid)
 
 @socketio.on('resolve_pending_attack')
+@metrics.timed(metrics.HANDLER_SECONDS, 'resolve_pending_attack')
+@room_action
 def handle_resolve_pending_attack(data):
+    started = time.perf_counter()
     room_id = data['room_id']
     player_id = data['player_id'] 
     use_defense = data['useDefense']
@@ -248,62 +636,36 @@ def handle_resolve_pending_attack(data):
     if player_id != current_game_state["pending_attack"]["target_player_id"]:
         return emit('error', {'message': 'You are not the target of this action.'}, room=request.sid)
 
-    attacker_player_id = current_game_state["pending_attack"]["player_id"]
-    attacking_card_name = current_game_state["pending_attack"]["card_name"]
-    
-    attacking_card_data = next((card for card in gm_lg.ACTION_CARD_TEMPLATES if card["name"] == attacking_card_name), None)
-    
     try:
-        updated_game_state = dict(current_game_state)
-
-        if use_defense:
-            updated_game_state = gm_lg.apply_card_effect(updated_game_state, player_id, defending_card_index, None, None, defending_card_index=defending_card_index)
-            
-        else:
-            updated_game_state = gm_lg.apply_pending_action(updated_game_state, attacker_player_id, attacking_card_data,
-                                                      current_game_state["pending_attack"]["target_character_id"],
-                                                      current_game_state["pending_attack"]["target_card_indices"],
-                                                      current_game_state["pending_attack"].get("target_player_for_thief_swap"))
-            
-        updated_game_state["pending_attack"] = None 
-        updated_game_state["swap_in_progress"] = False 
-        updated_game_state["selected_cards_for_swap"] = []
+        updated_game_state = gm_lg.apply_action(current_game_state, player_id, {
+            'kind': 'resolve',
+            'use_defense': use_defense,
+            'defending_card_index': defending_card_index
+        })
         room_data['game_state'] = updated_game_state
 
         win_status = check_win_condition(updated_game_state)
-        
-        # Prepare game states for each player view
-        game_states_for_players = {}
-        for p_id in updated_game_state['players'].keys():
-            game_states_for_players[p_id] = {
-                'sid': room_data['player_sids'][p_id]['sid'] if not room_data['player_sids'][p_id]['is_bot'] else None,
-                'game_state': gm_lg.get_game_state_for_player(updated_game_state, p_id)
-            }
-
-        emit('game_update', {
-            'game_states_for_players': game_states_for_players,
-            'current_turn': updated_game_state['current_turn'],
-            'win_status': win_status,
-            'message': updated_game_state['message'],
-            'action_log': updated_game_state['action_log'],
-            'swap_in_progress': updated_game_state.get('swap_in_progress', False),
-            'selected_cards_for_swap': updated_game_state.get('selected_cards_for_swap', []),
-            'pending_attack': updated_game_state.get('pending_attack')
-        }, room=room_id)
+
+        broadcast_game_update(room_id, win_status)
 
         if win_status["game_over"]:
-            print(f"Game over in room {room_id}. Winner: {win_status['winner']}")
+            logger.info("Game over in room %s. Winner: %s", room_id, win_status['winner'],
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'resolve_pending_attack', 'latency_ms': elapsed_ms(started)})
         else:
-            print(f"Player {player_id} resolved defense in room {room_id}.")
+            logger.info("Player %s resolved defense in room %s.", player_id, room_id,
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'resolve_pending_attack', 'latency_ms': elapsed_ms(started)})
             # If after resolving attack, it's now a bot's turn, trigger bot move
             if updated_game_state['current_turn'] != player_id and updated_game_state['players'][updated_game_state['current_turn']].get('is_bot') and not win_status["game_over"]:
-                eventlet.spawn_after(1, trigger_bot_move, room_id)
+                schedule_bot_move(room_id)
 
     except ValueError as e:
         emit('error', {'message': str(e)}, room=request.sid)
 
 @socketio.on('end_turn')
+@metrics.timed(metrics.HANDLER_SECONDS, 'end_turn')
+@room_action
 def handle_end_turn(data):
+    started = time.perf_counter()
     room_id = data['room_id']
     player_id = data['player_id']
 
@@ -317,99 +679,341 @@ def handle_end_turn(data):
         return emit('error', {'message': 'Not your turn to end.'}, room=request.sid)
 
     try:
-        updated_game_state = end_turn(current_game_state, player_id)
+        updated_game_state = gm_lg.apply_action(current_game_state, player_id, {'kind': 'end_turn'})
         room_data['game_state'] = updated_game_state
 
         win_status = check_win_condition(updated_game_state)
 
-        # Prepare game states for each player view
-        game_states_for_players = {}
-        for p_id in updated_game_state['players'].keys():
-            game_states_for_players[p_id] = {
-                'sid': room_data['player_sids'][p_id]['sid'] if not room_data['player_sids'][p_id]['is_bot'] else None,
-                'game_state': gm_lg.get_game_state_for_player(updated_game_state, p_id)
-            }
-
-        emit('game_update', {
-            'game_states_for_players': game_states_for_players,
-            'current_turn': updated_game_state['current_turn'],
-            'win_status': win_status,
-            'message': updated_game_state['message'],
-            'action_log': updated_game_state['action_log'],
-            'swap_in_progress': updated_game_state.get('swap_in_progress', False),
-            'selected_cards_for_swap': updated_game_state.get('selected_cards_for_swap', []),
-            'pending_attack': updated_game_state.get('pending_attack')
-        }, room=room_id)
+        broadcast_game_update(room_id, win_status)
 
         if win_status["game_over"]:
-            print(f"Game over in room {room_id}. Winner: {win_status['winner']}")
+            logger.info("Game over in room %s. Winner: %s", room_id, win_status['winner'],
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'end_turn', 'latency_ms': elapsed_ms(started)})
         else:
-            print(f"Player {player_id} ended turn in room {room_id}.")
+            logger.info("Player %s ended turn in room %s.", player_id, room_id,
+                        extra={'room_id': room_id, 'player_id': player_id, 'action': 'end_turn', 'latency_ms': elapsed_ms(started)})
             # If it's now a bot's turn, trigger bot move
             if updated_game_state['players'][updated_game_state['current_turn']].get('is_bot') and not win_status["game_over"]:
-                eventlet.spawn_after(1, trigger_bot_move, room_id)
+                schedule_bot_move(room_id)
 
     except ValueError as e:
         emit('error', {'message': str(e)}, room=request.sid)
 
+def broadcast_game_update(room_id, win_status):
+    """
+    Bumps the room's state revision and sends each human player only what changed
+    since the previous revision, plus their own hand if it changed. Clients whose
+    revision doesn't match base_revision ask for a resync.
+    """
+    with metrics.FUNCTION_SECONDS.time('broadcast_game_update'):
+        send_game_update(room_id, win_status)
+
+def send_game_update(room_id, win_status):
+    room_data = game_rooms[room_id]
+    game_state = room_data['game_state']
+    previous_snapshot = room_data['last_snapshot']
+
+    game_state['revision'] += 1
+
+    public_delta = fanout.encode_shared(catalog.encode_delta(state_sync.build_public_delta(previous_snapshot, game_state)))
+    shared_win_status = fanout.encode_shared(win_status)
+    hand_deltas = {p_id: catalog.encode_hand(hand) for p_id, hand in state_sync.build_hand_deltas(previous_snapshot, game_state).items()}
+
+    fanout.emit_to_players(socketio, 'game_update', room_data, lambda p_id: {
+        'player_id': p_id,
+        'revision': game_state['revision'],
+        'base_revision': previous_snapshot['revision'],
+        'delta': public_delta,
+        'hand': hand_deltas.get(p_id), # None when this player's hand didn't change
+        'win_status': shared_win_status
+    })
+
+    room_data['last_snapshot'] = state_sync.take_snapshot(game_state)
+    room_data['recent_snapshots'].append(room_data['last_snapshot'])
+    room_data['last_activity'] = time.monotonic()
+    if win_status['game_over'] and 'finished_at' not in room_data:
+        room_data['finished_at'] = room_data['last_activity']
+        if game_state.get('record') is not None:
+            game_state['record'].finish(game_state)
+    room_repository.after_update(room_id, game_state)
+    if 'spectator_feed' in room_data:
+        publish_spectator_frame(room_id, room_data)
+
+@socketio.on('spectate_room')
+@metrics.timed(metrics.HANDLER_SECONDS, 'spectate_room')
+def handle_spectate_room(data):
+    # Watching takes no seat, so it works for full rooms; spectators only ever see the public view
+    room_id = data.get('room_id')
+    room_data = game_rooms.get(room_id)
+
+    if not room_data and not room_ids.owns(room_id) and room_ids.shard_of(room_id) is not None:
+        return emit('spectate_error', {'message': 'Room is hosted on another server.', 'room_id': room_id, 'shard': room_ids.shard_of(room_id)})
+    if not room_data or not room_data['game_state']:
+        return emit('spectate_error', {'message': 'No game is being played in this room.', 'room_id': room_id})
+    if player_sids_index.get(request.sid) or request.sid in spectator_rooms:
+        return emit('spectate_error', {'message': 'You are already in a room.', 'room_id': room_id})
+
+    feed = room_data.get('spectator_feed')
+    if feed is None:
+        # Frames are only built for rooms someone is watching
+        feed = room_data['spectator_feed'] = SpectatorFeed()
+        publish_spectator_frame(room_id, room_data)
+    feed.watchers.add(request.sid)
+    spectator_rooms[request.sid] = room_id
+    join_room(spectator_channel(room_id))
+
+    emit('spectating', {'room_id': room_id, 'delay_seconds': feed.delay})
+    if feed.last_frame is not None:
+        emit('spectator_update', feed.last_frame, room=request.sid)
+    logger.info("Spectator %s watching room %s (%s watching).", request.sid, room_id, len(feed.watchers),
+                extra={'room_id': room_id, 'action': 'spectate_room'})
+
+@socketio.on('stop_spectating')
+@metrics.timed(metrics.HANDLER_SECONDS, 'stop_spectating')
+def handle_stop_spectating(data):
+    room_id = stop_spectating(request.sid)
+    if room_id is not None:
+        leave_room(spectator_channel(room_id))
+
+def stop_spectating(sid):
+    room_id = spectator_rooms.pop(sid, None)
+    room_data = game_rooms.get(room_id)
+    feed = room_data and room_data.get('spectator_feed')
+    if feed:
+        feed.watchers.discard(sid)
+        if not feed.watchers:
+            del room_data['spectator_feed'] # Nobody left watching: stop building frames
+            spectator_frames.cancel(room_id)
+    return room_id
+
+def build_spectator_frame(room_id, room_data):
+    # The hand-less view of get_game_state_for_player(..., None), encoded once for every spectator
+    game_state = room_data['game_state']
+    return fanout.Envelope({
+        'room_id': room_id,
+        'revision': game_state['revision'],
+        'game_state': fanout.encode_shared(catalog.encode_view(gm_lg.get_game_state_for_player(game_state, None))),
+        'win_status': check_win_condition(game_state)
+    })
+
+def publish_spectator_frame(room_id, room_data):
+    feed = room_data['spectator_feed']
+    if feed.needs_capture():
+        feed.push(build_spectator_frame(room_id, room_data)) # The live state moves on before the delay is up
+    else:
+        feed.mark_stale()
+    spectator_frames.schedule(room_id, feed.wait())
+
+def flush_spectators(room_id):
+    room_data = game_rooms.get(room_id)
+    feed = room_data and room_data.get('spectator_feed')
+    if not feed:
+        return
+    if not room_mailboxes.enter(room_id, blocking=False):
+        # Mid-action; the frame is built from a consistent state a moment later
+        spectator_frames.schedule(room_id, BOT_RETRY_DELAY)
+        return
+    try:
+        frame = feed.pop_due(lambda: build_spectator_frame(room_id, room_data))
+    finally:
+        room_mailboxes.leave(room_id)
+    if frame is not None:
+        socketio.emit('spectator_update', frame, room=spectator_channel(room_id)) # Encoded once for the whole channel
+    wait = feed.wait()
+    if wait is not None:
+        spectator_frames.schedule(room_id, wait)
+
+@socketio.on('request_resync')
+@metrics.timed(metrics.HANDLER_SECONDS, 'request_resync')
+def handle_request_resync(data):
+    room_id = data.get('room_id')
+    client_revision = data.get('revision')
+
+    room_data = game_rooms.get(room_id)
+    if not room_data or not room_data['game_state']:
+        return emit('error', {'message': 'Room not found.'})
+
+    seat = player_sids_index.get(request.sid)
+    player_id = seat[1] if seat and seat[0] == room_id else None
+    if not player_id:
+        return emit('error', {'message': 'You are not a player in this room.'}, room=request.sid)
+
+    game_state = room_data['game_state']
+    logger.info("Resync requested by %s in room %s (client revision %s, server revision %s).", player_id, room_id, client_revision, game_state['revision'],
+                extra={'room_id': room_id, 'player_id': player_id, 'action': 'request_resync'})
+
+    emit('game_resync', {
+        'player_id': player_id,
+        'game_state': catalog.encode_view(gm_lg.get_game_state_for_player(game_state, player_id)),
+        'win_status': check_win_condition(game_state)
+    }, room=request.sid)
+
+@socketio.on('get_legal_moves')
+@metrics.timed(metrics.HANDLER_SECONDS, 'get_legal_moves')
+def handle_get_legal_moves(data):
+    # Playable cards and their valid targets right now, so clients only offer moves the rules accept
+    room_id = data.get('room_id')
+
+    room_data = game_rooms.get(room_id)
+    if not room_data or not room_data['game_state']:
+        return emit('error', {'message': 'Room not found.'})
+
+    seat = player_sids_index.get(request.sid)
+    player_id = seat[1] if seat and seat[0] == room_id else None
+    if not player_id:
+        return emit('error', {'message': 'You are not a player in this room.'}, room=request.sid)
+
+    game_state = room_data['game_state']
+    emit('legal_moves', dict(gm_lg.legal_targets(game_state, player_id), player_id=player_id, revision=game_state['revision']), room=request.sid)
+
 def trigger_bot_move(room_id):
+    if not room_mailboxes.enter(room_id, blocking=False):
+        # A player's action is being processed; retry shortly rather than stall other rooms' bots
+        bot_moves.schedule(room_id, BOT_RETRY_DELAY)
+        return
+    room_data = game_rooms.get(room_id)
+    if bot_pool.enabled and room_data and room_data['bot_tier'] in POOLED_BOT_TIERS:
+        eventlet.spawn(run_bot_move, room_id) # Waits on a worker; the scheduler goes on with other rooms meanwhile
+    else:
+        run_bot_move(room_id)
+
+def run_bot_move(room_id):
+    # Holds the room from trigger_bot_move until the bot's move is applied, so nothing moves the state under a worker
+    try:
+        make_room_bot_move(room_id)
+    except Exception:
+        logger.exception("Bot move failed in room %s.", room_id, extra={'room_id': room_id, 'action': 'bot_move'}) # Off the scheduler, nobody else would log it
+    finally:
+        room_mailboxes.leave(room_id)
+
+def play_bot_turn(room_id, room_data, game_state):
+    """
+    Plays the current bot's turn (or its answer to a pending attack) on `game_state`
+    and returns it, or None if the room closed while a worker was thinking. Pooled
+    tiers fall back to the greedy bot on the event loop when the pool can't answer.
+    """
+    tier = room_data['bot_tier']
+    if not (bot_pool.enabled and tier in POOLED_BOT_TIERS):
+        return BOT_TIERS[tier](game_state, room_data['bot_search_ms'])
+    try:
+        moves = bot_pool.decide(game_state, tier, room_data['bot_search_ms'])
+    except BotPoolUnavailable as e:
+        BOT_POOL_FALLBACKS.inc(e.reason)
+        logger.warning("Bot pool could not play for room %s (%s); using the greedy bot.", room_id, e.reason, extra={'room_id': room_id, 'action': 'bot_move'})
+        return bot_ai.make_bot_move(game_state)
+    if game_rooms.get(room_id) is not room_data:
+        return None
+    try:
+        # The worker played on a copy of this very state and generator, so its moves (and draws) replay as they were
+        for player_id, action in moves:
+            game_state = gm_lg.apply_action(game_state, player_id, action)
+    except ValueError as e:
+        BOT_POOL_FALLBACKS.inc('rejected')
+        logger.warning("Bot move from the pool was rejected in room %s: %s", room_id, e, extra={'room_id': room_id, 'action': 'bot_move'})
+        return bot_ai.make_bot_move(game_state) # Finishes the turn from wherever the replay stopped
+    return game_state
+
+def make_room_bot_move(room_id):
+    started = time.perf_counter()
     room_data = game_rooms.get(room_id)
     if not room_data:
-        print(f"Bot trigger: Room {room_id} not found.")
+        logger.debug("Bot trigger: Room %s not found.", room_id, extra={'room_id': room_id, 'action': 'bot_move'})
         return
 
     current_game_state = room_data['game_state']
     
     if current_game_state['game_over']:
-        print(f"Bot trigger: Game in room {room_id} is already over.")
+        logger.debug("Bot trigger: Game in room %s is already over.", room_id, extra={'room_id': room_id, 'action': 'bot_move'})
         return
 
     current_player_id = current_game_state['current_turn']
     if not current_game_state['players'][current_player_id].get('is_bot'):
-        print(f"Bot trigger: Not bot's turn ({current_player_id}).")
+        logger.debug("Bot trigger: Not bot's turn (%s).", current_player_id, extra={'room_id': room_id, 'player_id': current_player_id, 'action': 'bot_move'})
         return # Not a bot's turn or human is still responding to pending attack
 
-    print(f"Triggering bot move for {current_player_id} in room {room_id}...")
+    logger.debug("Triggering bot move for %s in room %s...", current_player_id, room_id, extra={'room_id': room_id, 'player_id': current_player_id, 'action': 'bot_move'})
     
     # Check if there is a pending attack against this bot that needs resolution
     if current_game_state.get("pending_attack") and current_game_state["pending_attack"]["target_player_id"] == current_player_id:
-        print(f"Bot {current_player_id} is resolving pending attack.")
-        updated_game_state = bot_ai.make_bot_move(current_game_state) # Bot AI handles defense
+        logger.debug("Bot %s is resolving pending attack.", current_player_id, extra={'room_id': room_id, 'player_id': current_player_id, 'action': 'bot_move'})
+        updated_game_state = play_bot_turn(room_id, room_data, current_game_state) # Bot AI handles defense
     else:
         # Normal bot turn to play cards
-        updated_game_state = bot_ai.make_bot_move(current_game_state)
+        updated_game_state = play_bot_turn(room_id, room_data, current_game_state)
+    if updated_game_state is None:
+        logger.debug("Bot trigger: Room %s closed during the bot's move.", room_id, extra={'room_id': room_id, 'action': 'bot_move'})
+        return
 
     room_data['game_state'] = updated_game_state
     win_status = check_win_condition(updated_game_state)
 
-    # Prepare game states for each player view
-    game_states_for_players = {}
-    for p_id in updated_game_state['players'].keys():
-        game_states_for_players[p_id] = {
-            'sid': room_data['player_sids'][p_id]['sid'] if not room_data['player_sids'][p_id]['is_bot'] else None,
-            'game_state': gm_lg.get_game_state_for_player(updated_game_state, p_id)
-        }
-
-    socketio.emit('game_update', {
-        'game_states_for_players': game_states_for_players,
-        'current_turn': updated_game_state['current_turn'],
-        'win_status': win_status,
-        'message': updated_game_state['message'],
-        'action_log': updated_game_state['action_log'],
-        'swap_in_progress': updated_game_state.get('swap_in_progress', False),
-        'selected_cards_for_swap': updated_game_state.get('selected_cards_for_swap', []),
-        'pending_attack': updated_game_state.get('pending_attack')
-    }, room=room_id)
+    broadcast_game_update(room_id, win_status)
+    logger.info("Bot %s moved in room %s.", current_player_id, room_id,
+                extra={'room_id': room_id, 'player_id': current_player_id, 'action': 'bot_move', 'latency_ms': elapsed_ms(started)})
 
     if win_status["game_over"]:
-        print(f"Bot move resulted in game over in room {room_id}. Winner: {win_status['winner']}")
+        logger.info("Bot move resulted in game over in room %s. Winner: %s", room_id, win_status['winner'],
+                    extra={'room_id': room_id, 'player_id': current_player_id, 'action': 'bot_move', 'latency_ms': elapsed_ms(started)})
     elif updated_game_state['players'][updated_game_state['current_turn']].get('is_bot') and updated_game_state['current_turn'] != current_player_id:
         # If it's still a bot's turn (e.g., current bot ended its turn, and next player is also a bot)
-        eventlet.spawn_after(1, trigger_bot_move, room_id)
+        schedule_bot_move(room_id)
     elif current_game_state.get("pending_attack") and current_game_state["pending_attack"]["target_player_id"] != current_player_id and updated_game_state['players'][updated_game_state['current_turn']].get('is_bot'):
         # If bot played an attacking card and now it's its turn again, but the target human needs to defend first
         # No recursive call here, waiting for human to resolve
         pass
 
+# A single green thread runs due bot moves for all rooms
+bot_moves = BotScheduler(trigger_bot_move)
+spectator_frames = BotScheduler(flush_spectators) # Same single-greenlet timer heap, paced per room by its SpectatorFeed
+metrics.Gauge('sleepy_bot_moves_pending', 'Bot moves waiting in the scheduler.', bot_moves.pending_count)
+
+def schedule_bot_move(room_id):
+    room_data = game_rooms.get(room_id)
+    if room_data:
+        bot_moves.schedule(room_id, room_data.get('bot_think_time', DEFAULT_BOT_THINK_TIME))
+
+def restore_rooms():
+    """
+    Puts the rooms saved by the room store back into game_rooms at startup. Finished
+    games are dropped. Seats start empty; players reclaim them with resume_session
+    within the usual grace window.
+    """
+    for room_id, settings, players, game_state in room_repository.load_rooms():
+        if not room_ids.owns(room_id):
+            logger.warning("Stored room %s belongs to shard %s, not %s; skipping it.", room_id, room_ids.shard_of(room_id), room_ids.shard_id,
+                           extra={'room_id': room_id, 'action': 'restore'})
+            continue
+        room_ids.observe(room_id)
+        if game_state['game_over'] or check_win_condition(game_state)['game_over']:
+            room_repository.delete_room(room_id)
+            continue
+
+        room_data = dict(settings)
+        room_data.update({
+            'human_player_sids': [],
+            'player_sids': {p_id: {'sid': None, 'is_bot': p_data['is_bot'], 'token': p_data.get('token')} for p_id, p_data in players.items()},
+            'game_state': game_state,
+            'turn': game_state['current_turn'],
+            'waiting_for_players': False,
+            'last_activity': time.monotonic(),
+            'last_snapshot': state_sync.take_snapshot(game_state)
+        })
+        action_log = game_state['action_log']
+        # Only the buffered entries were saved; the history grows again from there
+        action_log.spill = room_data['action_history'] = ActionHistoryStore(first=action_log.total - len(action_log))
+        room_data['recent_snapshots'] = collections.deque([room_data['last_snapshot']], maxlen=RESUME_HISTORY)
+        game_rooms[room_id] = room_data
+        for player_id, p_data in room_data['player_sids'].items():
+            if not p_data['is_bot']:
+                hold_seat(room_id, room_data, player_id) # Players get the usual grace window to resume
+        logger.info("Room %s restored at revision %s.", room_id, game_state['revision'], extra={'room_id': room_id, 'action': 'restore'})
+
+        if game_state['players'][game_state['current_turn']].get('is_bot') and not game_state.get('pending_attack'):
+            schedule_bot_move(room_id)
+    room_reaper.start()
+
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+    atexit.register(room_repository.close) # Commit what is still queued
+    atexit.register(bot_pool.close)
+    restore_rooms()
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
\ No newline at end of file
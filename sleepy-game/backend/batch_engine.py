@@ -0,0 +1,141 @@
+# sleepy-game/backend/batch_engine.py
+# Batch form of the sleep rules for offline work (balance simulations, bulk move
+# evaluation): K games held as NumPy arrays and advanced together. It covers the
+# character effects (attack, support, lucky), sleep thresholds, playing from the hand
+# and check_win_condition; turn order, defense and Thief/Swap stay with game_logic.
+# Results are cross-checked against game_logic by benchmarks/check_batch_engine.py.
+#
+# NumPy is not a server dependency; install it where this module is used
+# (pip install numpy).
+import numpy as np
+
+from game_logic import ACTION_CARD_TEMPLATES, CARD_SAMPLER, INITIAL_CHARACTERS_PER_PLAYER, MAX_HAND_SIZE
+from models import CARD_ID_BY_NAME
+
+NO_CARD = -1
+
+# Per card id (index into ACTION_CARD_TEMPLATES), plus one trailing entry so NO_CARD (-1) looks up "no effect"
+CARD_TYPE_CODES = {"attack": 0, "support": 1, "lucky": 2, "theif": 3, "swap": 4, "defense": 5}
+CARD_TYPES = np.array([CARD_TYPE_CODES[card["type"]] for card in ACTION_CARD_TEMPLATES] + [-1], dtype=np.int8)
+CARD_VALUES = np.array([card["effect"].get("value", 0) for card in ACTION_CARD_TEMPLATES] + [0], dtype=np.int16)
+CARD_IS_LUCKY = CARD_TYPES == CARD_TYPE_CODES["lucky"]
+CARD_AFFECTS_CHARACTER = np.isin(CARD_TYPES, [CARD_TYPE_CODES["attack"], CARD_TYPE_CODES["support"], CARD_TYPE_CODES["lucky"]])
+
+# The same alias table CARD_SAMPLER uses, as arrays
+ALIAS_PROBABILITIES = np.array(CARD_SAMPLER.probabilities)
+ALIAS_COLUMNS = np.array(CARD_SAMPLER.aliases, dtype=np.int16)
+
+class BatchState:
+    """
+    K games with the same number of players. Players are in turn order and characters
+    in the order of each player's "characters" list, so index [k, p, c] is
+    game_state["players"][player_turn_order[p]]["characters"][c] of game k.
+    """
+
+    def __init__(self, current_sleep, max_sleep, is_asleep, sleep_count, hands):
+        self.current_sleep = current_sleep # (K, P, C) int16
+        self.max_sleep = max_sleep # (K, P, C) int16
+        self.is_asleep = is_asleep # (K, P, C) bool
+        self.sleep_count = sleep_count # (K, P) int16
+        self.hands = hands # (K, P, MAX_HAND_SIZE) int16 card ids, NO_CARD for empty slots, filled from the left
+
+    @property
+    def size(self):
+        return self.sleep_count.shape[0]
+
+    @classmethod
+    def from_game_states(cls, game_states):
+        num_players = len(game_states[0]["player_turn_order"])
+        shape = (len(game_states), num_players, INITIAL_CHARACTERS_PER_PLAYER)
+        batch = cls(np.zeros(shape, np.int16), np.zeros(shape, np.int16), np.zeros(shape, bool),
+                    np.zeros(shape[:2], np.int16), np.full(shape[:2] + (MAX_HAND_SIZE,), NO_CARD, np.int16))
+        for k, game_state in enumerate(game_states):
+            if len(game_state["player_turn_order"]) != num_players:
+                raise ValueError("All games in a batch need the same number of players.")
+            for p, p_id in enumerate(game_state["player_turn_order"]):
+                p_data = game_state["players"][p_id]
+                batch.sleep_count[k, p] = p_data["sleep_count"]
+                for c, char in enumerate(p_data["characters"]):
+                    batch.current_sleep[k, p, c] = char["current_sleep"]
+                    batch.max_sleep[k, p, c] = char["max_sleep"]
+                    batch.is_asleep[k, p, c] = char["is_asleep"]
+                for slot, card in enumerate(p_data["hand"]):
+                    batch.hands[k, p, slot] = CARD_ID_BY_NAME[card["name"]]
+        return batch
+
+    def copy(self):
+        return BatchState(self.current_sleep.copy(), self.max_sleep.copy(), self.is_asleep.copy(), self.sleep_count.copy(), self.hands.copy())
+
+def apply_effects(batch, card_ids, target_players, target_slots):
+    """
+    Applies one character card per game, like game_logic.apply_pending_action does for
+    attack/support/lucky: attacks subtract (never below 0), support adds, lucky fills
+    the character up, and a character reaching max_sleep falls asleep and counts for
+    its owner. Games whose card id is NO_CARD (or not a character card) are untouched.
+    All arguments are length-K integer arrays.
+    """
+    # Work on flat views: one computed index instead of three fancy-indexed axes
+    num_players, num_slots = batch.current_sleep.shape[1:]
+    flat = (np.arange(batch.size) * num_players + target_players) * num_slots + target_slots
+    current_sleep = batch.current_sleep.reshape(-1)
+    is_asleep = batch.is_asleep.reshape(-1)
+
+    current = current_sleep[flat]
+    maximum = batch.max_sleep.reshape(-1)[flat]
+    asleep = is_asleep[flat]
+    applies = CARD_AFFECTS_CHARACTER[card_ids]
+
+    # Sleep is never negative, so clamping at 0 only ever changes attacks
+    updated = np.where(CARD_IS_LUCKY[card_ids], maximum, np.maximum(current + CARD_VALUES[card_ids], 0))
+    updated = np.where(applies, updated, current)
+    falls_asleep = applies & (updated >= maximum) & ~asleep
+
+    current_sleep[flat] = updated
+    is_asleep[flat] = asleep | falls_asleep
+    # One target per game, so the indices are distinct and a plain += is safe (no np.add.at needed)
+    batch.sleep_count.reshape(-1)[flat // num_slots] += falls_asleep
+    return falls_asleep
+
+def play_from_hand(batch, players, hand_slots, target_players, target_slots):
+    """
+    Removes the card at hand_slots from each player's hand (closing the gap, like
+    list.pop) and applies it. A negative hand slot means that game makes no play.
+    Returns the card ids played.
+    """
+    rows = np.arange(batch.size)
+    plays = hand_slots >= 0
+    safe_slots = np.where(plays, hand_slots, 0)
+    card_ids = np.where(plays, batch.hands[rows, players, safe_slots], NO_CARD)
+
+    hands = batch.hands[rows, players] # (K, MAX_HAND_SIZE) copy
+    columns = np.arange(MAX_HAND_SIZE)
+    source = columns + (plays[:, None] & (columns >= safe_slots[:, None]))
+    shifted = np.take_along_axis(np.concatenate([hands, np.full((batch.size, 1), NO_CARD, np.int16)], axis=1), source, axis=1)
+    batch.hands[rows, players] = shifted
+
+    apply_effects(batch, card_ids, target_players, target_slots)
+    return card_ids
+
+def draw_cards(batch, players, rng):
+    # Fills every empty slot of each game's `players[k]` hand with alias-table draws
+    rows = np.arange(batch.size)
+    hands = batch.hands[rows, players]
+    empty = hands == NO_CARD
+    columns = rng.integers(0, len(ALIAS_PROBABILITIES), size=hands.shape)
+    drawn = np.where(rng.random(hands.shape) < ALIAS_PROBABILITIES[columns], columns, ALIAS_COLUMNS[columns]).astype(np.int16)
+    batch.hands[rows, players] = np.where(empty, drawn, hands)
+
+def check_win_condition(batch):
+    """
+    Vectorized game_logic.check_win_condition. Returns (game_over, winner) where
+    winner is the turn-order index of the winning player, or -1.
+    """
+    finished = batch.sleep_count >= INITIAL_CHARACTERS_PER_PLAYER
+    game_over = finished.any(axis=1)
+    winner = np.where(game_over, finished.argmax(axis=1), -1)
+
+    # Last player standing; "lost" is the same sleep_count test, so this only matters in one-player games
+    active = ~finished
+    last_standing = ~game_over & (active.sum(axis=1) == 1)
+    winner = np.where(last_standing, active.argmax(axis=1), winner)
+    return game_over | last_standing, winner
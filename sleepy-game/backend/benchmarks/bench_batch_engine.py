@@ -0,0 +1,59 @@
+# sleepy-game/backend/benchmarks/bench_batch_engine.py
+# Character-card transitions per second: game_logic.apply_pending_action on dict
+# states, one game at a time, against batch_engine.apply_effects on K games at once
+# (each followed by the matching check_win_condition).
+# Run from sleepy-game/backend: python benchmarks/bench_batch_engine.py --batch 10000
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import batch_engine
+import game_logic
+
+CHARACTER_CARDS = [card for card in game_logic.ACTION_CARD_TEMPLATES if card["type"] in ("attack", "support")]
+
+def bench_dict_path(game_states, transitions, rng):
+    player_ids = game_states[0]["player_turn_order"]
+    moves = [(rng.choice(game_states), rng.choice(player_ids), rng.choice(CHARACTER_CARDS), f"{rng.choice(player_ids)}_char_{rng.randrange(3)}")
+             for _ in range(transitions)]
+    started = time.perf_counter()
+    for game_state, player_id, card, target_character_id in moves:
+        game_logic.apply_pending_action(game_state, player_id, card, target_character_id)
+        game_logic.check_win_condition(game_state)
+    return transitions / (time.perf_counter() - started)
+
+def bench_batch_path(batch, rounds, np_rng):
+    card_ids = np.array([batch_engine.CARD_ID_BY_NAME[card["name"]] for card in CHARACTER_CARDS])
+    num_players = batch.sleep_count.shape[1]
+    moves = [(np_rng.choice(card_ids, batch.size), np_rng.integers(0, num_players, batch.size), np_rng.integers(0, 3, batch.size))
+             for _ in range(rounds)]
+    started = time.perf_counter()
+    for card_row, players, slots in moves:
+        batch_engine.apply_effects(batch, card_row, players, slots)
+        batch_engine.check_win_condition(batch)
+    return rounds * batch.size / (time.perf_counter() - started)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dict-path and batch-path transition throughput.")
+    parser.add_argument("--batch", type=int, default=10000, help="Games advanced together by the batch path.")
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--transitions", type=int, default=100000, help="Transitions timed on the dict path.")
+    parser.add_argument("--rounds", type=int, default=50, help="Batch steps timed on the batch path.")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    random.seed(0)
+    player_ids = [f"player{i}" for i in range(1, args.players + 1)]
+    game_states = [game_logic.initialize_game(args.players, args.players, player_ids) for _ in range(args.batch)]
+
+    dict_rate = bench_dict_path([game_logic.clone_game_state(game_state) for game_state in game_states[:1000]], args.transitions, random.Random(1))
+    batch_rate = bench_batch_path(batch_engine.BatchState.from_game_states(game_states), args.rounds, np.random.default_rng(1))
+    print(f"dict path   {dict_rate:14,.0f} transitions/sec")
+    print(f"batch path  {batch_rate:14,.0f} transitions/sec  (K={args.batch})  x{batch_rate / dict_rate:.0f}")
@@ -0,0 +1,39 @@
+# sleepy-game/backend/benchmarks/bench_card_sampler.py
+# Compares the alias-table CardSampler with the old draw path, which rebuilt a
+# weighted list of int(rarity * 100) template references on every call.
+# Run from sleepy-game/backend: python benchmarks/bench_card_sampler.py
+import collections
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from game_logic import ACTION_CARD_TEMPLATES, CARD_SAMPLER, MAX_HAND_SIZE
+
+def draw_with_weighted_list(n):
+    weighted_cards = []
+    for card_template in ACTION_CARD_TEMPLATES:
+        weight = int(card_template["rarity"] * 100)
+        for _ in range(weight):
+            weighted_cards.append(card_template)
+    return [random.choice(weighted_cards) for _ in range(n)]
+
+def report(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<40} {seconds / number * 1e6:10.2f} us/call")
+
+def check_distribution(draws=200_000):
+    rng = random.Random(1234)
+    counts = collections.Counter(card["name"] for card in CARD_SAMPLER.draw(draws, rng))
+    total_weight = sum(card["rarity"] for card in ACTION_CARD_TEMPLATES)
+    worst = max(abs(counts[card["name"]] / draws - card["rarity"] / total_weight) for card in ACTION_CARD_TEMPLATES)
+    print(f"max abs deviation from rarity share over {draws} draws: {worst:.5f}")
+
+if __name__ == "__main__":
+    report(f"weighted list, draw({MAX_HAND_SIZE})", lambda: draw_with_weighted_list(MAX_HAND_SIZE), 2_000)
+    report(f"CardSampler, draw({MAX_HAND_SIZE})", lambda: CARD_SAMPLER.draw(MAX_HAND_SIZE), 200_000)
+    report("weighted list, draw(1)", lambda: draw_with_weighted_list(1), 2_000)
+    report("CardSampler, draw_one()", CARD_SAMPLER.draw_one, 500_000)
+    check_distribution()
@@ -0,0 +1,60 @@
+# sleepy-game/backend/benchmarks/bench_game_record.py
+# Size of binary game records and how fast they replay through the rules engine:
+# records greedy bot games, then replays every record (checking it reproduces the
+# final state) and seeks to every turn of one game through its keyframes.
+# Run from sleepy-game/backend: METRICS=0 python benchmarks/bench_game_record.py --games 500
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bot_ai
+import game_logic
+import game_record
+
+def record_game(seed, total_players, max_moves=300):
+    random.seed(seed) # Bot decisions; the rules draw from the room's own generator
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    game_state = game_logic.initialize_game(total_players, total_players, player_ids, seed)
+    record = game_state["record"] = game_record.GameRecord(seed, total_players, total_players, player_ids)
+    for _ in range(max_moves):
+        if game_logic.check_win_condition(game_state)["game_over"]:
+            break
+        game_state = bot_ai.make_bot_move(game_state)
+    record.finish(game_state)
+    return record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure game record size, replay and seek speed.")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    records = [record_game(args.seed + game_number, args.players) for game_number in range(args.games)]
+    data = [record.to_bytes() for record in records]
+    actions = sum(record.actions for record in records)
+    json_bytes = sum(len(json.dumps(game_record.decode_record(blob)[1])) for blob in data)
+    print(f"{args.games} games, {actions / args.games:.0f} actions/game: {sum(map(len, data)) / args.games:.0f} bytes/record "
+          f"({json_bytes / args.games:.0f} as a JSON action list)")
+
+    started = time.perf_counter()
+    for blob in data:
+        game_record.replay(blob)
+    elapsed = time.perf_counter() - started
+    print(f"replay: {args.games / elapsed:,.0f} games/sec, {actions / elapsed:,.0f} actions/sec (one process)")
+
+    longest = max(data, key=len)
+    replay = game_record.GameReplay(longest)
+    started = time.perf_counter()
+    for turn in range(len(replay.turn_starts)):
+        replay.state_at_turn(turn)
+    elapsed = time.perf_counter() - started
+    print(f"seek: {len(replay.turn_starts)} turns of a {len(replay.entries)}-action game, {elapsed / len(replay.turn_starts) * 1e6:.0f} us per seek "
+          f"(keyframe every {replay.keyframe_every} actions)")
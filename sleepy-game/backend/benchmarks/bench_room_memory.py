@@ -0,0 +1,51 @@
+# sleepy-game/backend/benchmarks/bench_room_memory.py
+# Measures memory per room for the dict game state used by game_logic versus the
+# slotted RoomState from models.py, and checks the round trip keeps the wire format.
+# Run from sleepy-game/backend: python benchmarks/bench_room_memory.py [rooms]
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game_logic
+from models import RoomState
+
+def build_rooms(count, total_players=4, num_bots=2):
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    rooms = []
+    for _ in range(count):
+        game_state = game_logic.initialize_game(total_players, num_bots, player_ids)
+        # Play a few turns so the log and hands look like a game in progress
+        for _ in range(8):
+            game_logic.end_turn(game_state, game_state["current_turn"])
+        rooms.append(game_state)
+    return rooms
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, size
+
+if __name__ == "__main__":
+    room_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    rooms = build_rooms(room_count)
+
+    # Both sides are rebuilt from the same rooms, so templates and log strings are shared alike
+    dict_rooms, dict_bytes = measure(lambda: [RoomState.from_game_state(room).to_game_state() for room in rooms])
+    model_rooms, model_bytes = measure(lambda: [RoomState.from_game_state(room) for room in rooms])
+
+    for room in rooms[:20]:
+        round_trip = RoomState.from_game_state(room).to_game_state()
+        for player_id in room["players"]:
+            assert json.dumps(game_logic.get_game_state_for_player(round_trip, player_id)) == json.dumps(game_logic.get_game_state_for_player(room, player_id)), \
+                "RoomState round trip changed the wire format"
+
+    print(f"rooms: {room_count}")
+    print(f"dict game_state: {dict_bytes / room_count:10.0f} bytes/room")
+    print(f"RoomState:       {model_bytes / room_count:10.0f} bytes/room")
@@ -0,0 +1,74 @@
+# sleepy-game/backend/benchmarks/bench_room_recovery.py
+# Startup recovery time of the SQLite room store against the number of stored rooms.
+# Each room is a bot game played some turns into a fresh database through the same
+# journal/snapshot path the server uses; the store is then reloaded and every rebuilt
+# room is compared with the live one it came from, and its character index checked.
+# Run from sleepy-game/backend: python benchmarks/bench_room_recovery.py 100 1000 5000
+import json
+import logging
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bot_ai
+import game_logic
+import room_store
+
+def populate(store, room_count, turns, total_players=4):
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    rooms = {}
+    for number in range(room_count):
+        room_id = str(1000 + number)
+        game_state = game_logic.initialize_game(total_players, total_players, player_ids, seed=number)
+        room_data = {"game_state": game_state, "player_sids": {p_id: {"sid": None, "is_bot": True} for p_id in player_ids},
+                     "total_players": total_players, "num_bots": total_players}
+        store.save_room(room_id, room_data)
+        # Stop at a room-specific turn so rooms are spread across snapshot + tail positions
+        for _ in range(random.randrange(1, turns + 1)):
+            if game_logic.check_win_condition(game_state)["game_over"]:
+                break
+            game_state = bot_ai.make_bot_move(game_state)
+            game_state["revision"] += 1
+            store.after_update(room_id, game_state)
+        rooms[room_id] = game_state
+    return rooms
+
+def view(game_state):
+    return json.dumps({p_id: game_logic.get_game_state_for_player(game_state, p_id) for p_id in game_state["players"]}, sort_keys=True)
+
+def run(room_count, turns):
+    path = os.path.join(tempfile.mkdtemp(), "rooms.db")
+    store = room_store.SqliteRoomStore(path)
+    started = time.perf_counter()
+    rooms = populate(store, room_count, turns)
+    store.flush(timeout=120)
+    write_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    restored = list(store.load_rooms())
+    recovery_seconds = time.perf_counter() - started
+
+    assert len(restored) == room_count, f"restored {len(restored)} of {room_count} rooms"
+    for room_id, _, _, game_state in restored:
+        live = rooms[room_id]
+        assert view(game_state) == view(live), f"room {room_id} differs after recovery"
+        assert game_state["rng"].getstate() == live["rng"].getstate(), f"room {room_id} rng differs after recovery"
+        game_logic.validate_character_index(game_state)
+        # Clones (search bots) and their pickled copies (the bot pool) rebuild the index too
+        clone = game_logic.clone_game_state(game_state)
+        game_logic.validate_character_index(clone)
+        game_logic.validate_character_index(pickle.loads(pickle.dumps(clone)))
+    store.close()
+
+    print(f"{room_count:6d} rooms  write {write_seconds:7.2f}s  recover {recovery_seconds:7.2f}s  ({recovery_seconds / room_count * 1000:6.2f} ms/room, {os.path.getsize(path) / 1024:8.0f} KB)")
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    random.seed(0)
+    for count in [int(arg) for arg in sys.argv[1:]] or [100, 1000]:
+        run(count, turns=30)
@@ -0,0 +1,82 @@
+# sleepy-game/backend/benchmarks/bench_search_bot.py
+# Strength and speed of the search bot tier. Strength: one search bot plays against
+# greedy bots, moving through every seat so first-player advantage cancels out, and
+# its win rate is compared with the 1/players a greedy bot would get. Speed: search
+# nodes per second and the cost of clone_game_state against copy.deepcopy.
+# Run from sleepy-game/backend: python benchmarks/bench_search_bot.py --games 40
+import argparse
+import copy
+import logging
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bot_ai
+import game_logic
+import search_bot
+
+def play_game(seed, total_players, search_seat, budget_ms, max_turns=300):
+    random.seed(seed)
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    game_state = game_logic.initialize_game(total_players, total_players, player_ids, seed)
+    search_player_id = player_ids[search_seat]
+
+    for _ in range(max_turns):
+        win_status = game_logic.check_win_condition(game_state)
+        if win_status["game_over"] or game_state["game_over"]:
+            return win_status["winner"] or game_state["winner"], search_player_id
+        if game_state["current_turn"] == search_player_id:
+            game_state = search_bot.make_search_bot_move(game_state, budget_ms)
+        else:
+            game_state = bot_ai.make_bot_move(game_state)
+    return None, search_player_id
+
+def measure_strength(games, total_players, budget_ms, base_seed):
+    wins = unfinished = 0
+    for game_number in range(games):
+        winner, search_player_id = play_game(base_seed + game_number, total_players, game_number % total_players, budget_ms)
+        wins += winner == search_player_id
+        unfinished += winner is None
+    print(f"search bot ({budget_ms} ms/move) vs {total_players - 1} greedy bots over {games} games:")
+    print(f"  win rate {wins / games:6.1%}   (greedy baseline {1 / total_players:6.1%}, unfinished {unfinished})")
+
+def measure_speed(total_players, budget_ms, positions, base_seed):
+    # Positions taken from greedy self-play a few turns in, so hands and boards vary
+    rng = random.Random(base_seed)
+    random.seed(base_seed)
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    iterations = nodes = elapsed_ms = 0
+    for _ in range(positions):
+        game_state = game_logic.initialize_game(total_players, total_players, player_ids)
+        for _ in range(rng.randrange(0, 3 * total_players)):
+            if game_logic.check_win_condition(game_state)["game_over"]:
+                break
+            game_state = bot_ai.make_bot_move(game_state)
+        if game_logic.check_win_condition(game_state)["game_over"]:
+            continue
+        _, stats = search_bot.choose_action(game_state, game_state["current_turn"], budget_ms, rng)
+        iterations += stats["iterations"]
+        nodes += stats["nodes"]
+        elapsed_ms += stats["elapsed_ms"]
+    print(f"search speed over {positions} positions: {nodes / (elapsed_ms / 1000):,.0f} nodes/sec, {iterations / (elapsed_ms / 1000):,.0f} iterations/sec")
+
+    game_state = game_logic.initialize_game(total_players, total_players, player_ids)
+    clone_seconds = min(timeit.repeat(lambda: game_logic.clone_game_state(game_state), number=2000, repeat=3)) / 2000
+    deepcopy_seconds = min(timeit.repeat(lambda: copy.deepcopy(game_state), number=200, repeat=3)) / 200
+    print(f"clone_game_state {clone_seconds * 1e6:8.1f} us    copy.deepcopy {deepcopy_seconds * 1e6:8.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the search bot tier against the greedy bot.")
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--budget-ms", type=int, default=search_bot.DEFAULT_SEARCH_BUDGET_MS)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    measure_speed(args.players, args.budget_ms, args.positions, args.seed)
+    measure_strength(args.games, args.players, args.budget_ms, args.seed)
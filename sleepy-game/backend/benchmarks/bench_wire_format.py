@@ -0,0 +1,80 @@
+# sleepy-game/backend/benchmarks/bench_wire_format.py
+# Bytes and encode time per game_update payload: full card and character objects
+# (the old wire format) versus catalog ids, each through the stdlib json module,
+# orjson and msgpack when they are installed. Payloads come from greedy bot games,
+# one per player per applied action, exactly as send_game_update builds them.
+# Run from sleepy-game/backend: python benchmarks/bench_wire_format.py --games 50
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import bot_ai
+import catalog
+import game_logic
+import state_sync
+
+def collect_updates(games, total_players, seed, max_moves=300):
+    """Returns (full, compact) lists of game_update payloads from bot self-play."""
+    random.seed(seed)
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    full, compact = [], []
+    for game_number in range(games):
+        game_state = game_logic.initialize_game(total_players, total_players, player_ids, seed + game_number)
+        snapshot = state_sync.take_snapshot(game_state)
+        for _ in range(max_moves):
+            win_status = game_logic.check_win_condition(game_state)
+            if win_status["game_over"]:
+                break
+            game_state = bot_ai.make_bot_move(game_state)
+            game_state["revision"] += 1
+            delta = state_sync.build_public_delta(snapshot, game_state)
+            hands = state_sync.build_hand_deltas(snapshot, game_state)
+            for p_id in player_ids:
+                payload = {"player_id": p_id, "revision": game_state["revision"], "base_revision": snapshot["revision"],
+                           "delta": delta, "hand": hands.get(p_id), "win_status": win_status}
+                full.append(json.loads(json.dumps(payload))) # Detached from the live state
+                compact.append(dict(payload, delta=catalog.encode_delta(delta), hand=hands.get(p_id) and catalog.encode_hand(hands[p_id])))
+            snapshot = state_sync.take_snapshot(game_state)
+    return full, compact
+
+def encoders():
+    yield "json", lambda value: json.dumps(value, separators=(",", ":")).encode()
+    try:
+        import orjson
+        yield "orjson", orjson.dumps
+    except ImportError:
+        print("orjson not installed, skipped (pip install orjson)")
+    try:
+        import msgpack
+        yield "msgpack", msgpack.packb
+    except ImportError:
+        print("msgpack not installed, skipped (pip install msgpack)")
+
+def measure(encode, payloads, repeat):
+    packets = [["game_update", payload] for payload in payloads]
+    size = sum(len(encode(packet)) for packet in packets)
+    seconds = min(timeit.repeat(lambda: [encode(packet) for packet in packets], number=1, repeat=repeat))
+    return size / len(packets), seconds / len(packets) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare game_update wire formats and JSON encoders.")
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    full, compact = collect_updates(args.games, args.players, args.seed)
+    print(f"{len(full)} game_update payloads from {args.games} games of {args.players} bots; catalog is {len(catalog.CATALOG_JSON)} bytes, sent once")
+    for name, encode in encoders():
+        full_bytes, full_us = measure(encode, full, args.repeat)
+        compact_bytes, compact_us = measure(encode, compact, args.repeat)
+        print(f"{name:8s} full objects {full_bytes:7.0f} B {full_us:6.1f} us    ids {compact_bytes:7.0f} B {compact_us:6.1f} us    "
+              f"({compact_bytes / full_bytes:5.1%} of the bytes)")
@@ -0,0 +1,113 @@
+# sleepy-game/backend/benchmarks/check_batch_engine.py
+# Differential check of batch_engine against game_logic: random games are advanced
+# with random character-card plays through both apply_pending_action (one dict state
+# at a time) and batch_engine.play_from_hand (all games at once), and after every
+# step the arrays must equal a fresh BatchState built from the dict states, and the
+# two check_win_condition results must agree. Exits non-zero on the first mismatch.
+# Run from sleepy-game/backend: python benchmarks/check_batch_engine.py --games 500 --steps 60
+import argparse
+import logging
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import batch_engine
+import game_logic
+
+CHARACTER_CARD_TYPES = ("attack", "support", "lucky")
+
+def random_play(game_state, rng):
+    """
+    Picks a random character card in a random player's hand and a random target
+    character (asleep ones included; apply_pending_action does not filter them).
+    Returns (player index, hand slot, target player index, target slot) or None.
+    """
+    turn_order = game_state["player_turn_order"]
+    p = rng.randrange(len(turn_order))
+    hand = game_state["players"][turn_order[p]]["hand"]
+    slots = [slot for slot, card in enumerate(hand) if card["type"] in CHARACTER_CARD_TYPES]
+    if not slots:
+        return None
+    slot = rng.choice(slots)
+    if hand[slot]["type"] == "lucky":
+        target_p = p # Lucky only targets own characters
+    else:
+        target_p = rng.randrange(len(turn_order))
+    return p, slot, target_p, rng.randrange(game_logic.INITIAL_CHARACTERS_PER_PLAYER)
+
+def compare(batch, game_states, step):
+    expected = batch_engine.BatchState.from_game_states(game_states)
+    for field in ("current_sleep", "max_sleep", "is_asleep", "sleep_count", "hands"):
+        mismatch = np.argwhere(getattr(batch, field) != getattr(expected, field))
+        if len(mismatch):
+            k = mismatch[0][0]
+            raise AssertionError(f"step {step}: {field} differs in game {k}: batch {getattr(batch, field)[k].tolist()} vs dict {getattr(expected, field)[k].tolist()}")
+
+    game_over, winner = batch_engine.check_win_condition(batch)
+    for k, game_state in enumerate(game_states):
+        win_status = game_logic.check_win_condition(game_state)
+        expected_winner = game_state["player_turn_order"].index(win_status["winner"]) if win_status["winner"] else -1
+        if bool(game_over[k]) != win_status["game_over"] or int(winner[k]) != expected_winner:
+            raise AssertionError(f"step {step}: win condition differs in game {k}: batch ({game_over[k]}, {winner[k]}) vs dict {win_status}")
+
+def run_check(games, players, steps, seed):
+    rng = random.Random(seed)
+    random.seed(seed)
+    player_ids = [f"player{i}" for i in range(1, players + 1)]
+    game_states = [game_logic.initialize_game(players, players, player_ids) for _ in range(games)]
+    batch = batch_engine.BatchState.from_game_states(game_states)
+    compare(batch, game_states, 0)
+
+    plays = 0
+    for step in range(1, steps + 1):
+        moves = np.full((4, games), -1, np.int64)
+        moves[0] = moves[2] = moves[3] = 0
+        for k, game_state in enumerate(game_states):
+            play = random_play(game_state, rng)
+            if play is None:
+                continue
+            p, slot, target_p, target_slot = play
+            moves[:, k] = play
+            turn_order = game_state["player_turn_order"]
+            card = game_state["players"][turn_order[p]]["hand"].pop(slot)
+            game_logic.apply_pending_action(game_state, turn_order[p], card, f"{turn_order[target_p]}_char_{target_slot}")
+            plays += 1
+        batch_engine.play_from_hand(batch, moves[0], moves[1], moves[2], moves[3])
+        compare(batch, game_states, step)
+        for game_state in game_states:
+            game_logic.validate_character_index(game_state) # The plays above went through characters_by_id
+
+        # Refill hands so later steps still have cards. Draws are random, so the batch
+        # path is only checked for keeping existing cards and filling every gap.
+        if step % 5 == 0:
+            for p in range(players):
+                refilled = batch.copy()
+                batch_engine.draw_cards(refilled, np.full(games, p), np.random.default_rng(seed + step))
+                kept = batch.hands[:, p] != batch_engine.NO_CARD
+                if (refilled.hands[:, p] == batch_engine.NO_CARD).any() or (refilled.hands[:, p][kept] != batch.hands[:, p][kept]).any():
+                    raise AssertionError(f"step {step}: draw_cards did not refill player {p} correctly")
+            for game_state in game_states:
+                for p_id in game_state["player_turn_order"]:
+                    game_logic.draw_cards_for_player(game_state, p_id)
+            batch = batch_engine.BatchState.from_game_states(game_states)
+
+    print(f"OK: {games} games x {steps} steps ({plays} plays) match game_logic")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-check batch_engine against game_logic.")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--steps", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    try:
+        run_check(args.games, args.players, args.steps, args.seed)
+    except AssertionError as e:
+        print(f"MISMATCH: {e}")
+        sys.exit(1)
@@ -0,0 +1,91 @@
+# sleepy-game/backend/benchmarks/check_game_record.py
+# End-to-end check of /rooms/<id>/record through the Flask and Socket.IO test
+# clients (no network): bot games are played to a win by sleep count, the record
+# must be refused while the game runs and served once it is won, and replaying the
+# download must rebuild the live game exactly. Every other game has a second human
+# who leaves, so a bot takes their seat over mid-game. Exits non-zero on a failure.
+# Run from sleepy-game/backend: python benchmarks/check_game_record.py --games 5
+import argparse
+import logging
+import os
+import sys
+
+os.environ.setdefault("ROOM_STORE", "none")
+os.environ.setdefault("GAME_RECORDS_DIR", "")
+os.environ.setdefault("METRICS", "0")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app
+import eventlet
+import game_record
+
+MAX_STEPS = 5000
+
+def play_out(client, room_id, player_id):
+    """Has the human in `player_id` pass every turn and decline every attack until the game is won."""
+    room_data = app.game_rooms[room_id]
+    for _ in range(MAX_STEPS):
+        if 'finished_at' in room_data:
+            return
+        game_state = room_data['game_state']
+        pending_attack = game_state.get('pending_attack')
+        if pending_attack and pending_attack['target_player_id'] == player_id:
+            client.emit('resolve_pending_attack', {'room_id': room_id, 'player_id': player_id, 'useDefense': False})
+        elif not pending_attack and game_state['current_turn'] == player_id:
+            client.emit('end_turn', {'room_id': room_id, 'player_id': player_id})
+        client.get_received()
+        eventlet.sleep(0.001) # Lets the bot scheduler run
+    raise AssertionError(f"room {room_id}: no winner after {MAX_STEPS} steps")
+
+def take_over_seat(client, room_id, player_id):
+    # Leaves and lets the grace period run out at once instead of after RESUME_GRACE_SECONDS
+    client.disconnect()
+    app.expire_seat(room_id, player_id, app.game_rooms[room_id]['player_sids'][player_id]['disconnected_at'])
+    assert app.game_rooms[room_id]['game_state']['players'][player_id]['is_bot'], f"room {room_id}: no bot took over {player_id}"
+
+def check_game(total_players, leaver):
+    client = app.socketio.test_client(app.app)
+    client.emit('create_room', {'total_players': total_players, 'num_bots': total_players - 1 - leaver, 'bot_think_time': 0})
+    if leaver:
+        room_id = client.get_received()[-1]['args'][0]['room_id']
+        other = app.socketio.test_client(app.app)
+        other.emit('join_room', {'room_id': room_id})
+        other_player_id = next(message for message in other.get_received() if message['name'] == 'room_joined')['args'][0]['player_id']
+    start = next(message for message in client.get_received() if message['name'] == 'game_start')['args'][0]
+    room_id, player_id = start['room_id'], start['player_id']
+    http = app.app.test_client()
+    try:
+        response = http.get(f'/rooms/{room_id}/record')
+        assert response.status_code == 403, f"room {room_id}: record served while the game runs ({response.status_code})"
+
+        if leaver:
+            take_over_seat(other, room_id, other_player_id)
+        play_out(client, room_id, player_id)
+        game_state = app.game_rooms[room_id]['game_state']
+        win_status = app.check_win_condition(game_state)
+        response = http.get(f'/rooms/{room_id}/record')
+        assert response.status_code == 200, f"room {room_id}: record of a won game refused ({response.status_code}, {win_status['message']})"
+        replayed = game_record.replay(response.data)
+        assert game_record.state_digest(replayed) == game_record.state_digest(game_state), f"room {room_id}: replay differs from the live game"
+        bots = lambda state: [p_id for p_id in state['player_turn_order'] if state['players'][p_id]['is_bot']]
+        assert bots(replayed) == bots(game_state), f"room {room_id}: replay ends with bots in {bots(replayed)}, the live game in {bots(game_state)}"
+        return win_status
+    finally:
+        client.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch and replay the records of finished games.")
+    parser.add_argument("--games", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    try:
+        by_sleep = 0
+        for number in range(args.games):
+            win_status = check_game(3 + number % 2, leaver=number % 2 == 1)
+            by_sleep += "putting all their characters to sleep" in win_status["message"]
+    except AssertionError as e:
+        print(f"MISMATCH: {e}")
+        sys.exit(1)
+    print(f"OK: {args.games} finished games ({by_sleep} won by sleep count, {args.games // 2} with a seat taken over) served and replayed")
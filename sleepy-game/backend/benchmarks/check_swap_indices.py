@@ -0,0 +1,73 @@
+# sleepy-game/backend/benchmarks/check_swap_indices.py
+# Reproducer for the Swap index bug. The frontend and both bot tiers pick the cards
+# to give from the hand as shown, Swap card included, but the rules used to remove
+# the Swap card first: a pick after it gave away the next card, or (the last card)
+# was out of range and left the swap pending forever. Plays Swaps with picks on
+# both sides of the Swap card and checks exactly the picked cards change hands, and
+# that picking the Swap card itself is refused. Exits non-zero on a failure.
+# Run from sleepy-game/backend: python benchmarks/check_swap_indices.py
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import game_logic
+
+CARDS = {card["name"]: card for card in game_logic.ACTION_CARD_TEMPLATES}
+
+# (my hand, opponent's hand, picks as [mine, theirs], card I give or None if refused). One card each,
+# so the check is about which card a pick means, not the order multi-card swaps are carried out in
+CASES = [
+    (["Acid_reflux", "Swap", "Eye_patch", "Tea"], ["Coffee"], [2, 0], ["Eye_patch"]), # Used to give Tea
+    (["Acid_reflux", "Swap", "Eye_patch"], ["Coffee"], [2, 0], ["Eye_patch"]), # Used to be out of range
+    (["Acid_reflux", "Swap", "Eye_patch"], ["Coffee"], [0, 0], ["Acid_reflux"]),
+    (["Swap", "Eye_patch", "Tea"], ["Coffee"], [2, 0], ["Tea"]),
+    (["Eye_patch", "Tea", "Swap"], ["Coffee"], [1, 0], ["Tea"]),
+    (["Acid_reflux", "Swap", "Eye_patch"], ["Coffee"], [1, 0], None), # The Swap card itself
+]
+
+def play_swap(my_cards, their_cards, picks):
+    game_state = game_logic.initialize_game(2, 0, ["player1", "player2"], seed=1)
+    me, them = game_state["players"]["player1"], game_state["players"]["player2"]
+    me["hand"] = game_logic.Hand(dict(CARDS[name]) for name in my_cards)
+    them["hand"] = game_logic.Hand(dict(CARDS[name]) for name in their_cards)
+    me["has_defense_card_in_hand"] = them["has_defense_card_in_hand"] = False # No Defense answer: the swap lands at once
+    game_state["current_turn"] = "player1"
+    game_state = game_logic.apply_action(game_state, "player1", {"kind": "play_card", "card_index": my_cards.index("Swap"),
+                                                                  "target_card_indices": picks, "target_player_id": "player2"})
+    return game_state
+
+def check(my_cards, their_cards, picks, given):
+    label = f"{my_cards} <-> {their_cards} picks {picks}"
+    try:
+        game_state = play_swap(my_cards, their_cards, picks)
+    except ValueError as e:
+        if given is None:
+            return None
+        return f"{label}: refused ({e})"
+    if given is None:
+        return f"{label}: the Swap card itself was accepted"
+    if game_state.get("pending_attack"):
+        return f"{label}: swap still pending"
+    received = [their_cards[index] for index in picks[1::2]]
+    kept = list(my_cards)
+    kept.remove("Swap")
+    for name in given:
+        kept.remove(name)
+    expected_mine = sorted(kept + received)
+    expected_theirs = sorted([name for index, name in enumerate(their_cards) if index not in picks[1::2]] + given)
+    mine = sorted(card["name"] for card in game_state["players"]["player1"]["hand"])
+    theirs = sorted(card["name"] for card in game_state["players"]["player2"]["hand"])
+    if (mine, theirs) != (expected_mine, expected_theirs):
+        return f"{label}: hands {mine} / {theirs}, expected {expected_mine} / {expected_theirs}"
+    return None
+
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+    failures = [failure for failure in (check(*case) for case in CASES) if failure]
+    for failure in failures:
+        print("MISMATCH " + failure)
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(CASES)} swaps give exactly the picked cards")
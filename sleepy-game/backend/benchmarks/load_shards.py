@@ -0,0 +1,73 @@
+# sleepy-game/backend/benchmarks/load_shards.py
+# How room capacity scales with the number of backend workers. Each worker is a
+# separate process running app.py as one shard (SHARD_ID / SHARD_COUNT), hosting
+# rooms of one scripted human and three bots with zero think time through Flask-
+# SocketIO test clients, so the measurement is game handling rather than networking.
+# A worker reports how many turn updates per second it delivered; with bots thinking
+# the default 1 s, that is roughly how many rooms the worker can keep busy.
+# Run from sleepy-game/backend: python benchmarks/load_shards.py --workers 1 2 4 --rooms 50
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+def run_worker(shard_id, shard_count, rooms, seconds):
+    os.environ.update({"SHARD_ID": str(shard_id), "SHARD_COUNT": str(shard_count), "ROOM_STORE": "none", "LOG_LEVEL": "WARNING"})
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+    import eventlet
+
+    def open_room(client):
+        client.emit("create_room", {"total_players": 4, "num_bots": 3, "bot_think_time": 0})
+        created = next(message["args"][0] for message in client.get_received() if message["name"] == "room_created")
+        assert backend.room_ids.owns(created["room_id"]), f"room {created['room_id']} allocated outside shard {shard_id}"
+        return created["room_id"]
+
+    clients = [backend.socketio.test_client(backend.app) for _ in range(rooms)]
+    room_of = {index: open_room(client) for index, client in enumerate(clients)}
+    updates = games = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for index, client in enumerate(clients):
+            room_id = room_of[index]
+            game_state = backend.game_rooms[room_id]["game_state"]
+            if game_state["game_over"] or backend.check_win_condition(game_state)["game_over"]:
+                games += 1
+                room_of[index] = open_room(client)
+            elif game_state["current_turn"] == "player1" and not game_state.get("pending_attack"):
+                client.emit("end_turn", {"room_id": room_id, "player_id": "player1"})
+            elif game_state.get("pending_attack") and game_state["pending_attack"]["target_player_id"] == "player1":
+                client.emit("resolve_pending_attack", {"room_id": room_id, "player_id": "player1", "useDefense": False})
+            updates += sum(message["name"] == "game_update" for message in client.get_received())
+        eventlet.sleep(0) # Let the bot scheduler run
+    return {"shard_id": shard_id, "updates_per_sec": updates / seconds, "games": games}
+
+def run(workers, rooms, seconds):
+    # Plain subprocesses rather than multiprocessing: app.py monkey-patches threading,
+    # which breaks multiprocessing.Queue's feeder thread in the children
+    processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", str(shard_id), str(workers), str(rooms), str(seconds)],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+                 for shard_id in range(workers)]
+    reports = [json.loads(process.communicate()[0].splitlines()[-1]) for process in processes]
+    total = sum(report["updates_per_sec"] for report in reports)
+    print(f"{workers} worker(s): {total:10,.0f} updates/sec total, {total / workers:10,.0f} per worker, "
+          f"{sum(report['games'] for report in reports)} games finished")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure game throughput as backend shards are added.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rooms", type=int, default=50, help="Concurrent rooms per worker.")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--worker", type=float, nargs=4, metavar=("SHARD_ID", "SHARD_COUNT", "ROOMS", "SECONDS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        shard_id, shard_count, rooms, seconds = args.worker
+        print(json.dumps(run_worker(int(shard_id), int(shard_count), int(rooms), seconds)))
+        sys.exit()
+    print(f"CPUs available: {os.cpu_count()}")
+    for workers in args.workers:
+        run(workers, args.rooms, args.seconds)
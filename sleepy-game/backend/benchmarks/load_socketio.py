@@ -0,0 +1,301 @@
+# sleepy-game/backend/benchmarks/load_socketio.py
+# End-to-end load test of the Socket.IO server over real localhost connections.
+# For each (rooms, bots) configuration it starts a fresh app.py, opens one
+# python-socketio client per human seat, creates and joins rooms, and plays simple
+# legal moves (play_card / resolve_pending_attack / end_turn) at a human-like pace.
+# Finished rooms are replaced, so the number of live rooms stays constant. Reports
+# latency percentiles per event (emit -> first reply), messages/sec received, errors
+# and the server's RSS.
+# Needs the client extras: pip install "python-socketio[client]" (requests, websocket-client)
+# Run from sleepy-game/backend:
+#   python benchmarks/load_socketio.py --rooms 10 100 500 --bots 0 1 2 --players 3 --seconds 30
+# Socket latency under heavy bot load, bots on the event loop vs. in the worker pool:
+#   python benchmarks/load_socketio.py --rooms 50 --bots 0 2 --bot-tier search --bot-search-ms 300 --bot-pool 0 2
+import eventlet
+eventlet.monkey_patch() # Thousands of clients as green threads
+
+import argparse
+import collections
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import socketio
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PLAYABLE_TYPES = ("attack", "support", "lucky")
+MAX_PLAYS_PER_TURN = 3
+
+def new_client():
+    # No Origin header: app.py only accepts the frontend's origin from browsers
+    return socketio.Client(reconnection=False, websocket_extra_options={"suppress_origin": True})
+
+class Stats:
+    def __init__(self):
+        self.latencies = collections.defaultdict(list) # event -> seconds
+        self.messages = 0
+        self.errors = collections.Counter()
+        self.resyncs = 0
+        self.games_finished = 0
+
+    def percentiles(self, event):
+        samples = sorted(self.latencies[event])
+        if not samples:
+            return None
+        pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+        return len(samples), pick(0.5), pick(0.95), pick(0.99)
+
+class SimulatedPlayer:
+    """One human seat: a Socket.IO client keeping its own view of the game from game_start and game_update deltas."""
+
+    def __init__(self, url, cards, stats, move_delay, rng):
+        self.url = url
+        self.cards = cards
+        self.stats = stats
+        self.move_delay = move_delay
+        self.rng = rng
+        self.client = new_client()
+        self.room_id = self.player_id = None
+        self.view = self.hand = None
+        self.awaiting = None # (event, sent_at) of the last emit without a reply yet
+        self.acted_revision = None
+        self.plays_this_turn = 0
+        self.joined = eventlet.event.Event()
+        self.done = eventlet.event.Event()
+        for name in ("room_created", "room_joined", "game_start", "game_update", "game_resync", "error", "join_error", "room_closed", "player_disconnected"):
+            self.client.on(name, self._handler(name))
+
+    def _handler(self, name):
+        def handle(data):
+            self.stats.messages += 1
+            self.reply_received()
+            getattr(self, f"on_{name}", lambda data: None)(data)
+        return handle
+
+    def connect(self):
+        self.client.connect(self.url, transports=["websocket"])
+
+    def emit(self, event, data):
+        self.awaiting = (event, time.perf_counter())
+        self.client.emit(event, data)
+
+    def reply_received(self):
+        if self.awaiting:
+            event, sent_at = self.awaiting
+            self.stats.latencies[event].append(time.perf_counter() - sent_at)
+            self.awaiting = None
+
+    def expand_hand(self, card_ids):
+        # Payloads carry card ids; the rest comes from the server's /catalog
+        return [self.cards[card_id] for card_id in card_ids]
+
+    def on_room_created(self, data):
+        if 'player_id' in data: # Later room_created messages are lobby updates for everyone
+            self.room_id, self.player_id = data['room_id'], data['player_id']
+            self.joined.send(data['room_id'])
+
+    def on_room_joined(self, data):
+        self.room_id, self.player_id = data['room_id'], data['player_id']
+        self.joined.send(data['room_id'])
+
+    def on_join_error(self, data):
+        self.stats.errors[f"join: {data['message']}"] += 1
+        if not self.joined.ready():
+            self.joined.send(None)
+        self.finish()
+
+    def on_game_start(self, data):
+        self.player_id = data['player_id']
+        self.view, self.hand = data['game_state'], self.expand_hand(data['hand'])
+        self.schedule_move()
+
+    def on_game_update(self, data):
+        if self.view is None or data['base_revision'] != self.view['revision']:
+            self.stats.resyncs += 1
+            self.client.emit('request_resync', {'room_id': self.room_id, 'revision': self.view and self.view['revision']})
+            return
+        delta = data['delta']
+        self.view.update(delta['fields'])
+        self.view['revision'] = data['revision']
+        for p_id, summary in delta['players'].items():
+            self.view['players'][p_id].update(summary)
+        for character in delta['characters']:
+            characters = self.view['players'][character['player_id']]['characters']
+            characters[:] = [character if c['id'] == character['id'] else c for c in characters]
+        if data['hand'] is not None:
+            self.hand = self.expand_hand(data['hand'])
+        if data['win_status']['game_over']:
+            self.stats.games_finished += self.player_id == 'player1' # Count each game once
+            self.finish()
+        else:
+            self.schedule_move()
+
+    def on_game_resync(self, data):
+        self.view = data['game_state']
+        self.hand = self.expand_hand(self.view['players'][self.player_id]['hand'])
+        self.schedule_move()
+
+    def on_error(self, data):
+        self.stats.errors[data.get('code') or data['message']] += 1
+        self.acted_revision = None # Try again on the same revision
+        self.schedule_move()
+
+    def on_room_closed(self, data):
+        self.finish()
+
+    def on_player_disconnected(self, data):
+        if not data.get('grace_seconds'):
+            self.finish()
+
+    def finish(self):
+        if not self.done.ready():
+            self.done.send(True)
+
+    def schedule_move(self):
+        eventlet.spawn_after(self.rng.uniform(0.5, 1.5) * self.move_delay, self.move)
+
+    def move(self):
+        view = self.view
+        if self.done.ready() or not self.client.connected or view is None or view['game_over'] or self.acted_revision == view['revision'] or self.awaiting:
+            return
+        pending = view['pending_attack']
+        if pending and pending['target_player_id'] == self.player_id:
+            self.acted_revision = view['revision']
+            defense_index = next((i for i, card in enumerate(self.hand) if card['type'] == 'defense'), None)
+            self.emit('resolve_pending_attack', {'room_id': self.room_id, 'player_id': self.player_id, 'revision': view['revision'],
+                                                 'useDefense': defense_index is not None, 'defending_card_index': defense_index})
+        elif view['current_turn'] == self.player_id and not pending and not view['swap_in_progress']:
+            self.acted_revision = view['revision']
+            play = self.choose_play() if self.plays_this_turn < MAX_PLAYS_PER_TURN else None
+            if play:
+                self.plays_this_turn += 1
+                card_index, character = play
+                self.emit('play_card', {'room_id': self.room_id, 'player_id': self.player_id, 'revision': view['revision'],
+                                        'card_index': card_index, 'target_character_id': character['id'],
+                                        'target_player_for_thief_swap': character['player_id']})
+            else:
+                self.plays_this_turn = 0
+                self.emit('end_turn', {'room_id': self.room_id, 'player_id': self.player_id, 'revision': view['revision']})
+
+    def choose_play(self):
+        # Support/lucky cards on our own awake characters, attacks on an opponent's
+        own, others = [], []
+        for p_id, p_data in self.view['players'].items():
+            if p_data['has_lost']:
+                continue
+            awake = [c for c in p_data['characters'] if not c['is_asleep']]
+            (own if p_id == self.player_id else others).extend(awake)
+        options = []
+        for index, card in enumerate(self.hand):
+            if card['type'] in PLAYABLE_TYPES:
+                targets = others if card['type'] == 'attack' else own
+                if targets:
+                    options.append((index, self.rng.choice(targets)))
+        return self.rng.choice(options) if options else None
+
+def run_room(url, cards, stats, players, bots, room_settings, move_delay, stop_at, rng):
+    """Keeps one room busy until stop_at, starting a new game whenever one ends."""
+    while time.perf_counter() < stop_at:
+        seats = [SimulatedPlayer(url, cards, stats, move_delay, rng) for _ in range(players - bots)]
+        try:
+            for seat in seats:
+                seat.connect()
+            host = seats[0]
+            host.emit('create_room', dict(room_settings, total_players=players, num_bots=bots))
+            room_id = host.joined.wait()
+            for seat in seats[1:]:
+                seat.emit('join_room', {'room_id': room_id})
+                seat.joined.wait()
+            with eventlet.Timeout(max(stop_at - time.perf_counter(), 0), False):
+                for seat in seats:
+                    seat.done.wait()
+        except Exception as e:
+            stats.errors[f"client: {type(e).__name__}"] += 1
+            eventlet.sleep(1)
+        finally:
+            for seat in seats:
+                if seat.client.connected:
+                    seat.client.disconnect()
+
+def server_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+def start_server(port, bot_pool=None):
+    env = dict(os.environ, PORT=str(port), ROOM_STORE="none", LOG_LEVEL="WARNING")
+    if bot_pool is not None:
+        env["BOT_POOL_WORKERS"] = str(bot_pool)
+    server = subprocess.Popen([sys.executable, "app.py"], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        probe = new_client()
+        try:
+            probe.connect(f"http://127.0.0.1:{port}", transports=["websocket"])
+            probe.disconnect()
+            return server
+        except socketio.exceptions.ConnectionError:
+            eventlet.sleep(0.2)
+    server.kill()
+    raise RuntimeError("app.py did not start listening in time.")
+
+def run(rooms, players, bots, seconds, room_settings, move_delay, port, seed, bot_pool=None):
+    server = start_server(port, bot_pool)
+    url = f"http://127.0.0.1:{port}"
+    stats = Stats()
+    rng = random.Random(seed)
+    try:
+        with urllib.request.urlopen(f"{url}/catalog") as response:
+            cards = json.load(response)["cards"]
+        stop_at = time.perf_counter() + seconds
+        pool = eventlet.GreenPool()
+        for _ in range(rooms):
+            pool.spawn(run_room, url, cards, stats, players, bots, room_settings, move_delay, stop_at, rng)
+            eventlet.sleep(0.005) # Ramp up instead of a thundering herd of connects
+        messages_before, started = stats.messages, time.perf_counter()
+        pool.waitall()
+        elapsed = time.perf_counter() - started
+        rss = server_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"rooms {rooms:5d}  bots {bots}/{players}  clients {rooms * (players - bots):6d}  "
+          f"{(stats.messages - messages_before) / elapsed:9,.0f} msgs/s  server RSS {rss:7.1f} MB  "
+          f"games {stats.games_finished:5d}  resyncs {stats.resyncs}  {room_settings['bot_tier']} bots, pool {'default' if bot_pool is None else bot_pool}")
+    for event in ("create_room", "join_room", "play_card", "resolve_pending_attack", "end_turn"):
+        result = stats.percentiles(event)
+        if result:
+            count, p50, p95, p99 = result
+            print(f"    {event:24s} n={count:7d}  p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms")
+    if stats.errors:
+        print("    errors: " + ", ".join(f"{message} x{count}" for message, count in stats.errors.most_common(5)))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive app.py with simulated Socket.IO players and report latency.")
+    parser.add_argument("--rooms", type=int, nargs="+", default=[10, 50, 200], help="Concurrent rooms per run.")
+    parser.add_argument("--bots", type=int, nargs="+", default=[0, 1, 2], help="Bots per room per run.")
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--think-time", type=float, default=0.5, help="bot_think_time of every room.")
+    parser.add_argument("--bot-tier", choices=("greedy", "search"), default="greedy")
+    parser.add_argument("--bot-search-ms", type=int, default=150, help="Per-move budget of search bots.")
+    parser.add_argument("--bot-pool", type=int, nargs="+", default=[None], help="BOT_POOL_WORKERS per run; 0 keeps bots on the event loop.")
+    parser.add_argument("--move-delay", type=float, default=0.3, help="Mean seconds a simulated human waits before moving.")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    room_settings = {'bot_think_time': args.think_time, 'bot_tier': args.bot_tier, 'bot_search_ms': args.bot_search_ms}
+    for bot_pool in args.bot_pool:
+        for bots in args.bots:
+            if bots >= args.players:
+                continue
+            for rooms in args.rooms:
+                run(rooms, args.players, bots, args.seconds, room_settings, args.move_delay, args.port, args.seed, bot_pool)
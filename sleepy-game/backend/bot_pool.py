@@ -0,0 +1,182 @@
+# sleepy-game/backend/bot_pool.py
+# Bot decisions off the event loop. Green threads don't preempt, so a bot thinking
+# on the hub (a search bot spends its whole budget there) stalls every socket of the
+# process. Here each bot turn is sent to a worker process as a pickled snapshot of
+# the game state; the worker plays the turn on its copy and sends back the moves it
+# made, which the caller applies to the live state on the hub. The room's generator
+# travels with the snapshot, so the worker sees the same draws the hub will make.
+#
+# Workers are plain child processes running this file, talking over their stdin and
+# stdout (eventlet green pipes on our side), not multiprocessing: its helper threads
+# and fork/spawn start-up don't mix with a monkey-patched server. A job that can't
+# get a worker because BOT_POOL_MAX_QUEUE jobs are already waiting, or whose result
+# isn't back within the turn's thinking time plus BOT_MOVE_DEADLINE seconds, raises
+# BotPoolUnavailable, and the caller plays the greedy bot inline instead; a worker
+# that overran its deadline is replaced rather than waited for.
+import os
+import pickle
+import struct
+import sys
+
+if __name__ == "__main__":
+    os.environ.setdefault("METRICS", "0") # Workers report nothing; timing would only slow them down
+
+import bot_ai
+import game_logic
+import search_bot
+
+BOT_POOL_WORKERS = int(os.environ.get("BOT_POOL_WORKERS", "2")) # 0 runs every bot on the event loop, as before
+BOT_POOL_MAX_QUEUE = int(os.environ.get("BOT_POOL_MAX_QUEUE", "16")) # Jobs waiting for a busy worker
+BOT_MOVE_DEADLINE = float(os.environ.get("BOT_MOVE_DEADLINE", "5")) # Seconds from submit to result on top of turn_seconds()
+
+HEADER = struct.Struct("<I") # Length prefix of every message
+
+# Bot strength a room can choose with create_room's 'bot_tier'
+BOT_TIERS = {
+    "greedy": lambda game_state, search_ms: bot_ai.make_bot_move(game_state),
+    "search": lambda game_state, search_ms: search_bot.make_search_bot_move(game_state, search_ms),
+}
+
+def turn_seconds(tier, search_ms):
+    # Longest a bot may think about one turn: a search bot spends search_ms on each of up to MAX_PLAYS_PER_TURN plays
+    return search_ms / 1000 * search_bot.MAX_PLAYS_PER_TURN if tier == "search" else 0
+
+class BotPoolUnavailable(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason # saturated, deadline or worker_error
+
+class MoveRecorder:
+    """Stands in for the room journal on a snapshot: keeps every move apply_action made."""
+
+    def __init__(self):
+        self.moves = []
+
+    def append(self, player_id, action, revision):
+        self.moves.append((player_id, action))
+
+def play_turn(game_state, tier, search_ms):
+    """Plays the current bot's move on `game_state` and returns it as [(player_id, action)]."""
+    recorder = game_state["journal"] = MoveRecorder()
+    BOT_TIERS[tier](game_state, search_ms)
+    return recorder.moves
+
+def snapshot(game_state):
+    # Everything a bot reads, nothing of the room's journal, record or history store
+    return pickle.dumps(game_logic.clone_game_state(game_state), pickle.HIGHEST_PROTOCOL)
+
+def write_message(stream, payload):
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+def read_message(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise EOFError("Bot worker closed its pipe.")
+    size, = HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        raise EOFError("Bot worker closed its pipe.")
+    return payload
+
+class BotWorkerPool:
+    """
+    decide() blocks only the calling green thread. Workers are started on first use,
+    so importing the server (or this module) spawns nothing.
+    """
+
+    def __init__(self, size=BOT_POOL_WORKERS, max_queue=BOT_POOL_MAX_QUEUE, deadline=BOT_MOVE_DEADLINE):
+        self.size = size
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.idle = None # LightQueue of worker processes waiting for a job
+        self.busy = 0
+        self.waiting = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def _spawn(self):
+        from eventlet.green import subprocess
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    def _start(self):
+        import eventlet.queue
+        self.idle = eventlet.queue.LightQueue()
+        for _ in range(self.size):
+            self.idle.put(self._spawn())
+
+    def _replace(self, worker):
+        worker.kill()
+        worker.wait()
+        self.idle.put(self._spawn())
+
+    def decide(self, game_state, tier, search_ms):
+        """The moves the current bot makes on `game_state`, as [(player_id, action)]; raises BotPoolUnavailable."""
+        import eventlet
+        import eventlet.queue
+        if self.idle is None:
+            self._start()
+        if self.idle.qsize() == 0 and self.waiting >= self.max_queue:
+            raise BotPoolUnavailable("saturated")
+
+        job = pickle.dumps((snapshot(game_state), tier, search_ms), pickle.HIGHEST_PROTOCOL)
+        timeout = eventlet.Timeout(turn_seconds(tier, search_ms) + self.deadline)
+        worker = None
+        try:
+            self.waiting += 1
+            try:
+                worker = self.idle.get()
+            finally:
+                self.waiting -= 1
+            self.busy += 1
+            write_message(worker.stdin, job)
+            status, result = pickle.loads(read_message(worker.stdout))
+        except eventlet.Timeout as e:
+            if e is not timeout:
+                raise
+            if worker is not None:
+                self.busy -= 1
+                self._replace(worker) # Still thinking; its answer would be for a state that has moved on
+            raise BotPoolUnavailable("deadline")
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.busy -= 1
+            self._replace(worker)
+            raise BotPoolUnavailable("worker_error")
+        finally:
+            timeout.cancel()
+
+        self.busy -= 1
+        self.idle.put(worker)
+        if status != "ok":
+            raise BotPoolUnavailable("worker_error")
+        return result
+
+    def close(self):
+        if self.idle is None:
+            return
+        while self.idle.qsize():
+            worker = self.idle.get()
+            worker.stdin.close() # The worker exits at end of input
+            worker.wait()
+
+def serve(stdin, stdout):
+    # Worker loop: one job in, one (status, moves or error) out, until the server closes the pipe
+    while True:
+        try:
+            job = read_message(stdin)
+        except EOFError:
+            return
+        state_bytes, tier, search_ms = pickle.loads(job)
+        try:
+            reply = ("ok", play_turn(pickle.loads(state_bytes), tier, search_ms))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        write_message(stdout, pickle.dumps(reply, pickle.HIGHEST_PROTOCOL))
+
+if __name__ == "__main__":
+    protocol_out = sys.stdout.buffer
+    sys.stdout = sys.stderr # Stray prints must not end up in the protocol stream
+    serve(sys.stdin.buffer, protocol_out)
@@ -0,0 +1,83 @@
+# sleepy-game/backend/bot_scheduler.py
+import heapq
+import itertools
+import logging
+import time
+
+import eventlet
+import eventlet.queue
+
+logger = logging.getLogger("bot_scheduler")
+
+DEFAULT_BOT_THINK_TIME = 1.0 # Seconds a bot "thinks" before each move
+MAX_BOT_THINK_TIME = 10.0
+
+class BotScheduler:
+    """
+    Runs due bot moves for every room from a single green thread, instead of one
+    spawn_after timer per pending move. Due times sit in a heap; everything that is
+    due is run in one batch. A room has at most one pending move: scheduling a room
+    that is already waiting keeps the earlier due time, so handlers racing to trigger
+    the same bot only produce one move.
+    """
+
+    def __init__(self, callback, clock=time.monotonic):
+        self.callback = callback
+        self.clock = clock
+        self.heap = []
+        self.due_by_room = {}
+        self.sequence = itertools.count() # Tie-breaker so rooms due at the same time run in scheduling order
+        self.wakeups = eventlet.queue.LightQueue()
+        self.loop = None
+
+    def schedule(self, room_id, delay):
+        due = self.clock() + max(0.0, delay)
+        if room_id in self.due_by_room and self.due_by_room[room_id] <= due:
+            return False
+
+        self.due_by_room[room_id] = due
+        heapq.heappush(self.heap, (due, next(self.sequence), room_id))
+
+        if self.loop is None or self.loop.dead:
+            self.loop = eventlet.spawn(self._run)
+        elif self.heap[0][2] == room_id:
+            self.wakeups.put(None) # The loop may be sleeping towards a later due time
+        return True
+
+    def cancel(self, room_id):
+        # The heap entry stays behind and is skipped when it comes due
+        return self.due_by_room.pop(room_id, None) is not None
+
+    def pending_count(self):
+        return len(self.due_by_room)
+
+    def _pop_due(self):
+        now = self.clock()
+        due_rooms = []
+        while self.heap and self.heap[0][0] <= now:
+            due, _, room_id = heapq.heappop(self.heap)
+            if self.due_by_room.get(room_id) == due: # Otherwise cancelled or superseded
+                del self.due_by_room[room_id]
+                due_rooms.append(room_id)
+        return due_rooms
+
+    def _run(self):
+        while True:
+            for room_id in self._pop_due():
+                try:
+                    self.callback(room_id)
+                except Exception:
+                    logger.exception("Scheduled bot move failed in room %s.", room_id, extra={'room_id': room_id, 'action': 'bot_move'})
+
+            # Drop heap entries left behind by cancel() before deciding how long to sleep
+            while self.heap and self.due_by_room.get(self.heap[0][2]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+
+            timeout = self.heap[0][0] - self.clock() if self.heap else None
+            if timeout is not None and timeout <= 0:
+                eventlet.sleep(0) # Let handlers run between batches
+                continue
+            try:
+                self.wakeups.get(timeout=timeout)
+            except eventlet.queue.Empty:
+                pass
@@ -0,0 +1,59 @@
+# sleepy-game/backend/card_sampler.py
+import random
+
+class CardSampler:
+    """
+    Weighted sampler over card templates using Vose's alias method. The tables are
+    built once, after which every draw is O(1): one uniform pick of a column and one
+    biased coin flip. Weights can be any non-negative numbers, fractions included.
+    """
+
+    def __init__(self, templates, weight_key="rarity", rng=None):
+        self.templates = list(templates)
+        self.rng = rng or random
+        self.probabilities, self.aliases = self._build_alias_table([template[weight_key] for template in self.templates])
+
+    @staticmethod
+    def _build_alias_table(weights):
+        count = len(weights)
+        total = float(sum(weights))
+        if count == 0 or total <= 0:
+            raise ValueError("CardSampler needs at least one card with a positive weight.")
+
+        # Scale so the average column holds exactly 1.0 of probability mass
+        scaled = [weight * count / total for weight in weights]
+        probabilities = [0.0] * count
+        aliases = [0] * count
+
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+
+        while small and large:
+            small_index = small.pop()
+            large_index = large.pop()
+            probabilities[small_index] = scaled[small_index]
+            aliases[small_index] = large_index
+            # The large column donates what the small one was missing
+            scaled[large_index] = (scaled[large_index] + scaled[small_index]) - 1.0
+            if scaled[large_index] < 1.0:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+
+        # Whatever is left is 1.0 up to floating point error
+        for index in large + small:
+            probabilities[index] = 1.0
+            aliases[index] = index
+
+        return probabilities, aliases
+
+    def draw_one(self, rng=None):
+        rng = rng or self.rng
+        column = int(rng.random() * len(self.probabilities))
+        if rng.random() < self.probabilities[column]:
+            return self.templates[column]
+        return self.templates[self.aliases[column]]
+
+    def draw(self, n, rng=None):
+        rng = rng or self.rng
+        return [self.draw_one(rng) for _ in range(n)]
@@ -0,0 +1,47 @@
+# sleepy-game/backend/catalog.py
+# Wire form of cards and characters. Their static parts (card names, descriptions,
+# effects, character ages...) never change, so the client downloads them once from
+# /catalog and game payloads carry only ids: a hand is a list of card ids, and a
+# character is its template id plus the fields that change during a game.
+import hashlib
+import json
+
+from game_logic import ACTION_CARD_TEMPLATES, CHARACTER_TEMPLATES
+from models import CARD_ID_BY_NAME, CHARACTER_ID_BY_NAME
+
+CATALOG = {
+    "cards": [{"id": card_id, "name": card["name"], "type": card["type"], "effect": card["effect"],
+               "description": card["description"], "cssClass": card["cssClass"]}
+              for card_id, card in enumerate(ACTION_CARD_TEMPLATES)],
+    "characters": [{"template_id": template_id, "name": char["name"], "age": char["age"],
+                    "max_sleep": char["max_sleep"], "description": char["description"]}
+                   for template_id, char in enumerate(CHARACTER_TEMPLATES)],
+}
+CATALOG_JSON = json.dumps(CATALOG, separators=(",", ":"))
+CATALOG_ETAG = '"' + hashlib.sha1(CATALOG_JSON.encode()).hexdigest()[:16] + '"' # Changes only when the templates do
+
+def encode_hand(hand):
+    return [CARD_ID_BY_NAME[card["name"]] for card in hand]
+
+def encode_character(char):
+    return {
+        "id": char["id"],
+        "player_id": char["player_id"],
+        "template_id": CHARACTER_ID_BY_NAME[char["name"]],
+        "current_sleep": char["current_sleep"],
+        "is_asleep": char["is_asleep"],
+        "is_protected": char["is_protected"]
+    }
+
+def encode_view(view):
+    """A get_game_state_for_player view with cards and characters as ids. Returns a new dict."""
+    players = {}
+    for p_id, p_view in view["players"].items():
+        players[p_id] = dict(p_view, characters=[encode_character(char) for char in p_view["characters"]])
+        if "hand" in p_view:
+            players[p_id]["hand"] = encode_hand(p_view["hand"])
+    return dict(view, players=players)
+
+def encode_delta(delta):
+    """A state_sync public delta with characters as ids. Returns a new dict."""
+    return dict(delta, characters=[encode_character(char) for char in delta["characters"]])
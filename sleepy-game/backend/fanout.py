@@ -0,0 +1,65 @@
+# sleepy-game/backend/fanout.py
+import json
+import os
+
+import metrics
+
+try:
+    import orjson # Optional: pip install orjson
+except ImportError:
+    orjson = None
+
+# This module doubles as the json module handed to SocketIO, so that payload parts
+# shared by every recipient are encoded once per update instead of once per socket.
+# FANOUT_JSON picks the encoder: "orjson" (the default when it is installed) or "json".
+ENCODER = os.environ.get("FANOUT_JSON", "orjson" if orjson else "json")
+if ENCODER not in ("json", "orjson") or (ENCODER == "orjson" and orjson is None):
+    raise ValueError(f"Unsupported FANOUT_JSON={ENCODER!r}; use 'json', or 'orjson' with the orjson package installed.")
+
+def encode(value):
+    # Always compact; orjson has no separators option and never adds whitespace
+    if ENCODER == "orjson":
+        try:
+            return orjson.dumps(value).decode()
+        except TypeError: # orjson is stricter (e.g. non-str keys); the stdlib handles whatever it rejects
+            pass
+    return json.dumps(value, separators=(',', ':'))
+
+class RawJSON(str):
+    """Text that is already JSON-encoded and is written into the packet unchanged."""
+
+class Envelope(dict):
+    """Top-level payload whose RawJSON values are spliced in rather than re-encoded."""
+
+def encode_shared(value):
+    return RawJSON(encode(value))
+
+def dumps(obj, **kwargs):
+    # Socket.IO encodes events as [event_name, payload], so envelopes only ever show up one level down
+    if isinstance(obj, list) and any(isinstance(item, Envelope) for item in obj):
+        encoded = '[' + ','.join(dumps(item) for item in obj) + ']'
+        if obj[0] == 'game_update':
+            metrics.GAME_UPDATE_BYTES.observe(len(encoded))
+        return encoded
+    if isinstance(obj, Envelope):
+        parts = []
+        for key, value in obj.items():
+            encoded_value = value if isinstance(value, RawJSON) else encode(value)
+            parts.append(f'{json.dumps(key)}:{encoded_value}')
+        return '{' + ','.join(parts) + '}'
+    return encode(obj) # kwargs are only ever python-socketio's compact separators
+
+def loads(s, **kwargs):
+    if ENCODER == "orjson" and not kwargs:
+        return orjson.loads(s)
+    return json.loads(s, **kwargs)
+
+def emit_to_players(socketio, event, room_data, build_payload):
+    """
+    Sends each human seat its own payload, built by build_payload(player_id), directly
+    to that seat's sid. Bots have no sid and are skipped.
+    """
+    for p_id, p_data in room_data['player_sids'].items():
+        if p_data['is_bot'] or not p_data['sid']:
+            continue
+        socketio.emit(event, Envelope(build_payload(p_id)), room=p_data['sid'])
@@ -1,6 +1,14 @@
 # sleepy-game/backend/game_logic.py
 
+import itertools
+import logging
 import random
+from action_log import ActionLog
+from card_sampler import CardSampler
+import metrics
+from metrics import FUNCTION_SECONDS
+
+logger = logging.getLogger("game_logic")
 
 # Game constants
 MAX_HAND_SIZE = 5
@@ -92,32 +100,126 @@ ACTION_CARD_TEMPLATES = [
     {"name": "Defense_Card", "type": "defense", "effect": {"type": "nullify_action"}, "description": "Nullifies an opponent's action against you!", "cssClass": "card-defense", "rarity": 0.5},
 ]
 
+# Built once; draws pick cards in proportion to their rarity
+CARD_SAMPLER = CardSampler(ACTION_CARD_TEMPLATES)
+
+CARD_TYPES = ("attack", "support", "lucky", "theif", "swap", "defense")
+
+class Hand(list):
+    """
+    A player's hand. It is still a plain list of card templates, so it serializes
+    exactly as before, but it also keeps a count of cards per type that is updated on
+    every insert and removal, making questions like "holds a defense card?" O(1).
+    """
+    __slots__ = ("type_counts",)
+
+    def __init__(self, cards=()):
+        super().__init__(cards)
+        self.type_counts = dict.fromkeys(CARD_TYPES, 0)
+        for card in self:
+            self._count(card, 1)
+
+    def _count(self, card, change):
+        self.type_counts[card["type"]] = self.type_counts.get(card["type"], 0) + change
+
+    def _recount(self):
+        self.type_counts = dict.fromkeys(CARD_TYPES, 0)
+        for card in self:
+            self._count(card, 1)
+
+    def append(self, card):
+        super().append(card)
+        self._count(card, 1)
+
+    def insert(self, index, card):
+        super().insert(index, card)
+        self._count(card, 1)
+
+    def extend(self, cards):
+        cards = list(cards)
+        super().extend(cards)
+        for card in cards:
+            self._count(card, 1)
+
+    def __iadd__(self, cards):
+        self.extend(cards)
+        return self
+
+    def pop(self, index=-1):
+        card = super().pop(index)
+        self._count(card, -1)
+        return card
+
+    def remove(self, card):
+        super().remove(card)
+        self._count(card, -1)
+
+    def clear(self):
+        super().clear()
+        self._recount()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._recount()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._recount()
+
+    def copy(self):
+        # Same cards and counts without recounting; card templates are shared, never copied
+        hand = Hand.__new__(Hand)
+        list.extend(hand, self)
+        hand.type_counts = dict(self.type_counts)
+        return hand
+
+    def __reduce__(self):
+        # Rebuild through __init__ so copies and pickles recount instead of restoring stale counts
+        return (Hand, (list(self),))
+
+    def count_type(self, card_type):
+        return self.type_counts.get(card_type, 0)
+
+    def has_type(self, card_type):
+        return self.type_counts.get(card_type, 0) > 0
+
+    def index_of_type(self, card_type):
+        # First card of the given type, or -1; only scans when the counter says one is there
+        if not self.has_type(card_type):
+            return -1
+        return next(index for index, card in enumerate(self) if card["type"] == card_type)
+
 def generate_character_id(player_num, char_index):
     return f"player{player_num}_char_{char_index}"
 
-def initialize_game(total_players, num_bots, player_ids_list):
+def initialize_game(total_players, num_bots, player_ids_list, seed=None):
+    # Every random outcome of the rules (deal, draws, default targets) comes from the room's
+    # own generator, so a room can be rebuilt by replaying its actions from a saved rng state
+    rng = random.Random(seed)
     game_state = {
         "players": {},
         "current_turn": player_ids_list[0], # First player in the sorted list starts
         "message": "Game started!",
         "game_over": False,
         "winner": None,
-        "action_log": [],
+        "action_log": ActionLog(), # Only the most recent entries; see action_log.py
         "pending_attack": None,
         "swap_in_progress": False,
         "selected_cards_for_swap": [],
-        "player_turn_order": player_ids_list # Store the ordered list of player IDs
+        "player_turn_order": player_ids_list, # Store the ordered list of player IDs
+        "revision": 0, # Bumped by the server every time an update is broadcast
+        "rng": rng
     }
 
     all_characters = list(CHARACTER_TEMPLATES)
-    random.shuffle(all_characters)
+    rng.shuffle(all_characters)
 
     # Distribute characters to all players (human and bot)
     for i, player_id in enumerate(player_ids_list):
         is_bot = (i >= (total_players - num_bots)) # Bots are assigned after human players in the sorted list
         game_state["players"][player_id] = {
             "characters": [],
-            "hand": [],
+            "hand": Hand(),
             "sleep_count": 0,
             "player_name": f"Player {i+1}", # Display name based on order
             "has_defense_card_in_hand": False,
@@ -139,8 +241,16 @@ def initialize_game(total_players, num_bots, player_ids_list):
             })
         draw_cards_for_player(game_state, player_id)
 
+    game_state["characters_by_id"] = build_character_index(game_state)
+    game_state["journal"] = None # Set by the room store to record every applied action
+    game_state["record"] = None # Set by the server to keep a game_record.GameRecord of the game
+
     return game_state
 
+def get_rng(game_state):
+    # States rebuilt without a generator (e.g. from models.RoomState) fall back to the module one
+    return game_state.get("rng") or random
+
 def draw_cards_for_player(game_state, player_id):
     player = game_state["players"][player_id]
     
@@ -151,22 +261,60 @@ def draw_cards_for_player(game_state, player_id):
         # game_state["action_log"].append(game_state["message"])
         return game_state
 
-    weighted_cards = []
-    for card_template in ACTION_CARD_TEMPLATES:
-        weight = int(card_template["rarity"] * 100) # Rarity means higher weight for more common cards
-        for _ in range(weight):
-            weighted_cards.append(card_template)
+    player["hand"].extend(CARD_SAMPLER.draw(cards_to_draw, get_rng(game_state))) # Rarity means higher weight for more common cards
 
-    for _ in range(cards_to_draw):
-        if not weighted_cards:
-            break
-        card_template = random.choice(weighted_cards)
-        player["hand"].append(card_template)
-    
-    player["has_defense_card_in_hand"] = any(card["type"] == "defense" for card in player["hand"])
+    player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
 
     return game_state
 
+def build_character_index(game_state):
+    # Characters never change owner, so the index only has to be rebuilt when a state is recreated
+    return {char["id"]: char for p_data in game_state["players"].values() for char in p_data["characters"]}
+
+def find_character(game_state, character_id):
+    characters_by_id = game_state.get("characters_by_id")
+    if characters_by_id is None:
+        characters_by_id = game_state["characters_by_id"] = build_character_index(game_state)
+    return characters_by_id.get(character_id)
+
+def validate_character_index(game_state):
+    # Checks that characters_by_id points at exactly the character dicts held in the player lists
+    characters_by_id = game_state["characters_by_id"]
+    characters = [char for p_data in game_state["players"].values() for char in p_data["characters"]]
+    assert len(characters_by_id) == len(characters), "Character index size does not match the player lists."
+    for p_id, p_data in game_state["players"].items():
+        for char in p_data["characters"]:
+            assert characters_by_id.get(char["id"]) is char, f"Character index entry for {char['id']} is stale."
+            assert char["player_id"] == p_id, f"Character {char['id']} is listed under {p_id} but owned by {char['player_id']}."
+
+def clone_game_state(game_state, action_log=None, rng=None):
+    """
+    Copies what the rules functions mutate (players, characters, hands, pending_attack)
+    and shares what they never touch (card templates, turn order). Much cheaper than
+    copy.deepcopy, for lookahead that plays moves on a throwaway state. The clone
+    logs into `action_log`, by default a fresh one-entry log, never the real one, and
+    draws from `rng`, by default a copy of the room's generator. It has no journal or record.
+    """
+    clone = dict(game_state)
+    clone["players"] = {}
+    for p_id, p_data in game_state["players"].items():
+        player = dict(p_data)
+        player["characters"] = [dict(char) for char in p_data["characters"]]
+        player["hand"] = p_data["hand"].copy()
+        clone["players"][p_id] = player
+    if game_state.get("pending_attack"):
+        clone["pending_attack"] = dict(game_state["pending_attack"])
+    clone["selected_cards_for_swap"] = list(game_state.get("selected_cards_for_swap", []))
+    clone["action_log"] = ActionLog(capacity=1) if action_log is None else action_log
+    clone["characters_by_id"] = build_character_index(clone)
+    if rng is None:
+        rng = random.Random()
+        rng.setstate(get_rng(game_state).getstate())
+    clone["rng"] = rng
+    clone["journal"] = None
+    clone["record"] = None
+    return clone
+
 def get_player_id_from_character_id(character_id):
     # Extracts player ID from character ID (e.g., 'player1_char_0' -> 'player1')
     parts = character_id.split('_')
@@ -204,8 +352,8 @@ def steal_cards_from_opponent(game_state, playing_player_id, target_player_id):
     game_state["message"] = log_message
     game_state["action_log"].append(log_message)
 
-    game_state["players"][playing_player_id]["has_defense_card_in_hand"] = any(card["type"] == "defense" for card in player_hand)
-    game_state["players"][target_player_id]["has_defense_card_in_hand"] = any(card["type"] == "defense" for card in opponent_hand)
+    game_state["players"][playing_player_id]["has_defense_card_in_hand"] = player_hand.has_type("defense")
+    game_state["players"][target_player_id]["has_defense_card_in_hand"] = opponent_hand.has_type("defense")
     
     return game_state, stolen_count
 
@@ -244,8 +392,8 @@ def swap_cards_with_opponent(game_state, playing_player_id, target_player_id, my
     game_state["message"] = log_message
     game_state["action_log"].append(log_message)
 
-    player["has_defense_card_in_hand"] = any(card["type"] == "defense" for card in player["hand"])
-    opponent["has_defense_card_in_hand"] = any(card["type"] == "defense" for card in opponent["hand"])
+    player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
+    opponent["has_defense_card_in_hand"] = opponent["hand"].has_type("defense")
 
     return game_state
 
@@ -255,13 +403,9 @@ def apply_pending_action(game_state, playing_player_id, card_data, target_charac
     log_message = ""
 
     if card_data["type"] == "attack":
-        target_player_id = get_player_id_from_character_id(target_character_id)
-        target_character = None
-        for char in game_state["players"][target_player_id]["characters"]:
-            if char["id"] == target_character_id:
-                target_character = char
-                break
-        
+        target_character = find_character(game_state, target_character_id)
+        target_player_id = target_character["player_id"]
+
         target_character["current_sleep"] += card_data["effect"]["value"]
         log_message = f"{player_name} used {card_data['name']} on {game_state['players'][target_player_id]['player_name']}'s {target_character['name']} to reduce sleep by {-card_data['effect']['value']} hours."
         if target_character["current_sleep"] < 0:
@@ -272,12 +416,8 @@ def apply_pending_action(game_state, playing_player_id, card_data, target_charac
             log_message += f" {target_character['name']} reached enough sleep and is now asleep!"
 
     elif card_data["type"] == "support":
-        target_player_id = get_player_id_from_character_id(target_character_id)
-        target_character = None
-        for char in game_state["players"][target_player_id]["characters"]:
-            if char["id"] == target_character_id:
-                target_character = char
-                break
+        target_character = find_character(game_state, target_character_id)
+        target_player_id = target_character["player_id"]
 
         target_character["current_sleep"] += card_data["effect"]["value"]
         log_message = f"{player_name} used {card_data['name']} on {game_state['players'][target_player_id]['player_name']}'s {target_character['name']} to add {card_data['effect']['value']} hours of sleep."
@@ -287,12 +427,8 @@ def apply_pending_action(game_state, playing_player_id, card_data, target_charac
             log_message += f" {target_character['name']} reached enough sleep and is now asleep!"
 
     elif card_data["type"] == "lucky":
-        target_player_id = get_player_id_from_character_id(target_character_id)
-        target_character = None
-        for char in game_state["players"][target_player_id]["characters"]:
-            if char["id"] == target_character_id:
-                target_character = char
-                break
+        target_character = find_character(game_state, target_character_id)
+        target_player_id = target_character["player_id"]
 
         target_character["current_sleep"] = target_character["max_sleep"]
         log_message = f"{player_name} used {card_data['name']} on {game_state['players'][target_player_id]['player_name']}'s {target_character['name']} for instant sleep!"
@@ -372,29 +508,30 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
              raise ValueError("You can only use a Defense card when you are the target of an action.")
 
         player["hand"].pop(defending_card_index) # Remove defense card
-        player["has_defense_card_in_hand"] = any(c["type"] == "defense" for c in player["hand"])
+        player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
         
         log_message = f"{player['player_name']} used {defense_card['name']} to nullify {game_state['pending_attack']['card_name']}'s effect from {game_state['players'][game_state['pending_attack']['player_id']]['player_name']}!"
         game_state["message"] = log_message
         game_state["action_log"].append(log_message)
+        # Turn returns to the player who initiated the attack, as their action was nullified.
+        game_state["current_turn"] = game_state["pending_attack"]["player_id"] 
         game_state["pending_attack"] = None # Clear pending attack
         game_state["swap_in_progress"] = False # Ensure these flags are reset
         game_state["selected_cards_for_swap"] = [] # Ensure these flags are reset
-        
-        # Turn returns to the player who initiated the attack, as their action was nullified.
-        game_state["current_turn"] = game_state["pending_attack"]["player_id"] 
         return game_state
 
     # --- Logic for playing other card types ---
     
-    print(f"DEBUG: Applying card effect for card '{card.get('name', 'UNKNOWN')}' (type: {card.get('type', 'UNKNOWN')})")
-    print(f"DEBUG: target_character_id received: {target_character_id}")
-    print(f"DEBUG: target_player_for_thief_swap received: {target_player_for_thief_swap}")
+    logger.debug("Applying card effect for card '%s' (type: %s), target_character_id=%s, target_player_for_thief_swap=%s",
+                 card.get('name', 'UNKNOWN'), card.get('type', 'UNKNOWN'), target_character_id, target_player_for_thief_swap,
+                 extra={"player_id": playing_player_id, "action": "play_card"})
 
     if card.get("type") in ["attack", "support", "lucky"]:
         if target_character_id is None:
             raise ValueError(f"Target character ID is required for {card.get('name', 'Unknown Card')} (type: {card.get('type', 'Unknown Type')}) card.")
-    elif card.get("type") not in ["theif", "swap", "defense"]:
+    elif card.get("type") == "defense":
+        raise ValueError("A Defense card can only be used in answer to an action against you.")
+    elif card.get("type") not in ["theif", "swap"]:
         raise ValueError(f"Attempted to play unknown or unplayable card type '{card.get('type', 'UNKNOWN')}'. Card name: {card.get('name', 'UNKNOWN')}")
     
     # Handle playing a Thief card
@@ -408,10 +545,12 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
             active_opponents = [pid for pid in game_state["player_turn_order"] if pid != playing_player_id and not check_player_lost(game_state, pid)]
             if not active_opponents:
                 raise ValueError("No active opponents to steal from.")
-            target_player_for_thief_swap = random.choice(active_opponents)
+            target_player_for_thief_swap = get_rng(game_state).choice(active_opponents)
+        elif target_player_for_thief_swap not in game_state["players"] or target_player_for_thief_swap == playing_player_id:
+            raise ValueError(f"Invalid target player '{target_player_for_thief_swap}' for Thief card.")
         
         player["hand"].pop(card_index)
-        player["has_defense_card_in_hand"] = any(c["type"] == "defense" for c in player["hand"])
+        player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
         return apply_pending_action(game_state, playing_player_id, card, None, None, target_player_for_thief_swap)
     
     # Handle playing a Swap card
@@ -426,7 +565,9 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
             active_human_opponents = [pid for pid in game_state["player_turn_order"] if pid != playing_player_id and not game_state["players"][pid].get('is_bot', False) and not check_player_lost(game_state, pid)]
             if not active_human_opponents:
                 raise ValueError("No active human opponents to swap cards with.")
-            target_player_for_thief_swap = random.choice(active_human_opponents)
+            target_player_for_thief_swap = get_rng(game_state).choice(active_human_opponents)
+        elif target_player_for_thief_swap not in game_state["players"] or target_player_for_thief_swap == playing_player_id:
+            raise ValueError(f"Invalid target player '{target_player_for_thief_swap}' for Swap card.")
         
         # Validate selected_cards_for_swap
         my_hand_size = len(player["hand"]) - 1 # Excluding the swap card itself
@@ -438,9 +579,21 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
              # If human player, UI should prevent this. If bot, ensure bot sends correct indices.
             raise ValueError(f"Invalid number of selected cards for Swap. Expected {num_cards_to_swap} from each side, got {len(target_card_indices)/2 if target_card_indices else 0}.")
 
+        # Players pick their cards from the hand as shown, Swap card included; once it is
+        # removed, their picks after it move down by one
+        if card_index in target_card_indices[0::2]:
+            raise ValueError("The Swap card itself cannot be swapped.")
+        target_card_indices = [index - 1 if position % 2 == 0 and index > card_index else index
+                               for position, index in enumerate(target_card_indices)]
+        # Checked before anything leaves a hand, so a rejected Swap changes nothing
+        my_picks, their_picks = target_card_indices[0::2], target_card_indices[1::2]
+        if (len(set(my_picks)) != num_cards_to_swap or len(set(their_picks)) != num_cards_to_swap
+                or not all(0 <= index < my_hand_size for index in my_picks) or not all(0 <= index < opponent_hand_size for index in their_picks)):
+            raise ValueError("Invalid card indices for Swap: pick different cards that are in the hands.")
+
         # Remove the Swap card first before performing the swap logic
         player["hand"].pop(card_index) 
-        player["has_defense_card_in_hand"] = any(c["type"] == "defense" for c in player["hand"])
+        player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
 
         game_state["pending_attack"] = { # Reusing pending_attack for multi-step actions
             "card_name": card["name"],
@@ -465,16 +618,12 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
             return apply_pending_action(game_state, playing_player_id, card, None, target_card_indices, target_player_for_thief_swap)
 
     # For attack, support, lucky cards, ensure target character is valid and not asleep
-    target_player_id_of_char = get_player_id_from_character_id(target_character_id)
-    target_character = None
-    if target_player_id_of_char:
-        for char in game_state["players"][target_player_id_of_char]["characters"]:
-            if char["id"] == target_character_id:
-                target_character = char
-                break
+    target_character = find_character(game_state, target_character_id)
 
     if not target_character:
-        raise ValueError(f"Character with ID '{target_character_id}' not found for player '{target_player_id_of_char}'. This might indicate a state desync.")
+        raise ValueError(f"Character with ID '{target_character_id}' not found for player '{get_player_id_from_character_id(target_character_id)}'. This might indicate a state desync.")
+
+    target_player_id_of_char = target_character["player_id"]
 
     if target_character["is_asleep"]:
         raise ValueError("Target character is already asleep and cannot be affected by this card.")
@@ -495,7 +644,7 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
             "original_card_index": card_index 
         }
         player["hand"].pop(card_index) # Remove card from hand
-        player["has_defense_card_in_hand"] = any(c["type"] == "defense" for c in player["hand"])
+        player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
 
         if game_state["players"][target_player_id_of_char]["has_defense_card_in_hand"] and not game_state["players"][target_player_id_of_char].get('is_bot', False):
             game_state["message"] = f"{game_state['players'][target_player_id_of_char]['player_name']} has a Defense Card! Waiting for their response."
@@ -506,7 +655,7 @@ def apply_card_effect(game_state, playing_player_id, card_index, target_characte
             return apply_pending_action(game_state, playing_player_id, card, target_character_id)
     elif card["type"] in ["support", "lucky"]:
         player["hand"].pop(card_index) # Remove card from hand
-        player["has_defense_card_in_hand"] = any(c["type"] == "defense" for c in player["hand"])
+        player["has_defense_card_in_hand"] = player["hand"].has_type("defense")
         return apply_pending_action(game_state, playing_player_id, card, target_character_id)
     else:
         raise ValueError("Unhandled card type in apply_card_effect after initial checks.")
@@ -552,6 +701,208 @@ def end_turn(game_state, player_id):
     return game_state
 
 
+def resolve_pending_attack(game_state, player_id, use_defense, defending_card_index=None):
+    # The target's answer to a pending action: nullify it with a Defense card, or let it happen
+    pending_attack = game_state["pending_attack"]
+    if not pending_attack:
+        raise ValueError("No pending attack to resolve.")
+    if player_id != pending_attack["target_player_id"]:
+        raise ValueError("You are not the target of this action.")
+
+    if use_defense:
+        game_state = apply_card_effect(game_state, player_id, defending_card_index, None, None, defending_card_index=defending_card_index)
+    else:
+        attacking_card_data = next((card for card in ACTION_CARD_TEMPLATES if card["name"] == pending_attack["card_name"]), None)
+        game_state = apply_pending_action(game_state, pending_attack["player_id"], attacking_card_data,
+                                          pending_attack["target_character_id"],
+                                          pending_attack.get("target_card_indices"),
+                                          pending_attack.get("target_player_for_thief_swap"))
+
+    game_state["pending_attack"] = None
+    game_state["swap_in_progress"] = False
+    game_state["selected_cards_for_swap"] = []
+    return game_state
+
+# Real moves are timed here, not in the rules functions, which search-bot rollouts call thousands of times a turn
+ACTION_TIMER_LABELS = {"play_card": "apply_card_effect", "resolve": "resolve_pending_attack", "end_turn": "end_turn"}
+
+def apply_action(game_state, player_id, action):
+    """
+    Single entry point for player and bot moves. `action` is a plain dict:
+      {"kind": "play_card", "card_index", "target_character_id", "target_card_indices",
+       "defending_card_index", "target_player_id"}
+      {"kind": "resolve", "use_defense", "defending_card_index"}
+      {"kind": "end_turn"}
+    Raises ValueError for illegal moves, like the functions it calls. Moves that were
+    applied are passed to the state's journal and game record (if any), so a room can
+    be replayed.
+    """
+    kind = action["kind"]
+    if kind not in ACTION_TIMER_LABELS:
+        raise ValueError(f"Unknown action kind '{kind}'.")
+    record = game_state.get("record")
+    entry = record.encode(game_state, player_id, action) if record is not None else None # Before the played card leaves the hand
+    with FUNCTION_SECONDS.time(ACTION_TIMER_LABELS[kind]):
+        if kind == "play_card":
+            target_card_indices = action.get("target_card_indices")
+            game_state = apply_card_effect(game_state, player_id, action["card_index"], action.get("target_character_id"),
+                                           list(target_card_indices) if target_card_indices else None, # pending_attack keeps this list; the journal keeps the original
+                                           action.get("defending_card_index"), action.get("target_player_id"))
+        elif kind == "resolve":
+            game_state = resolve_pending_attack(game_state, player_id, action["use_defense"], action.get("defending_card_index"))
+        else:
+            game_state = end_turn(game_state, player_id)
+
+    if game_state.get("journal") is not None:
+        game_state["journal"].append(player_id, action, game_state["revision"])
+    if record is not None:
+        record.commit(entry)
+    return game_state
+
+def hand_seat_to_bot(game_state, player_id):
+    """
+    A bot takes over `player_id` for the rest of the game. Not a move, but the rules
+    treat bots differently (they never get to answer with Defense), so the game
+    record keeps it for replays.
+    """
+    player = game_state["players"][player_id]
+    player["is_bot"] = True
+    game_state["message"] = f"{player['player_name']} did not come back; a bot took over their seat."
+    game_state["action_log"].append(game_state["message"])
+    record = game_state.get("record")
+    if record is not None:
+        record.commit(record.encode(game_state, player_id, {"kind": "seat_to_bot"}))
+    return game_state
+
+# Compact move form used by iter_legal_moves and search bots; move_to_action gives the apply_action dict
+END_TURN = ("end_turn",)
+
+def swap_size(game_state, player_id, target_player_id):
+    # Cards each side gives in a Swap: the smaller hand, not counting the Swap card itself
+    return min(len(game_state["players"][player_id]["hand"]) - 1, len(game_state["players"][target_player_id]["hand"]))
+
+def iter_legal_moves(game_state, player_id, distinct=False, rng=None, types=None, useful_only=False):
+    """
+    Yields every move apply_action accepts from `player_id` right now, without
+    touching the state, as tuples:
+      ("play", card_index, target_character_id, target_card_indices, target_player_id)
+      ("resolve", use_defense, defending_card_index)
+      END_TURN
+    While an action is pending only its target can move, and Thief and Swap only
+    target players still in the game. A Swap is listed once per choice of cards from
+    each side (the order of the pairs does not change the outcome), or, given `rng`,
+    once per opponent with cards picked at random, which keeps a search bot's
+    branching factor down. `distinct` skips cards identical to one earlier in the
+    hand, since they give identical moves; `types` limits the moves to playing cards
+    of those types; `useful_only` leaves out legal moves that can only help an
+    opponent: attacking your own characters, supporting theirs, stealing from an
+    empty hand.
+    """
+    if game_state["game_over"]:
+        return
+    players = game_state["players"]
+    hand = players[player_id]["hand"]
+    pending_attack = game_state.get("pending_attack")
+    if pending_attack:
+        if pending_attack["target_player_id"] != player_id:
+            return
+        yield ("resolve", False, None)
+        for card_index, card in enumerate(hand if hand.has_type("defense") else ()):
+            if card["type"] == "defense":
+                yield ("resolve", True, card_index)
+                if distinct:
+                    break
+        return
+    if game_state["current_turn"] != player_id:
+        return
+
+    if types is None:
+        yield END_TURN
+    turn_order = game_state["player_turn_order"]
+    opponents = [p_id for p_id in turn_order if p_id != player_id and players[p_id]["sleep_count"] < INITIAL_CHARACTERS_PER_PLAYER] # Not lost
+    awake_ids = {} # Per player, filled in as cards target their characters
+    seen_cards = set()
+    for card_index, card in enumerate(hand):
+        if types is not None and card["type"] not in types:
+            continue
+        if distinct:
+            if card["name"] in seen_cards:
+                continue
+            seen_cards.add(card["name"])
+
+        card_type = card["type"]
+        if card_type in ("attack", "support", "lucky"):
+            if card_type == "lucky" or (useful_only and card_type == "support"):
+                owners = (player_id,)
+            elif useful_only:
+                owners = opponents # Lost players' characters are all asleep anyway
+            else:
+                owners = turn_order
+            for p_id in owners:
+                if p_id not in awake_ids:
+                    awake_ids[p_id] = [char["id"] for char in players[p_id]["characters"] if not char["is_asleep"]]
+                for char_id in awake_ids[p_id]:
+                    yield ("play", card_index, char_id, None, None)
+        elif card_type == "theif":
+            for p_id in opponents:
+                if players[p_id]["hand"] or not useful_only:
+                    yield ("play", card_index, None, None, p_id)
+        elif card_type == "swap":
+            mine = [index for index in range(len(hand)) if index != card_index] # Indices in the hand as shown, Swap card included
+            for p_id in opponents:
+                size = swap_size(game_state, player_id, p_id)
+                if size <= 0:
+                    continue
+                theirs = range(len(players[p_id]["hand"]))
+                if rng is not None:
+                    choices = [(sorted(rng.sample(mine, size)), sorted(rng.sample(theirs, size)))]
+                else:
+                    choices = itertools.product(itertools.combinations(mine, size), itertools.combinations(theirs, size))
+                for my_cards, their_cards in choices:
+                    yield ("play", card_index, None, tuple(index for pair in zip(my_cards, their_cards) for index in pair), p_id)
+
+def move_to_action(move):
+    # The apply_action dict for an iter_legal_moves tuple
+    if move == END_TURN:
+        return {"kind": "end_turn"}
+    if move[0] == "resolve":
+        return {"kind": "resolve", "use_defense": move[1], "defending_card_index": move[2]}
+    _, card_index, target_character_id, target_card_indices, target_player_id = move
+    return {"kind": "play_card", "card_index": card_index, "target_character_id": target_character_id,
+            "target_card_indices": list(target_card_indices) if target_card_indices else None, "target_player_id": target_player_id}
+
+def legal_moves(game_state, player_id):
+    """Every move `player_id` can make right now, as apply_action dicts."""
+    return [move_to_action(move) for move in iter_legal_moves(game_state, player_id)]
+
+def legal_targets(game_state, player_id):
+    """
+    legal_moves summed up per card, for clients that only offer valid targets:
+      {"end_turn": bool, "can_decline": bool, "defense": [card indices],
+       "cards": [{"card_index", "characters": [ids], "players": [ids]}]}
+    A Swap card's players are the opponents it can be played against.
+    """
+    targets = {"end_turn": False, "can_decline": False, "defense": [], "cards": []}
+    cards = {}
+    for move in iter_legal_moves(game_state, player_id):
+        if move == END_TURN:
+            targets["end_turn"] = True
+        elif move[0] == "resolve":
+            if move[1]:
+                targets["defense"].append(move[2])
+            else:
+                targets["can_decline"] = True
+        else:
+            _, card_index, target_character_id, _, target_player_id = move
+            if card_index not in cards:
+                cards[card_index] = {"card_index": card_index, "characters": [], "players": []}
+                targets["cards"].append(cards[card_index])
+            if target_character_id is not None:
+                cards[card_index]["characters"].append(target_character_id)
+            elif target_player_id not in cards[card_index]["players"]:
+                cards[card_index]["players"].append(target_player_id)
+    return targets
+
 def check_win_condition(game_state):
     win_status = {
         "game_over": False,
@@ -587,18 +938,22 @@ def check_player_lost(game_state, player_id):
     return False
 
 
+@metrics.timed(FUNCTION_SECONDS, "get_game_state_for_player")
 def get_game_state_for_player(full_game_state, player_id_for_view):
+    # Passing None as player_id_for_view gives the public view with every hand hidden
     player_view = {
         "players": {},
         "current_turn": full_game_state["current_turn"],
         "message": full_game_state["message"],
         "game_over": full_game_state["game_over"],
         "winner": full_game_state["winner"],
-        "action_log": full_game_state["action_log"],
+        "action_log": full_game_state["action_log"].to_list(),
+        "action_log_total": full_game_state["action_log"].total, # Older entries can be paged from the history route
         "pending_attack": full_game_state.get("pending_attack"),
         "swap_in_progress": full_game_state.get("swap_in_progress", False),
         "selected_cards_for_swap": full_game_state.get("selected_cards_for_swap", []),
-        "player_turn_order": full_game_state["player_turn_order"]
+        "player_turn_order": full_game_state["player_turn_order"],
+        "revision": full_game_state["revision"]
     }
 
     for p_id, p_data in full_game_state["players"].items():
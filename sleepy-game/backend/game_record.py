@@ -0,0 +1,323 @@
+# sleepy-game/backend/game_record.py
+# Binary record of a whole game: the room's seed plus every action applied, with
+# players, characters and cards as small ids. All randomness in the rules comes from
+# the room's generator, so replaying the actions on initialize_game(seed) through
+# game_logic.apply_action rebuilds the game exactly, card draws included.
+#
+# Layout (integers little-endian, 0xFF in a byte field means "none"):
+#   header  b"SGR" version:u8 seed:u64 total_players:u8 num_bots:u8 player_count:u8
+#           then per player: id_length:u8 id:utf-8
+#   actions one opcode byte, kind << 6 | player index, then by kind
+#           play_card  card_index card_id target_character target_player defending_card_index
+#                      index_count indices...   (card_id is checked on replay; a character
+#                      is owner_index << 4 | slot)
+#           resolve    use_defense defending_card_index
+#           end_turn   (nothing)
+#           json       length:u16 {"player_id", "action"} for anything that does not fit the above,
+#                      and {"kind": "seat_to_bot"} when a bot takes over a seat that was left
+#   end     0xFF winner_index:u8 digest:u32, written when the game is over
+#
+#   python game_record.py verify records/*.sgr
+#   python game_record.py export records/room1000-1f2e.sgr [--turn 12]
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import struct
+import sys
+import time
+import zlib
+
+if __name__ == "__main__":
+    os.environ.setdefault("METRICS", "0") # Offline replays have no use for the server's timers, which cost about half the replay time
+
+import game_logic
+from action_log import ActionLog
+from models import CARD_ID_BY_NAME, RoomState
+
+MAGIC = b"SGR"
+VERSION = 1
+HEADER = struct.Struct("<3sBQBBB")
+NONE = 0xFF
+END = 0xFF
+PLAY_CARD, RESOLVE, END_TURN, JSON_ACTION = range(4)
+KEYFRAME_EVERY = 32 # Actions between the states GameReplay keeps for seeking
+
+GAME_RECORDS_DIR = os.environ.get("GAME_RECORDS_DIR", "") # Where closed rooms' records are written; empty keeps none
+
+logger = logging.getLogger("game_record")
+
+class RecordMismatch(ValueError):
+    """A record that does not replay: an action was rejected, a card differs, or the final digest is off."""
+
+def new_seed():
+    return secrets.randbits(64)
+
+def state_digest(game_state):
+    # Everything the rules decide, in turn order, so any divergence on replay shows up
+    parts = [game_state["current_turn"], game_state["winner"], game_state["game_over"]]
+    for p_id in game_state["player_turn_order"]:
+        p_data = game_state["players"][p_id]
+        parts.append([[CARD_ID_BY_NAME[card["name"]] for card in p_data["hand"]], p_data["sleep_count"], p_data["has_lost"],
+                      [[char["current_sleep"], char["is_asleep"], char["is_protected"]] for char in p_data["characters"]]])
+    return zlib.crc32(json.dumps(parts, separators=(",", ":")).encode())
+
+class _NotCompact(Exception):
+    pass
+
+def _byte(value):
+    if value is None:
+        return NONE
+    if type(value) is int and 0 <= value < NONE:
+        return value
+    raise _NotCompact
+
+class GameRecord:
+    """Set as game_state["record"]; game_logic.apply_action hands it every move it applies."""
+
+    def __init__(self, seed, total_players, num_bots, player_ids):
+        self.seed = seed
+        self.player_index = {p_id: index for index, p_id in enumerate(player_ids)}
+        self.character_codes = {f"{p_id}_char_{slot}": index << 4 | slot
+                                for index, p_id in enumerate(player_ids) for slot in range(game_logic.INITIAL_CHARACTERS_PER_PLAYER)}
+        self.data = bytearray(HEADER.pack(MAGIC, VERSION, seed, total_players, num_bots, len(player_ids)))
+        for p_id in player_ids:
+            encoded_id = p_id.encode()
+            self.data += bytes([len(encoded_id)]) + encoded_id
+        self.actions = 0
+        self.finished = False
+
+    def encode(self, game_state, player_id, action):
+        """Bytes for one action, taken before it is applied (the played card is still in the hand)."""
+        try:
+            return self._encode_compact(game_state, player_id, action)
+        except (_NotCompact, KeyError, TypeError):
+            payload = json.dumps({"player_id": player_id, "action": action}, separators=(",", ":")).encode()
+            return bytes([JSON_ACTION << 6]) + struct.pack("<H", len(payload)) + payload
+
+    def _encode_compact(self, game_state, player_id, action):
+        player = self.player_index[player_id]
+        kind = action["kind"]
+        if kind == "end_turn" and len(action) == 1:
+            return bytes([END_TURN << 6 | player])
+        if kind == "resolve" and type(action["use_defense"]) is bool and set(action) <= {"kind", "use_defense", "defending_card_index"}:
+            return bytes([RESOLVE << 6 | player, action["use_defense"], _byte(action.get("defending_card_index"))])
+        if kind == "play_card" and set(action) <= {"kind", "card_index", "target_character_id", "target_card_indices", "defending_card_index", "target_player_id"}:
+            card_index = _byte(action["card_index"])
+            hand = game_state["players"][player_id]["hand"]
+            card_id = CARD_ID_BY_NAME[hand[card_index]["name"]] if card_index < len(hand) else NONE
+            target_character_id = action.get("target_character_id")
+            target_player_id = action.get("target_player_id")
+            indices = [_byte(index) for index in action.get("target_card_indices") or ()]
+            return bytes([PLAY_CARD << 6 | player, card_index, card_id,
+                          NONE if target_character_id is None else self.character_codes[target_character_id],
+                          NONE if target_player_id is None else self.player_index[target_player_id],
+                          _byte(action.get("defending_card_index")), _byte(len(indices))] + indices)
+        raise _NotCompact
+
+    def commit(self, entry):
+        if self.finished:
+            return # Nothing goes after END
+        self.data += entry
+        self.actions += 1
+
+    def finish(self, game_state):
+        if not self.finished:
+            winner = game_state["winner"]
+            self.data += bytes([END, NONE if winner is None else self.player_index[winner]]) + struct.pack("<I", state_digest(game_state))
+            self.finished = True
+
+    def to_bytes(self):
+        return bytes(self.data)
+
+def decode_record(data):
+    """Returns (header dict, [(player_id, action, card_id or None), ...], ending dict or None)."""
+    try:
+        return _decode_record(data)
+    except (IndexError, KeyError, struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise RecordMismatch(f"Truncated or corrupt record ({type(e).__name__}).") from e
+
+def _decode_record(data):
+    magic, version, seed, total_players, num_bots, player_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise RecordMismatch(f"Not a version {VERSION} game record.")
+    offset = HEADER.size
+    player_ids = []
+    for _ in range(player_count):
+        length = data[offset]
+        player_ids.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    character_ids = {index << 4 | slot: f"{p_id}_char_{slot}"
+                     for index, p_id in enumerate(player_ids) for slot in range(game_logic.INITIAL_CHARACTERS_PER_PLAYER)}
+    lookup_player = lambda index: None if index == NONE else player_ids[index]
+    lookup_character = lambda code: None if code == NONE else character_ids[code]
+    optional = lambda value: None if value == NONE else value
+
+    entries, ending = [], None
+    while offset < len(data):
+        opcode = data[offset]
+        if opcode == END:
+            winner_index, digest = data[offset + 1], struct.unpack_from("<I", data, offset + 2)[0]
+            ending = {"winner": lookup_player(winner_index), "digest": digest}
+            break
+        kind, player_id = opcode >> 6, player_ids[opcode & 0x3F]
+        if kind == END_TURN:
+            entries.append((player_id, {"kind": "end_turn"}, None))
+            offset += 1
+        elif kind == RESOLVE:
+            entries.append((player_id, {"kind": "resolve", "use_defense": bool(data[offset + 1]), "defending_card_index": optional(data[offset + 2])}, None))
+            offset += 3
+        elif kind == PLAY_CARD:
+            card_index, card_id, character, target_player, defending, count = data[offset + 1:offset + 7]
+            indices = list(data[offset + 7:offset + 7 + count])
+            entries.append((player_id, {"kind": "play_card", "card_index": card_index,
+                                        "target_character_id": lookup_character(character),
+                                        "target_card_indices": indices or None,
+                                        "defending_card_index": optional(defending),
+                                        "target_player_id": lookup_player(target_player)}, optional(card_id)))
+            offset += 7 + count
+        else:
+            length = struct.unpack_from("<H", data, offset + 1)[0]
+            entry = json.loads(data[offset + 3:offset + 3 + length])
+            entries.append((entry["player_id"], entry["action"], None))
+            offset += 3 + length
+
+    header = {"seed": seed, "total_players": total_players, "num_bots": num_bots, "player_ids": player_ids}
+    return header, entries, ending
+
+def initial_state(header):
+    return game_logic.initialize_game(header["total_players"], header["num_bots"], list(header["player_ids"]), header["seed"])
+
+def apply_entry(game_state, number, player_id, action, card_id):
+    if action["kind"] == "seat_to_bot":
+        return game_logic.hand_seat_to_bot(game_state, player_id)
+    if card_id is not None:
+        hand = game_state["players"][player_id]["hand"]
+        card_index = action["card_index"]
+        actual = CARD_ID_BY_NAME[hand[card_index]["name"]] if card_index < len(hand) else None
+        if actual != card_id:
+            raise RecordMismatch(f"Action {number}: {player_id} played card {card_id} from slot {card_index}, but the replayed hand has {actual} there.")
+    try:
+        return game_logic.apply_action(game_state, player_id, action)
+    except ValueError as e:
+        raise RecordMismatch(f"Action {number} ({player_id} {action['kind']}) was rejected on replay: {e}") from e
+
+def check_ending(game_state, ending):
+    if ending is not None and (game_state["winner"] != ending["winner"] or state_digest(game_state) != ending["digest"]):
+        raise RecordMismatch("The replayed game ends in a different state than the one recorded.")
+
+def replay(data):
+    """Replays a whole record; returns the final game state. Raises RecordMismatch if it does not reproduce."""
+    header, entries, ending = decode_record(data)
+    game_state = initial_state(header)
+    for number, (player_id, action, card_id) in enumerate(entries):
+        game_state = apply_entry(game_state, number, player_id, action, card_id)
+    check_ending(game_state, ending)
+    return game_state
+
+class GameReplay:
+    """
+    Seekable replay. The first pass keeps a copy of the state every keyframe_every
+    actions and notes the action each turn starts at, so state_at and state_at_turn
+    replay at most keyframe_every actions from the nearest keyframe.
+    """
+
+    def __init__(self, data, keyframe_every=KEYFRAME_EVERY):
+        self.header, self.entries, self.ending = decode_record(data)
+        self.keyframe_every = keyframe_every
+        self.keyframes = []
+        self.turn_starts = [0] # Action number at which each turn begins
+        game_state = initial_state(self.header)
+        for number, (player_id, action, card_id) in enumerate(self.entries):
+            if number % keyframe_every == 0:
+                self.keyframes.append(game_logic.clone_game_state(game_state, action_log=ActionLog()))
+            turn_before = game_state["current_turn"]
+            game_state = apply_entry(game_state, number, player_id, action, card_id)
+            if game_state["current_turn"] != turn_before:
+                self.turn_starts.append(number + 1)
+        check_ending(game_state, self.ending)
+        self.final_state = game_state
+
+    def state_at(self, action_number):
+        """The state after the first action_number actions (a fresh copy each call)."""
+        if not 0 <= action_number <= len(self.entries):
+            raise IndexError(f"Action {action_number} is outside this record (0..{len(self.entries)}).")
+        if not self.keyframes: # No actions at all
+            return initial_state(self.header)
+        keyframe = min(action_number // self.keyframe_every, len(self.keyframes) - 1)
+        base = keyframe * self.keyframe_every
+        game_state = game_logic.clone_game_state(self.keyframes[keyframe], action_log=ActionLog())
+        for number in range(base, action_number):
+            player_id, action, card_id = self.entries[number]
+            game_state = apply_entry(game_state, number, player_id, action, card_id)
+        return game_state
+
+    def state_at_turn(self, turn):
+        """The state at the start of turn `turn` (0 is the deal)."""
+        if not 0 <= turn < len(self.turn_starts):
+            raise IndexError(f"Turn {turn} is outside this record (0..{len(self.turn_starts) - 1}).")
+        return self.state_at(self.turn_starts[turn])
+
+def write_record(room_id, record, directory=None):
+    """Saves a room's record as <directory>/room<room_id>-<seed>.sgr; returns the path, or None when records are off."""
+    directory = GAME_RECORDS_DIR if directory is None else directory
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"room{room_id}-{record.seed:016x}.sgr")
+    with open(path, "wb") as f:
+        f.write(record.to_bytes())
+    return path
+
+def export(data, turn=None):
+    # JSON for people: the decoded actions, or with a turn the full state there (every hand included)
+    header, entries, ending = decode_record(data)
+    if turn is None:
+        return {"header": header, "actions": [{"player_id": player_id, "action": action} for player_id, action, _ in entries], "ending": ending}
+    game_state = GameReplay(data).state_at_turn(turn)
+    return {"header": header, "turn": turn, "state": RoomState.from_game_state(game_state).to_compact()}
+
+def _verify_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return path, None, replay(data)["winner"]
+    except RecordMismatch as e:
+        return path, str(e), None
+
+def _init_worker():
+    logging.disable(logging.WARNING) # The rules log every move at INFO
+
+def verify(paths, workers=None):
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+        results = list(pool.imap(_verify_file, paths, chunksize=max(1, len(paths) // ((workers or multiprocessing.cpu_count()) * 8))))
+    elapsed = time.perf_counter() - started
+    failures = 0
+    for path, error, winner in results:
+        if error:
+            failures += 1
+            print(f"FAILED  {path}  {error}")
+        else:
+            print(f"ok      {path}  winner {winner}")
+    print(f"{len(paths)} records, {failures} failed, {len(paths) / elapsed:,.0f} games/sec")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify or export binary game records.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    verify_parser = commands.add_parser("verify", help="Replay records through the rules and check they reproduce.")
+    verify_parser.add_argument("paths", nargs="+")
+    verify_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    export_parser = commands.add_parser("export", help="Print a record as JSON.")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--turn", type=int, help="Print the full state at the start of this turn instead of the actions.")
+    args = parser.parse_args()
+
+    _init_worker()
+    if args.command == "verify":
+        sys.exit(1 if verify(args.paths, args.workers) else 0)
+    with open(args.path, "rb") as f:
+        print(json.dumps(export(f.read(), args.turn), indent=2))
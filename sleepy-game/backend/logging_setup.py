@@ -0,0 +1,150 @@
+# sleepy-game/backend/logging_setup.py
+# Logging for the backend. Records are put on a queue by the green threads that
+# produce them and written out by a real OS thread, so a slow stdout never stalls
+# the eventlet hub. Configuration comes from the environment:
+#   LOG_LEVEL             default level for everything (default INFO)
+#   LOG_LEVELS            per-module overrides, e.g. "game_logic=DEBUG,bot_ai=WARNING"
+#   LOG_ROOM_SAMPLE_RATE  share of rooms (0.0-1.0) whose INFO/DEBUG records are kept (default 1.0)
+#   SOCKETIO_LOGGER       "1" to turn on Socket.IO / Engine.IO protocol logging
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+
+try:
+    from eventlet import patcher
+    _threading = patcher.original("threading")
+    _queue = patcher.original("queue")
+except ImportError:
+    import threading as _threading
+    import queue as _queue
+
+LOG_QUEUE_SIZE = 10000
+
+# Structured fields callers pass through `extra`
+RECORD_FIELDS = ("room_id", "player_id", "action", "latency_ms")
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+class RoomSampler(logging.Filter):
+    """
+    Keeps INFO/DEBUG records for a stable subset of rooms (hashing the room id, so a
+    sampled room is logged completely). Warnings and records without a room always pass.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, rate)) * 10000)
+
+    def filter(self, record):
+        room_id = getattr(record, "room_id", None)
+        if room_id is None or record.levelno >= logging.WARNING:
+            return True
+        return zlib.crc32(str(room_id).encode()) % 10000 < self.threshold
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class QueueingHandler(logging.Handler):
+    """Hands records to the writer thread. Never waits: when the queue is full the record is dropped and counted."""
+
+    def __init__(self, record_queue):
+        super().__init__()
+        self.record_queue = record_queue
+        self.dropped = 0
+
+    def emit(self, record):
+        # Resolve the message now; args may be mutable game state that changes before the writer gets to it
+        record.msg = record.getMessage()
+        record.args = None
+        try:
+            self.record_queue.put_nowait(record)
+        except _queue.Full:
+            self.dropped += 1
+
+class LogWriter:
+    """Real OS thread that formats queued records and writes them to a stream."""
+
+    def __init__(self, record_queue, formatter, stream=None):
+        self.record_queue = record_queue
+        self.formatter = formatter
+        self.stream = stream or sys.stdout
+        self.thread = _threading.Thread(target=self._run, name="log-writer", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            record = self.record_queue.get()
+            if record is None:
+                break
+            lines = [self.formatter.format(record)]
+            # Drain whatever else is waiting so bursts turn into one write
+            while len(lines) < 500:
+                try:
+                    record = self.record_queue.get_nowait()
+                except _queue.Empty:
+                    break
+                if record is None:
+                    self.record_queue.put(None)
+                    break
+                lines.append(self.formatter.format(record))
+            try:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+            except Exception:
+                time.sleep(0.1)
+
+    def stop(self):
+        self.record_queue.put(None)
+        self.thread.join(timeout=2)
+
+_writer = None
+
+def parse_module_levels(spec):
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            module, level = item.split("=", 1)
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging():
+    """Installs the queued JSON handler on the root logger. Safe to call more than once."""
+    global _writer
+    if _writer is not None:
+        return _writer
+
+    root = logging.getLogger()
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    for module, level in parse_module_levels(os.environ.get("LOG_LEVELS")).items():
+        logging.getLogger(module).setLevel(level)
+
+    record_queue = _queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = QueueingHandler(record_queue)
+    handler.addFilter(RoomSampler(float(os.environ.get("LOG_ROOM_SAMPLE_RATE", "1.0"))))
+    root.handlers = [handler]
+
+    _writer = LogWriter(record_queue, JsonFormatter())
+    _writer.start()
+    return _writer
@@ -0,0 +1,149 @@
+# sleepy-game/backend/matchmaking.py
+# Matchmaking queue: players ask for a game size (total_players) and say how many
+# bots they would accept (max_bots), and rooms are formed for them, instead of
+# sharing room ids by hand. Every MATCH_INTERVAL seconds a batch is formed: full rooms
+# of humans first, oldest tickets first; then anyone who has waited BACKFILL_AFTER
+# seconds gets a room with the humans still waiting plus bots, as long as everyone
+# in it accepts that many bots.
+#
+# Tickets sit in one OrderedDict per (total_players, max_bots), so a bucket is
+# already sorted by enqueue time: enqueue, cancel and taking the oldest ticket are
+# O(1), and forming a room looks at no more than one head per bucket. (A plain dict
+# would do, except that finding its first entry slows down as entries are deleted
+# from the front.)
+import collections
+import itertools
+import logging
+import os
+import time
+
+import eventlet
+
+logger = logging.getLogger("matchmaking")
+
+MATCH_INTERVAL = float(os.environ.get("MATCH_INTERVAL", "0.25")) # Seconds between batches
+BACKFILL_AFTER = float(os.environ.get("MATCH_BACKFILL_AFTER", "15")) # Seconds before seats may go to bots
+MIN_PLAYERS = 2
+MAX_PLAYERS = 4
+WAIT_HISTORY = 1000 # Recent waits kept for the percentiles
+
+class Ticket:
+    __slots__ = ("sid", "total_players", "max_bots", "enqueued_at", "order", "options")
+
+    def __init__(self, sid, total_players, max_bots, enqueued_at, order, options):
+        self.sid = sid
+        self.total_players = total_players
+        self.max_bots = max_bots
+        self.enqueued_at = enqueued_at
+        self.order = order # Enqueue order, also between tickets enqueued at the same clock time
+        self.options = options # Room settings the player asked for (bot_think_time, bot_tier...)
+
+class MatchmakingQueue:
+    """
+    form_room(tickets, num_bots) is called for every room formed, from the batch
+    green thread; the tickets are already out of the queue by then. Tickets are
+    removed with cancel() when their socket leaves the queue or disconnects.
+    """
+
+    def __init__(self, form_room, clock=time.monotonic, interval=MATCH_INTERVAL, backfill_after=BACKFILL_AFTER):
+        self.form_room = form_room
+        self.clock = clock
+        self.interval = interval
+        self.backfill_after = backfill_after
+        self.buckets = {total: [collections.OrderedDict() for _ in range(total)] for total in range(MIN_PLAYERS, MAX_PLAYERS + 1)} # [max_bots] -> {sid: Ticket}
+        self.tickets = {} # sid -> Ticket
+        self.waits = collections.deque(maxlen=WAIT_HISTORY) # Seconds from enqueue to match
+        self.matched = 0
+        self.sequence = itertools.count()
+        self.loop = None
+
+    def enqueue(self, sid, total_players, max_bots, options=None):
+        if total_players not in self.buckets:
+            raise ValueError(f"Games have {MIN_PLAYERS} to {MAX_PLAYERS} players.")
+        if sid in self.tickets:
+            raise ValueError("Already waiting for a match.")
+        ticket = Ticket(sid, total_players, max(0, min(max_bots, total_players - 1)), self.clock(), next(self.sequence), options or {})
+        self.buckets[total_players][ticket.max_bots][sid] = ticket
+        self.tickets[sid] = ticket
+        if self.loop is None or self.loop.dead:
+            self.loop = eventlet.spawn(self._run)
+        return ticket
+
+    def cancel(self, sid):
+        ticket = self.tickets.pop(sid, None)
+        if ticket is not None:
+            del self.buckets[ticket.total_players][ticket.max_bots][sid]
+        return ticket
+
+    def depth(self, total_players=None):
+        if total_players is None:
+            return len(self.tickets)
+        return sum(len(bucket) for bucket in self.buckets[total_players])
+
+    def _oldest(self, total_players):
+        # Each bucket's first ticket is its oldest
+        heads = (next(iter(bucket.values())) for bucket in self.buckets[total_players] if bucket)
+        return min(heads, key=lambda ticket: ticket.order, default=None)
+
+    def _remove(self, ticket):
+        del self.tickets[ticket.sid]
+        del self.buckets[ticket.total_players][ticket.max_bots][ticket.sid]
+
+    def _form(self, tickets, num_bots):
+        now = self.clock()
+        for ticket in tickets:
+            self.waits.append(now - ticket.enqueued_at)
+        self.matched += len(tickets)
+        self.form_room(tickets, num_bots)
+
+    def _backfill(self, total, now):
+        # Fewer than `total` are waiting. Once the oldest has waited long enough it gets a room
+        # with as many humans (so as few bots) as everyone's tolerance allows
+        oldest = self._oldest(total)
+        if oldest is None or now - oldest.enqueued_at < self.backfill_after:
+            return False
+        for humans in range(min(self.depth(total), total - 1), 0, -1):
+            num_bots = total - humans
+            if oldest.max_bots < num_bots:
+                continue
+            willing = sorted((ticket for bucket in self.buckets[total][num_bots:] for ticket in bucket.values()),
+                             key=lambda ticket: ticket.order)
+            if len(willing) < humans:
+                continue # Too few accept this many bots; try fewer humans and more bots
+            tickets = willing[:humans] # The oldest ticket is among the willing, and the first of them
+            for ticket in tickets:
+                self._remove(ticket)
+            self._form(tickets, total - len(tickets))
+            return True
+        return False
+
+    def match(self):
+        """Forms every room it can right now; returns how many."""
+        formed = 0
+        now = self.clock()
+        for total in self.buckets:
+            while self.depth(total) >= total: # All-human rooms, oldest tickets first; everyone accepts zero bots
+                tickets = []
+                for _ in range(total):
+                    tickets.append(self._oldest(total))
+                    self._remove(tickets[-1])
+                self._form(tickets, 0)
+                formed += 1
+            while self._backfill(total, now):
+                formed += 1
+        return formed
+
+    def wait_percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        """Seconds waited before a match, over the last WAIT_HISTORY matched players."""
+        waits = sorted(self.waits)
+        if not waits:
+            return {}
+        return {q: waits[min(len(waits) - 1, int(q * len(waits)))] for q in quantiles}
+
+    def _run(self):
+        while self.tickets:
+            eventlet.sleep(self.interval)
+            try:
+                self.match()
+            except Exception:
+                logger.exception("Matchmaking batch failed.")
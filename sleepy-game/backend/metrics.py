@@ -0,0 +1,151 @@
+# sleepy-game/backend/metrics.py
+# In-process counters, gauges and histograms, rendered in the Prometheus text format
+# by the /metrics route. Hot paths are instrumented with the timed decorator and
+# Histogram.time() context manager. With METRICS=0 the decorator hands back the
+# function unchanged and time() is a shared no-op, so instrumentation costs nothing.
+import bisect
+import contextlib
+import functools
+import time
+
+from logging_setup import env_flag
+
+ENABLED = env_flag("METRICS", default=True)
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BYTES_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+WAIT_BUCKETS = (0.5, 1, 2, 5, 10, 15, 20, 30, 60, 120, 300)
+
+REGISTRY = []
+
+def format_labels(labelnames, labelvalues, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labelvalues, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labelvalues)} {value}"
+
+class Gauge:
+    """
+    Read when scraped: callback returns a number, or None to leave the sample out.
+    With labelnames it returns {label values: number} instead.
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = labelnames
+        REGISTRY.append(self)
+
+    def render(self):
+        value = self.callback()
+        if value is None:
+            return
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        if not self.labelnames:
+            yield f"{self.name} {value}"
+            return
+        for labelvalues, sample in sorted(value.items()):
+            yield f"{self.name}{format_labels(self.labelnames, labelvalues)} {sample}"
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series = {} # label values -> [per-bucket counts (last one is +Inf), sum]
+        REGISTRY.append(self)
+
+    def observe(self, value, *labelvalues):
+        series = self.series.get(labelvalues)
+        if series is None:
+            series = self.series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def time(self, *labelvalues):
+        return _Timer(self, labelvalues) if ENABLED else _NO_TIMER
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labelvalues, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labelvalues)} {total}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labelvalues)} {cumulative}"
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+
+_NO_TIMER = contextlib.nullcontext()
+
+def timed(histogram, *labelvalues):
+    """Decorator recording each call's duration in histogram (exceptions included)."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labelvalues)
+        return wrapper
+    return decorate
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def resident_memory_bytes():
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None # Not Linux
+
+# Shared by the modules that are instrumented
+FUNCTION_SECONDS = Histogram("sleepy_function_seconds", "Time spent in game rules and bot functions.", ("function",))
+HANDLER_SECONDS = Histogram("sleepy_socketio_handler_seconds", "Time spent handling each Socket.IO event, room mailbox wait included.", ("event",))
+GAME_UPDATE_BYTES = Histogram("sleepy_game_update_payload_bytes", "Encoded size of each game_update sent to a player.", buckets=BYTES_BUCKETS)
+STALE_ACTIONS = Counter("sleepy_stale_actions_total", "Actions rejected for carrying an old revision.", ("event",))
+Gauge("sleepy_process_resident_memory_bytes", "Resident memory of the server process.", resident_memory_bytes)
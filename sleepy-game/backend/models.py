@@ -1 +1,169 @@
-# No database models needed for this in-memory game state.
+# sleepy-game/backend/models.py
+# Compact, slotted representation of a game state. The rules engine in game_logic.py
+# works on plain dicts (the same shape the React frontend receives); these classes
+# are the memory-lean form of that state, with cards and characters stored as small
+# integer ids into ACTION_CARD_TEMPLATES / CHARACTER_TEMPLATES instead of repeated
+# strings and template references. from_game_state/to_game_state convert between
+# the two without changing the wire format.
+import copy
+
+from action_log import ActionLog
+from game_logic import ACTION_CARD_TEMPLATES, CHARACTER_TEMPLATES, Hand, build_character_index
+
+CARD_ID_BY_NAME = {card["name"]: card_id for card_id, card in enumerate(ACTION_CARD_TEMPLATES)}
+CHARACTER_ID_BY_NAME = {char["name"]: template_id for template_id, char in enumerate(CHARACTER_TEMPLATES)}
+
+class CharacterState:
+    # Name, age, max_sleep and description all come from the template
+    __slots__ = ("template_id", "current_sleep", "is_asleep", "is_protected")
+
+    def __init__(self, template_id, current_sleep=0, is_asleep=False, is_protected=False):
+        self.template_id = template_id
+        self.current_sleep = current_sleep
+        self.is_asleep = is_asleep
+        self.is_protected = is_protected
+
+    @classmethod
+    def from_dict(cls, char):
+        return cls(CHARACTER_ID_BY_NAME[char["name"]], char["current_sleep"], char["is_asleep"], char["is_protected"])
+
+    def to_dict(self, player_id, slot):
+        template = CHARACTER_TEMPLATES[self.template_id]
+        return {
+            "id": f"{player_id}_char_{slot}",
+            "player_id": player_id,
+            "name": template["name"],
+            "age": template["age"],
+            "current_sleep": self.current_sleep,
+            "max_sleep": template["max_sleep"],
+            "is_asleep": self.is_asleep,
+            "is_protected": self.is_protected,
+            "description": template["description"]
+        }
+
+class PlayerState:
+    # hand is a bytearray of card ids: one byte per card instead of a list of dict references
+    __slots__ = ("player_id", "player_name", "is_bot", "has_lost", "sleep_count", "characters", "hand")
+
+    def __init__(self, player_id, player_name, is_bot=False, has_lost=False, sleep_count=0, characters=None, hand=None):
+        self.player_id = player_id
+        self.player_name = player_name
+        self.is_bot = is_bot
+        self.has_lost = has_lost
+        self.sleep_count = sleep_count
+        self.characters = characters or []
+        self.hand = hand if hand is not None else bytearray()
+
+    @classmethod
+    def from_dict(cls, player_id, p_data):
+        return cls(
+            player_id,
+            p_data["player_name"],
+            p_data["is_bot"],
+            p_data["has_lost"],
+            p_data["sleep_count"],
+            [CharacterState.from_dict(char) for char in p_data["characters"]],
+            bytearray(CARD_ID_BY_NAME[card["name"]] for card in p_data["hand"])
+        )
+
+    def to_dict(self):
+        hand = Hand(ACTION_CARD_TEMPLATES[card_id] for card_id in self.hand)
+        return {
+            "characters": [char.to_dict(self.player_id, slot) for slot, char in enumerate(self.characters)],
+            "hand": hand,
+            "sleep_count": self.sleep_count,
+            "player_name": self.player_name,
+            "has_defense_card_in_hand": hand.has_type("defense"),
+            "is_bot": self.is_bot,
+            "has_lost": self.has_lost
+        }
+
+class RoomState:
+    __slots__ = ("players", "current_turn", "message", "game_over", "winner", "action_log", "action_log_total", "pending_attack",
+                 "swap_in_progress", "selected_cards_for_swap", "player_turn_order", "revision")
+
+    def __init__(self, players, current_turn, message="", game_over=False, winner=None, action_log=None, action_log_total=None,
+                 pending_attack=None, swap_in_progress=False, selected_cards_for_swap=None, player_turn_order=None, revision=0):
+        self.players = players # List of PlayerState in turn order
+        self.current_turn = current_turn
+        self.message = message
+        self.game_over = game_over
+        self.winner = winner
+        self.action_log = action_log if action_log is not None else [] # Recent entries only, like ActionLog
+        self.action_log_total = len(self.action_log) if action_log_total is None else action_log_total
+        self.pending_attack = pending_attack
+        self.swap_in_progress = swap_in_progress
+        self.selected_cards_for_swap = selected_cards_for_swap if selected_cards_for_swap is not None else []
+        self.player_turn_order = player_turn_order or [player.player_id for player in players]
+        self.revision = revision
+
+    @classmethod
+    def from_game_state(cls, game_state):
+        return cls(
+            [PlayerState.from_dict(p_id, p_data) for p_id, p_data in game_state["players"].items()],
+            game_state["current_turn"],
+            game_state["message"],
+            game_state["game_over"],
+            game_state["winner"],
+            game_state["action_log"].to_list(),
+            game_state["action_log"].total,
+            copy.deepcopy(game_state.get("pending_attack")),
+            game_state.get("swap_in_progress", False),
+            list(game_state.get("selected_cards_for_swap", [])),
+            list(game_state["player_turn_order"]),
+            game_state.get("revision", 0)
+        )
+
+    def to_game_state(self):
+        # Same keys and order as game_logic.initialize_game builds
+        game_state = {
+            "players": {player.player_id: player.to_dict() for player in self.players},
+            "current_turn": self.current_turn,
+            "message": self.message,
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "action_log": ActionLog(self.action_log, total=self.action_log_total),
+            "pending_attack": copy.deepcopy(self.pending_attack),
+            "swap_in_progress": self.swap_in_progress,
+            "selected_cards_for_swap": list(self.selected_cards_for_swap),
+            "player_turn_order": list(self.player_turn_order),
+            "revision": self.revision
+        }
+        game_state["characters_by_id"] = build_character_index(game_state)
+        return game_state
+
+    def to_compact(self):
+        """
+        Plain, JSON-serializable form built only from ids and numbers (plus the log
+        text), for storing rooms or shipping them between processes.
+        """
+        return {
+            "players": [
+                [player.player_id, player.player_name, player.is_bot, player.has_lost, player.sleep_count,
+                 [[char.template_id, char.current_sleep, char.is_asleep, char.is_protected] for char in player.characters],
+                 list(player.hand)]
+                for player in self.players
+            ],
+            "current_turn": self.current_turn,
+            "message": self.message,
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "action_log": list(self.action_log),
+            "action_log_total": self.action_log_total,
+            "pending_attack": self.pending_attack,
+            "swap_in_progress": self.swap_in_progress,
+            "selected_cards_for_swap": self.selected_cards_for_swap,
+            "player_turn_order": self.player_turn_order,
+            "revision": self.revision
+        }
+
+    @classmethod
+    def from_compact(cls, data):
+        players = [
+            PlayerState(player_id, player_name, is_bot, has_lost, sleep_count,
+                        [CharacterState(*char) for char in characters], bytearray(hand))
+            for player_id, player_name, is_bot, has_lost, sleep_count, characters, hand in data["players"]
+        ]
+        return cls(players, data["current_turn"], data["message"], data["game_over"], data["winner"], list(data["action_log"]),
+                   data["action_log_total"], copy.deepcopy(data["pending_attack"]), data["swap_in_progress"], list(data["selected_cards_for_swap"]),
+                   list(data["player_turn_order"]), data["revision"])
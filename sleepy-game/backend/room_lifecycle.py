@@ -0,0 +1,98 @@
+# sleepy-game/backend/room_lifecycle.py
+import logging
+import secrets
+import time
+
+import eventlet
+
+logger = logging.getLogger("room_lifecycle")
+
+# Seconds; see eviction_reason
+FINISHED_ROOM_TTL = 120 # Finished games stay long enough for players to read the result
+LOBBY_TTL = 900 # Rooms still waiting for players
+IDLE_ROOM_TTL = 1800 # Games where nobody has moved
+SWEEP_INTERVAL = 30
+RESUME_GRACE_SECONDS = 60 # A disconnected player's seat is held this long for resume_session
+RESUME_HISTORY = 20 # Recent revisions a resuming client can get a delta from, rather than the full state
+
+def new_resume_token():
+    # Handed to a player with their seat; presenting it later (resume_session) reclaims the seat
+    return secrets.token_urlsafe(16)
+
+class SidIndex:
+    """
+    sid -> (room_id, player_id) for every connected human seat, kept up to date by
+    create_room, join_room and room removal, so finding a socket's room does not
+    mean scanning every room.
+    """
+
+    def __init__(self):
+        self.by_sid = {}
+
+    def add(self, sid, room_id, player_id):
+        self.by_sid[sid] = (room_id, player_id)
+
+    def get(self, sid):
+        return self.by_sid.get(sid)
+
+    def pop(self, sid):
+        return self.by_sid.pop(sid, None)
+
+    def remove_room(self, room_id, room_data):
+        for p_data in room_data['player_sids'].values():
+            sid = p_data.get('sid')
+            if sid and self.by_sid.get(sid, (None,))[0] == room_id:
+                del self.by_sid[sid]
+
+    def __len__(self):
+        return len(self.by_sid)
+
+def eviction_reason(room_data, now):
+    """Why a room should be closed at time now, or None to keep it."""
+    finished_at = room_data.get('finished_at')
+    if finished_at is not None:
+        return 'finished' if now - finished_at >= FINISHED_ROOM_TTL else None
+    idle = now - room_data['last_activity']
+    if room_data['waiting_for_players']:
+        return 'lobby_expired' if idle >= LOBBY_TTL else None
+    return 'idle' if idle >= IDLE_ROOM_TTL else None
+
+class RoomReaper:
+    """
+    Closes finished and abandoned rooms on a timer, so memory stays bounded even
+    when nobody disconnects cleanly. One green thread sweeps all rooms every
+    SWEEP_INTERVAL seconds; evict(room_id, reason) returns False to retry a room at
+    the next sweep (e.g. while it is busy with an action).
+    """
+
+    def __init__(self, rooms, evict, clock=time.monotonic, interval=SWEEP_INTERVAL):
+        self.rooms = rooms
+        self.evict = evict
+        self.clock = clock
+        self.interval = interval
+        self.loop = None
+        self.evicted = 0
+
+    def start(self):
+        if self.loop is None or self.loop.dead:
+            self.loop = eventlet.spawn(self._run)
+
+    def sweep(self):
+        now = self.clock()
+        evicted = 0
+        for room_id, room_data in list(self.rooms.items()):
+            reason = eviction_reason(room_data, now)
+            if reason and self.evict(room_id, reason):
+                evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def _run(self):
+        while True:
+            eventlet.sleep(self.interval)
+            try:
+                evicted = self.sweep()
+                if evicted:
+                    logger.info("Evicted %s rooms; %s remain.", evicted, len(self.rooms))
+            except Exception:
+                logger.exception("Room sweep failed.")
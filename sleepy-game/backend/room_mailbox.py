@@ -0,0 +1,68 @@
+# sleepy-game/backend/room_mailbox.py
+import contextlib
+import logging
+
+import eventlet.semaphore
+
+logger = logging.getLogger("room_mailbox")
+
+class RoomMailboxes:
+    """
+    Serializes the actions of each room. A handler or bot move enters the room's
+    mailbox before touching its game state and leaves it once the update has been
+    broadcast; anything arriving meanwhile waits its turn, in arrival order. Rooms
+    have separate mailboxes, so a busy room never holds up another one. A room's
+    entry exists only while someone is inside or waiting.
+    """
+
+    def __init__(self):
+        self.rooms = {} # room_id -> [semaphore, holders and waiters]
+
+    def enter(self, room_id, blocking=True):
+        entry = self.rooms.get(room_id)
+        if entry is None:
+            entry = self.rooms[room_id] = [eventlet.semaphore.Semaphore(1), 0]
+        entry[1] += 1
+        if entry[0].acquire(blocking=blocking):
+            return True
+        self._release_entry(room_id, entry)
+        return False
+
+    def leave(self, room_id):
+        entry = self.rooms[room_id]
+        entry[0].release()
+        self._release_entry(room_id, entry)
+
+    def _release_entry(self, room_id, entry):
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.rooms[room_id]
+
+    @contextlib.contextmanager
+    def turn(self, room_id):
+        self.enter(room_id)
+        try:
+            yield
+        finally:
+            self.leave(room_id)
+
+    def waiting(self, room_id):
+        # Actions queued behind the one being processed
+        entry = self.rooms.get(room_id)
+        return max(entry[1] - 1, 0) if entry else 0
+
+def check_revision(game_state, data):
+    """
+    Actions may carry the revision the client last saw. Anything else means the board
+    moved on since the player chose the move (or the action is a resend), so it is
+    rejected up front. Returns the error payload, or None when the action may proceed.
+    Actions without a revision are accepted, as before.
+    """
+    client_revision = data.get('revision')
+    if client_revision is None or client_revision == game_state['revision']:
+        return None
+    return {
+        'message': 'The game has moved on since this action was chosen. Please try again.',
+        'code': 'stale_revision',
+        'revision': game_state['revision']
+    }
@@ -0,0 +1,239 @@
+# sleepy-game/backend/room_store.py
+# Persistence for live rooms, so a restart or deploy does not drop games in progress.
+# Each room is stored as its settings, a periodic snapshot (models.RoomState compact
+# form plus the room's rng state) and the actions applied since that snapshot, in
+# the dict form game_logic.apply_action takes. Recovery loads the snapshot and replays
+# the actions through apply_action; because every random outcome of the rules comes
+# from the room's generator, the replay ends in the same state.
+#
+# Writes never block the eventlet loop: callers only put records on a queue, and a
+# real OS thread commits whatever has queued up in one transaction (group commit).
+# Configured with ROOM_STORE: "sqlite:<path>" (default sqlite:rooms.db) or "none".
+import json
+import logging
+import os
+import random
+import sqlite3
+
+try:
+    from eventlet import patcher
+    _threading = patcher.original("threading")
+    _queue = patcher.original("queue")
+except ImportError:
+    import threading as _threading
+    import queue as _queue
+
+import game_logic
+from models import RoomState
+
+logger = logging.getLogger("room_store")
+
+SNAPSHOT_EVERY = 50 # Actions between snapshots; replay after a crash is at most this long per room
+MAX_BATCH = 1000 # Records per transaction
+
+# Room settings kept next to the game; sids are not, they die with the process (seats are reclaimed by token)
+ROOM_SETTINGS = ("total_players", "num_bots", "bot_think_time", "bot_tier", "bot_search_ms")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rooms (room_id TEXT PRIMARY KEY, settings TEXT NOT NULL, players TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS snapshots (room_id TEXT PRIMARY KEY, seq INTEGER NOT NULL, state TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS actions (room_id TEXT NOT NULL, seq INTEGER NOT NULL, action TEXT NOT NULL, PRIMARY KEY (room_id, seq));
+"""
+
+def encode_snapshot(game_state):
+    state = RoomState.from_game_state(game_state).to_compact()
+    state["rng"] = game_logic.get_rng(game_state).getstate()
+    return state
+
+def decode_snapshot(state):
+    rng_state = state.pop("rng")
+    game_state = RoomState.from_compact(state).to_game_state()
+    rng = random.Random()
+    rng.setstate((rng_state[0], tuple(rng_state[1]), rng_state[2]))
+    game_state["rng"] = rng
+    game_state["journal"] = None
+    return game_state
+
+class RoomJournal:
+    """Set as game_state["journal"]; game_logic.apply_action reports every applied move to it."""
+
+    def __init__(self, store, room_id, seq=0):
+        self.store = store
+        self.room_id = room_id
+        self.seq = seq
+        self.snapshot_seq = seq
+
+    def append(self, player_id, action, revision):
+        self.seq += 1
+        self.store.write(("action", self.room_id, self.seq, {"player_id": player_id, "action": action, "revision": revision}))
+
+class SqliteWriter:
+    """Real OS thread owning the SQLite connection; commits queued records in batches."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = _queue.Queue()
+        self.thread = _threading.Thread(target=self._run, name="room-store-writer", daemon=True)
+        self.committed_batches = 0
+
+    def start(self):
+        self.thread.start()
+
+    def _run(self):
+        connection = connect(self.path)
+        while True:
+            batch = [self.records.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.records.get_nowait())
+                except _queue.Empty:
+                    break
+            try:
+                with connection: # One transaction, so one fsync, for the whole batch
+                    for record in batch:
+                        if record is not None and record[0] != "flush":
+                            write_record(connection, record)
+                self.committed_batches += 1
+            except Exception:
+                logger.exception("Room store failed to commit %s records.", len(batch))
+            for record in batch:
+                if record is not None and record[0] == "flush":
+                    record[1].set()
+            if None in batch:
+                break
+        connection.close()
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL") # With WAL, commits survive a process crash; only power loss can drop the last batch
+    connection.executescript(SCHEMA)
+    return connection
+
+def write_record(connection, record):
+    kind, room_id = record[0], record[1]
+    if kind == "action":
+        connection.execute("INSERT OR REPLACE INTO actions VALUES (?, ?, ?)", (room_id, record[2], json.dumps(record[3])))
+    elif kind == "snapshot":
+        _, _, seq, state = record
+        connection.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (room_id, seq, json.dumps(state, separators=(",", ":"))))
+        connection.execute("DELETE FROM actions WHERE room_id = ? AND seq <= ?", (room_id, seq))
+    elif kind == "room":
+        connection.execute("INSERT OR REPLACE INTO rooms VALUES (?, ?, ?)", (room_id, json.dumps(record[2]), json.dumps(record[3])))
+    elif kind == "delete":
+        for table in ("rooms", "snapshots", "actions"):
+            connection.execute(f"DELETE FROM {table} WHERE room_id = ?", (room_id,))
+
+def room_record(room_id, room_data):
+    settings = {key: room_data.get(key) for key in ROOM_SETTINGS}
+    # Resume tokens are kept so players can reclaim their seats after a restart
+    players = {p_id: {'is_bot': p_data['is_bot'], 'token': p_data.get('token')} for p_id, p_data in room_data['player_sids'].items()}
+    return ("room", room_id, settings, players)
+
+class SqliteRoomStore:
+    def __init__(self, path):
+        self.path = path
+        self.writer = SqliteWriter(path)
+        self.writer.start()
+
+    def write(self, record):
+        self.writer.records.put(record)
+
+    def save_room(self, room_id, room_data):
+        """Stores a newly started room and attaches a journal to its game state."""
+        game_state = room_data['game_state']
+        self.write(room_record(room_id, room_data))
+        game_state["journal"] = RoomJournal(self, room_id)
+        self.save_snapshot(room_id, game_state)
+
+    def save_players(self, room_id, room_data):
+        """Rewrites the seats of a stored room (e.g. after a bot took one over), with a fresh snapshot."""
+        self.write(room_record(room_id, room_data))
+        if room_data['game_state'].get("journal") is not None:
+            self.save_snapshot(room_id, room_data['game_state'])
+
+    def save_snapshot(self, room_id, game_state):
+        journal = game_state["journal"]
+        journal.snapshot_seq = journal.seq
+        # The compact copy is taken now; turning it into JSON happens on the writer thread
+        self.write(("snapshot", room_id, journal.seq, encode_snapshot(game_state)))
+
+    def after_update(self, room_id, game_state):
+        # Called once per broadcast; snapshots every SNAPSHOT_EVERY actions and when a game ends
+        journal = game_state.get("journal")
+        if journal is None:
+            return
+        if journal.seq - journal.snapshot_seq >= SNAPSHOT_EVERY or (game_state["game_over"] and journal.seq > journal.snapshot_seq):
+            self.save_snapshot(room_id, game_state)
+
+    def delete_room(self, room_id):
+        self.write(("delete", room_id))
+
+    def flush(self, timeout=5):
+        done = _threading.Event()
+        self.write(("flush", done))
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self.write(None)
+        self.writer.thread.join(timeout=5)
+
+    def load_rooms(self):
+        """
+        Rebuilds every stored room. Yields (room_id, settings, players, game_state)
+        with the journal re-attached, after replaying actions newer than the snapshot.
+        Runs synchronously; meant for startup, before the server takes connections.
+        """
+        connection = connect(self.path)
+        try:
+            rooms = connection.execute("SELECT room_id, settings, players FROM rooms").fetchall()
+            for room_id, settings, players in rooms:
+                row = connection.execute("SELECT seq, state FROM snapshots WHERE room_id = ?", (room_id,)).fetchone()
+                if row is None:
+                    continue
+                snapshot_seq, state = row
+                game_state = decode_snapshot(json.loads(state))
+                seq = snapshot_seq
+                for seq, entry in connection.execute("SELECT seq, action FROM actions WHERE room_id = ? AND seq > ? ORDER BY seq", (room_id, snapshot_seq)):
+                    entry = json.loads(entry)
+                    game_state = game_logic.apply_action(game_state, entry["player_id"], entry["action"])
+                    game_state["revision"] = entry["revision"] + 1
+                journal = RoomJournal(self, room_id, seq)
+                journal.snapshot_seq = snapshot_seq
+                game_state["journal"] = journal
+                yield room_id, json.loads(settings), json.loads(players), game_state
+        finally:
+            connection.close()
+
+class NullRoomStore:
+    """ROOM_STORE=none: rooms live in memory only, as before."""
+
+    def save_room(self, room_id, room_data):
+        pass
+
+    def save_players(self, room_id, room_data):
+        pass
+
+    def after_update(self, room_id, game_state):
+        pass
+
+    def delete_room(self, room_id):
+        pass
+
+    def flush(self, timeout=5):
+        return True
+
+    def close(self):
+        pass
+
+    def load_rooms(self):
+        return iter(())
+
+def create_room_store(spec=None):
+    spec = spec if spec is not None else os.environ.get("ROOM_STORE", "sqlite:rooms.db")
+    if spec == "none":
+        return NullRoomStore()
+    if spec.startswith("sqlite:"):
+        return SqliteRoomStore(spec[len("sqlite:"):])
+    raise ValueError(f"Unknown ROOM_STORE '{spec}'. Use 'sqlite:<path>' or 'none'.")
@@ -0,0 +1,197 @@
+# sleepy-game/backend/search_bot.py
+# Lookahead bot tier. Each decision is picked by information-set Monte Carlo: every
+# iteration deals the opponents' hidden hands from the card distribution (keeping
+# what is public, i.e. whether they hold a Defense card), plays one candidate action
+# on a clone of the state and then rolls the game forward a few turns with a cheap
+# policy for every seat. Candidates share the iterations via UCB1 until the
+# millisecond budget runs out.
+import logging
+import math
+import random
+import time
+
+import bot_ai
+import game_logic
+import metrics
+from game_logic import (ACTION_CARD_TEMPLATES, CARD_SAMPLER, END_TURN, INITIAL_CHARACTERS_PER_PLAYER, Hand, apply_card_effect, check_win_condition,
+                        clone_game_state, end_turn, iter_legal_moves, move_to_action)
+
+logger = logging.getLogger("search_bot")
+
+DEFAULT_SEARCH_BUDGET_MS = 150
+MAX_SEARCH_BUDGET_MS = 2000
+ROLLOUT_TURNS = 4 # Turns played past the decision before the position is scored
+MAX_PLAYS_PER_TURN = 12 # Safety net for turns that keep refilling the hand (Thief)
+EXPLORATION = 0.7
+
+DEFENSE_CARD = next(card for card in ACTION_CARD_TEMPLATES if card["type"] == "defense")
+
+def candidate_actions(game_state, player_id, rng):
+    """
+    The moves worth searching on `player_id`'s turn: the useful legal moves, with
+    identical cards collapsed and one random Swap per opponent (picked once, so the
+    move stays the same across iterations).
+    """
+    return list(iter_legal_moves(game_state, player_id, distinct=True, rng=rng, useful_only=True))
+
+def apply_rollout_move(game_state, player_id, move):
+    # Plays an iter_legal_moves tuple on a rollout clone: straight into the rules, with no
+    # journal or record to feed (real moves go through game_logic.apply_action)
+    if move == END_TURN:
+        return end_turn(game_state, player_id)
+    _, card_index, target_character_id, target_card_indices, target_player_id = move
+    # Swap indices are consumed by the rules, so each application gets its own copy
+    return apply_card_effect(game_state, player_id, card_index, target_character_id,
+                             list(target_card_indices) if target_card_indices else None, None, target_player_id)
+
+def sample_hidden_hand(size, has_defense, rng):
+    # A dealt hand that agrees with the public has_defense_card_in_hand flag
+    hand = Hand(CARD_SAMPLER.draw(size, rng))
+    if not has_defense:
+        while hand.has_type("defense"):
+            hand[hand.index_of_type("defense")] = CARD_SAMPLER.draw_one(rng)
+    elif size and not hand.has_type("defense"):
+        hand[rng.randrange(size)] = DEFENSE_CARD
+    return hand
+
+def determinize(game_state, player_id, rng):
+    state = clone_game_state(game_state, rng=rng) # Rollout draws must not advance the room's own generator
+    for p_id, p_data in state["players"].items():
+        if p_id != player_id:
+            p_data["hand"] = sample_hidden_hand(len(p_data["hand"]), p_data["has_defense_card_in_hand"], rng)
+    return state
+
+def quick_score(game_state, player_id, action):
+    # Cheap one-move heuristic used to play out rollouts
+    if action == END_TURN:
+        return 0.0
+    _, card_index, target_character_id, _, target_player_id = action
+    card = game_state["players"][player_id]["hand"][card_index]
+    if card["type"] in ("attack", "support", "lucky"):
+        char = game_state["characters_by_id"][target_character_id]
+        needed = char["max_sleep"] - char["current_sleep"]
+        if card["type"] == "lucky":
+            return 2.0 + needed / 4
+        if card["type"] == "support":
+            return 3.0 if needed <= card["effect"]["value"] else card["effect"]["value"] / needed
+        return min(-card["effect"]["value"], char["current_sleep"]) / 2 + char["current_sleep"] / char["max_sleep"]
+    if card["type"] == "theif":
+        return 0.5 * len(game_state["players"][target_player_id]["hand"])
+    return 0.2
+
+def rollout_move(game_state, player_id, rng):
+    actions = candidate_actions(game_state, player_id, rng)
+    if rng.random() < 0.1:
+        return rng.choice(actions)
+    return max(actions, key=lambda action: (quick_score(game_state, player_id, action), rng.random()))
+
+def resolve_pending(game_state):
+    # Only human targets holding a Defense card leave an action pending; assume they use it
+    target_id = game_state["pending_attack"]["target_player_id"]
+    defense_index = game_state["players"][target_id]["hand"].index_of_type("defense")
+    return apply_card_effect(game_state, target_id, defense_index, None, None, defending_card_index=defense_index)
+
+def evaluate(game_state, player_id):
+    # Roughly in [-1, 1]: own progress minus the best opponent's
+    def progress(p_data):
+        if p_data["sleep_count"] >= INITIAL_CHARACTERS_PER_PLAYER:
+            return 10.0
+        return p_data["sleep_count"] + sum(min(char["current_sleep"], char["max_sleep"]) / char["max_sleep"] * 0.6
+                                           for char in p_data["characters"] if not char["is_asleep"])
+
+    mine = progress(game_state["players"][player_id])
+    best_other = max(progress(p_data) for p_id, p_data in game_state["players"].items() if p_id != player_id)
+    return max(-1.0, min(1.0, (mine - best_other) / 4))
+
+def simulate(game_state, player_id, action, rng, rollout_turns):
+    """Plays `action` and then `rollout_turns` turns of the rollout policy. Returns (value, nodes)."""
+    state = apply_rollout_move(game_state, player_id, action)
+    nodes = 1
+    turns = 1 if action == END_TURN else 0
+    plays_this_turn = 0
+    while turns <= rollout_turns:
+        if state["game_over"] or check_win_condition(state)["game_over"]:
+            break
+        if state.get("pending_attack"):
+            state = resolve_pending(state)
+        else:
+            mover = state["current_turn"]
+            move = END_TURN if plays_this_turn >= MAX_PLAYS_PER_TURN else rollout_move(state, mover, rng)
+            try:
+                state = apply_rollout_move(state, mover, move)
+            except ValueError:
+                move = END_TURN # A move the rules reject in this deal just ends the turn
+                state = apply_rollout_move(state, mover, move)
+            if move == END_TURN:
+                turns += 1
+                plays_this_turn = 0
+            else:
+                plays_this_turn += 1
+        nodes += 1
+    return evaluate(state, player_id), nodes
+
+def choose_action(game_state, player_id, budget_ms=DEFAULT_SEARCH_BUDGET_MS, rng=None, rollout_turns=ROLLOUT_TURNS):
+    """
+    Picks the next move for `player_id` within roughly `budget_ms`. Returns the
+    action and a stats dict (iterations, nodes, elapsed_ms).
+    """
+    rng = rng or random
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000
+    actions = candidate_actions(game_state, player_id, rng)
+    visits = [0] * len(actions)
+    totals = [0.0] * len(actions)
+    iterations = nodes = 0
+
+    if len(actions) > 1:
+        while True:
+            iterations += 1
+            if iterations <= len(actions):
+                choice = iterations - 1 # Every candidate is tried once before UCB takes over
+            else:
+                log_n = math.log(iterations)
+                choice = max(range(len(actions)), key=lambda i: totals[i] / visits[i] + EXPLORATION * math.sqrt(log_n / visits[i]))
+            try:
+                value, used = simulate(determinize(game_state, player_id, rng), player_id, actions[choice], rng, rollout_turns)
+            except ValueError:
+                value, used = -1.0, 1 # Illegal in this deal (e.g. a Swap the sampled hands cannot satisfy)
+            visits[choice] += 1
+            totals[choice] += value
+            nodes += used
+            if time.perf_counter() >= deadline and iterations >= len(actions):
+                break
+
+    best = max(range(len(actions)), key=lambda i: (visits[i], totals[i])) if iterations else 0
+    stats = {"iterations": iterations, "nodes": nodes, "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)}
+    return actions[best], stats
+
+@metrics.timed(metrics.FUNCTION_SECONDS, "make_search_bot_move")
+def make_search_bot_move(game_state, budget_ms=DEFAULT_SEARCH_BUDGET_MS, rng=None):
+    """
+    Same contract as bot_ai.make_bot_move: plays the current bot's whole turn (or its
+    answer to a pending attack) on `game_state` and returns it. `budget_ms` applies to
+    each card play.
+    """
+    bot_player_id = game_state["current_turn"]
+    if not game_state["players"][bot_player_id].get("is_bot") or game_state.get("pending_attack"):
+        return bot_ai.make_bot_move(game_state) # Defending is a forced choice; the greedy rules already cover it
+
+    for _ in range(MAX_PLAYS_PER_TURN):
+        action, stats = choose_action(game_state, bot_player_id, budget_ms, rng)
+        logger.debug("Search bot %s chose %s after %s iterations (%s nodes, %s ms).", bot_player_id, action, stats["iterations"], stats["nodes"], stats["elapsed_ms"],
+                     extra={"player_id": bot_player_id, "action": "search", "latency_ms": stats["elapsed_ms"]})
+        if action == END_TURN:
+            break
+        try:
+            game_state = game_logic.apply_action(game_state, bot_player_id, move_to_action(action))
+        except ValueError as e:
+            logger.warning("Search bot %s failed to play %s: %s", bot_player_id, action, e, extra={"player_id": bot_player_id, "action": "search"})
+            break
+        if game_state.get("pending_attack") or game_state["current_turn"] != bot_player_id or check_win_condition(game_state)["game_over"]:
+            return game_state # Waiting on a defender, or the game is decided
+
+    try:
+        return game_logic.apply_action(game_state, bot_player_id, move_to_action(END_TURN))
+    except ValueError as e:
+        logger.warning("Search bot %s error ending turn: %s. Returning current state.", bot_player_id, e, extra={"player_id": bot_player_id, "action": "end_turn"})
+        return game_state
@@ -0,0 +1,92 @@
+# sleepy-game/backend/sharding.py
+# Running several backend workers. Every room lives on exactly one worker (its
+# shard), and the room id says which: id % SHARD_COUNT == SHARD_ID. The proxy sends a
+# socket to a shard by its ?shard= query parameter (see frontend/nginx.conf), and the
+# client picks the shard from the room id before joining. Emits that must reach
+# sockets on other workers go through the Socket.IO message queue.
+#   SHARD_ID                 this worker's shard (default 0)
+#   SHARD_COUNT              number of workers (default 1, i.e. no sharding)
+#   SOCKETIO_MESSAGE_QUEUE   e.g. redis://redis:6379/0, or local:// for the in-process stand-in
+import logging
+import os
+import pickle
+
+import eventlet.queue
+import socketio
+
+logger = logging.getLogger("sharding")
+
+FIRST_ROOM_SEQUENCE = 1000
+
+class RoomIdAllocator:
+    """
+    Hands out room ids owned by one shard: sequence * shard_count + shard_id. With a
+    single shard this is the old 1000, 1001, ... counter.
+    """
+
+    def __init__(self, shard_id=0, shard_count=1, first_sequence=FIRST_ROOM_SEQUENCE):
+        if not 0 <= shard_id < shard_count:
+            raise ValueError(f"SHARD_ID must be between 0 and {shard_count - 1}, got {shard_id}.")
+        self.shard_id = shard_id
+        self.shard_count = shard_count
+        self.next_sequence = first_sequence
+
+    def allocate(self):
+        room_id = self.next_sequence * self.shard_count + self.shard_id
+        self.next_sequence += 1
+        return str(room_id)
+
+    def observe(self, room_id):
+        # Keeps allocating past ids that already exist (e.g. rooms restored at startup)
+        self.next_sequence = max(self.next_sequence, int(room_id) // self.shard_count + 1)
+
+    def shard_of(self, room_id):
+        try:
+            return int(room_id) % self.shard_count
+        except (TypeError, ValueError):
+            return None
+
+    def owns(self, room_id):
+        return self.shard_of(room_id) == self.shard_id
+
+def allocator_from_env():
+    return RoomIdAllocator(int(os.environ.get("SHARD_ID", "0")), int(os.environ.get("SHARD_COUNT", "1")))
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """
+    Stand-in for Redis when every Socket.IO server runs in one process (tests, load
+    tests): servers sharing a channel name receive each other's messages. Messages
+    are pickled like the real backends do, so anything that would not survive Redis
+    fails here too.
+    """
+    name = "local"
+    channels = {} # Channel name -> queues of the subscribed managers
+
+    def __init__(self, url="local://", channel="socketio", write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.inbox = eventlet.queue.LightQueue()
+        if not write_only:
+            LocalPubSubManager.channels.setdefault(channel, []).append(self.inbox)
+
+    def _publish(self, data):
+        message = pickle.dumps(data)
+        for inbox in LocalPubSubManager.channels.get(self.channel, []):
+            if inbox is not self.inbox:
+                inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self.inbox.get()
+
+def message_queue_options(url=None):
+    """
+    Keyword arguments for SocketIO() that set up cross-worker emits: message_queue
+    for real brokers (Flask-SocketIO picks the Redis/Kombu manager), or a
+    client_manager for local://. Empty without a queue.
+    """
+    url = url if url is not None else os.environ.get("SOCKETIO_MESSAGE_QUEUE")
+    if not url:
+        return {}
+    if url.startswith("local://"):
+        return {"client_manager": LocalPubSubManager(url, channel=url[len("local://"):] or "socketio")}
+    return {"message_queue": url}
@@ -0,0 +1,110 @@
+# sleepy-game/backend/simulate.py
+# Headless self-play: drives bot-only games straight through the rules engine
+# (initialize_game, bot_ai.make_bot_move, end_turn, check_win_condition) without
+# Socket.IO or eventlet timers, and spreads them over a process pool.
+#
+#   python simulate.py --games 10000 --players 4 --workers 8
+import argparse
+import collections
+import logging
+import multiprocessing
+import random
+import re
+import statistics
+import time
+
+import bot_ai
+import game_logic
+
+# Every card play is logged as "<player> used <Card_name> ..."
+USED_CARD_PATTERN = re.compile(r" used (\w+)")
+
+def play_game(seed, total_players=4, max_turns=500):
+    """
+    Plays one bot-only game. The seed goes to the room's generator (deal and draws)
+    and to the module-level one the bots decide with; within a worker process games
+    run one at a time, which makes every game reproducible from its seed.
+    """
+    random.seed(seed)
+    player_ids = [f"player{i}" for i in range(1, total_players + 1)]
+    game_state = game_logic.initialize_game(total_players, total_players, player_ids, seed)
+
+    card_usage = collections.Counter()
+    log_total = game_state["action_log"].total
+    turns = 0
+    win_status = game_logic.check_win_condition(game_state)
+
+    while not win_status["game_over"] and not game_state["game_over"] and turns < max_turns:
+        game_state = bot_ai.make_bot_move(game_state)
+        turns += 1
+        for entry in game_state["action_log"].since(log_total):
+            card_usage.update(USED_CARD_PATTERN.findall(entry))
+        log_total = game_state["action_log"].total
+        win_status = game_logic.check_win_condition(game_state)
+
+    winner = win_status["winner"] or game_state["winner"]
+    return {
+        "seed": seed,
+        "turns": turns,
+        "winner_seat": player_ids.index(winner) if winner else None,
+        "card_usage": card_usage,
+    }
+
+def _play_game_from_args(args):
+    return play_game(*args)
+
+def _init_worker():
+    # Bot decision logging would dominate the run time
+    logging.disable(logging.WARNING)
+
+def run_simulation(games, total_players=4, workers=None, base_seed=0, max_turns=500):
+    started = time.perf_counter()
+    jobs = [(base_seed + game_number, total_players, max_turns) for game_number in range(games)]
+
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+        results = list(pool.imap_unordered(_play_game_from_args, jobs, chunksize=max(1, games // ((workers or multiprocessing.cpu_count()) * 8))))
+
+    elapsed = time.perf_counter() - started
+    return summarize(results, total_players, elapsed)
+
+def summarize(results, total_players, elapsed):
+    turns = [result["turns"] for result in results]
+    wins_by_seat = collections.Counter(result["winner_seat"] for result in results)
+    card_usage = collections.Counter()
+    for result in results:
+        card_usage.update(result["card_usage"])
+
+    return {
+        "games": len(results),
+        "elapsed_seconds": elapsed,
+        "games_per_second": len(results) / elapsed if elapsed else float("inf"),
+        "turns_mean": statistics.mean(turns) if turns else 0,
+        "turns_median": statistics.median(turns) if turns else 0,
+        "turns_max": max(turns) if turns else 0,
+        "win_rate_by_seat": {f"player{seat + 1}": wins_by_seat[seat] / len(results) for seat in range(total_players)},
+        "unfinished_rate": wins_by_seat[None] / len(results) if results else 0,
+        "card_usage": dict(card_usage.most_common()),
+    }
+
+def print_report(report):
+    print(f"games: {report['games']} in {report['elapsed_seconds']:.2f}s ({report['games_per_second']:.1f} games/sec)")
+    print(f"turns per game: mean {report['turns_mean']:.1f}, median {report['turns_median']}, max {report['turns_max']}")
+    print("win rate by seat:")
+    for seat, rate in report["win_rate_by_seat"].items():
+        print(f"  {seat:<10} {rate:6.1%}")
+    print(f"  {'unfinished':<10} {report['unfinished_rate']:6.1%}")
+    print("card usage:")
+    total_plays = sum(report["card_usage"].values()) or 1
+    for card_name, count in report["card_usage"].items():
+        print(f"  {card_name:<28} {count:9d}  {count / total_plays:6.2%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run headless bot-only games for balance and throughput checks.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game; game N uses seed + N.")
+    parser.add_argument("--max-turns", type=int, default=500, help="Turns after which a game counts as unfinished.")
+    args = parser.parse_args()
+
+    print_report(run_simulation(args.games, args.players, args.workers, args.seed, args.max_turns))
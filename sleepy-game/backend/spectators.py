@@ -0,0 +1,73 @@
+# sleepy-game/backend/spectators.py
+# Read-only watchers of a room. Spectators join their own Socket.IO room (see
+# spectator_channel) and get the public, hand-less view. Each frame is built and
+# encoded once, and one emit reaches every spectator, so a room with 1,000 watchers
+# costs about what a room with one costs. A room's frames can be held back for a
+# delay (no peeking at a live game from a second tab), and at most one frame per
+# min_interval goes out; frames that were superseded in between are dropped.
+import collections
+import os
+import time
+
+SPECTATOR_DELAY_SECONDS = float(os.environ.get("SPECTATOR_DELAY_SECONDS", "0"))
+SPECTATOR_MIN_INTERVAL = float(os.environ.get("SPECTATOR_MIN_INTERVAL", "0.5")) # Seconds between frames per room
+
+def spectator_channel(room_id):
+    return f"spectators:{room_id}"
+
+class SpectatorFeed:
+    """
+    Pacing of one room's spectator frames. Without a delay nothing is buffered: the
+    feed is only marked stale, and the frame is built when it is sent. With a delay
+    every update has to be captured as it happens, but only the newest frame that has
+    aged past the delay is ever sent.
+    """
+
+    def __init__(self, delay=SPECTATOR_DELAY_SECONDS, min_interval=SPECTATOR_MIN_INTERVAL, clock=time.monotonic):
+        self.delay = delay
+        self.min_interval = min_interval
+        self.clock = clock
+        self.watchers = set() # sids
+        self.frames = collections.deque() # (captured_at, frame) waiting out the delay
+        self.stale = False
+        self.last_sent_at = None
+        self.last_frame = None # Sent to spectators joining between frames
+
+    def needs_capture(self):
+        return self.delay > 0
+
+    def push(self, frame):
+        self.frames.append((self.clock(), frame))
+
+    def mark_stale(self):
+        self.stale = True
+
+    def wait(self):
+        """Seconds until the next frame may go out, or None when there is nothing to send."""
+        now = self.clock()
+        if self.frames:
+            ready_at = self.frames[0][0] + self.delay
+        elif self.stale:
+            ready_at = now
+        else:
+            return None
+        if self.last_sent_at is not None:
+            ready_at = max(ready_at, self.last_sent_at + self.min_interval)
+        return max(0.0, ready_at - now)
+
+    def pop_due(self, build_frame):
+        """The frame to send now, or None; build_frame() makes one from the live state when nothing is buffered."""
+        now = self.clock()
+        if self.last_sent_at is not None and now - self.last_sent_at < self.min_interval:
+            return None
+        frame = None
+        if self.delay > 0:
+            while self.frames and now - self.frames[0][0] >= self.delay:
+                frame = self.frames.popleft()[1]
+        elif self.stale:
+            frame = build_frame()
+            self.stale = False
+        if frame is not None:
+            self.last_sent_at = now
+            self.last_frame = frame
+        return frame
@@ -0,0 +1,78 @@
+# sleepy-game/backend/state_sync.py
+import copy
+
+# Top-level game_state fields that are sent to clients and can change between revisions
+SYNCED_FIELDS = [
+    "current_turn",
+    "message",
+    "game_over",
+    "winner",
+    "pending_attack",
+    "swap_in_progress",
+    "selected_cards_for_swap",
+]
+
+def take_snapshot(game_state):
+    """
+    Captures the parts of a game state that clients see, in a compact form that is
+    safe to keep around while the live state keeps being mutated in place.
+    """
+    snapshot = {
+        "revision": game_state["revision"],
+        "fields": {field: copy.deepcopy(game_state.get(field)) for field in SYNCED_FIELDS},
+        "players": {},
+        "characters": {},
+        "hands": {},
+        "log_total": game_state["action_log"].total,
+    }
+
+    for p_id, p_data in game_state["players"].items():
+        snapshot["players"][p_id] = get_player_summary(p_data)
+        snapshot["hands"][p_id] = tuple(card["name"] for card in p_data["hand"])
+        for char in p_data["characters"]:
+            snapshot["characters"][char["id"]] = (char["current_sleep"], char["is_asleep"], char["is_protected"])
+
+    return snapshot
+
+def get_player_summary(player_data):
+    # Public per-player fields that change during a game (everything else is fixed at initialize_game)
+    return {
+        "sleep_count": player_data["sleep_count"],
+        "has_defense_card_in_hand": player_data["has_defense_card_in_hand"],
+        "has_lost": player_data["has_lost"],
+        "hand_size": len(player_data["hand"]),
+    }
+
+def build_public_delta(previous_snapshot, game_state):
+    # Everything in here is the same for every viewer; hands are handled by build_hand_deltas
+    delta = {
+        "fields": {},
+        "players": {},
+        "characters": [],
+        "action_log": game_state["action_log"].since(previous_snapshot["log_total"]),
+        "action_log_total": game_state["action_log"].total,
+    }
+
+    for field in SYNCED_FIELDS:
+        value = game_state.get(field)
+        if value != previous_snapshot["fields"].get(field):
+            delta["fields"][field] = value
+
+    for p_id, p_data in game_state["players"].items():
+        summary = get_player_summary(p_data)
+        if summary != previous_snapshot["players"].get(p_id):
+            delta["players"][p_id] = summary
+
+        for char in p_data["characters"]:
+            if (char["current_sleep"], char["is_asleep"], char["is_protected"]) != previous_snapshot["characters"].get(char["id"]):
+                delta["characters"].append(char)
+
+    return delta
+
+def build_hand_deltas(previous_snapshot, game_state):
+    # Hands are at most MAX_HAND_SIZE cards, so a changed hand is simply resent in full
+    hand_deltas = {}
+    for p_id, p_data in game_state["players"].items():
+        if tuple(card["name"] for card in p_data["hand"]) != previous_snapshot["hands"].get(p_id):
+            hand_deltas[p_id] = p_data["hand"]
+    return hand_deltas
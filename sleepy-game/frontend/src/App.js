@@ -3,6 +3,7 @@ import { BrowserRouter as Router, Routes, Route } from 'react-router-dom';
 import MainMenu from './pages/MainMenu';
 import MultiPlayerLobby from './pages/MultiPlayerLobby';
 import MultiPlayerGame from './pages/MultiPlayerGame';
+import SpectatorGame from './pages/SpectatorGame';
 import DarkModeToggle from './components/DarkModeToggle';
 
 // D&D Imports
@@ -14,6 +15,8 @@ import './styles/CardEffects.css';
 
 // Import Socket.IO client here, create a single instance
 import io from 'socket.io-client';
+import { randomShard } from './utils/sharding';
+import { loadCatalog } from './utils/catalog';
 
 // const SOCKET_SERVER_URL = 'http://127.0.0.1:5000';
 const SOCKET_SERVER_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:5000';
@@ -21,6 +24,7 @@ const socket = io(SOCKET_SERVER_URL, {
   transports: ['websocket', 'polling'],
   // No forceNew here, we want to maintain this single connection
   jsonp: false, 
+  query: { shard: randomShard() }, // Picks the backend worker behind the proxy (see utils/sharding.js)
   extraHeaders: {
     "X-Client-Type": "react-app"
   }
@@ -28,11 +32,20 @@ const socket = io(SOCKET_SERVER_URL, {
 
 function App() {
   const [isDarkMode, setIsDarkMode] = useState(false);
+  const [catalogError, setCatalogError] = useState(null);
+  const [catalogReady, setCatalogReady] = useState(false);
 
   useEffect(() => {
     document.body.classList.toggle('dark-mode', isDarkMode);
   }, [isDarkMode]);
 
+  // Game payloads only carry card and character ids, so the catalog must be in before any game renders
+  useEffect(() => {
+    loadCatalog(SOCKET_SERVER_URL)
+      .then(() => setCatalogReady(true))
+      .catch(error => setCatalogError(error.message));
+  }, []);
+
   // Connect socket when App mounts, disconnect when App unmounts
   useEffect(() => {
     socket.connect();
@@ -56,12 +69,17 @@ function App() {
       <DndProvider backend={HTML5Backend}>
         <div className={`App ${isDarkMode ? 'dark-mode' : 'light-mode'}`}>
           <DarkModeToggle isDarkMode={isDarkMode} setIsDarkMode={setIsDarkMode} />
-          <Routes>
-            <Route path="/" element={<MainMenu />} />
-            {/* Pass the single socket instance to Lobby and Game components */}
-            <Route path="/multiplayer-lobby" element={<MultiPlayerLobby socket={socket} />} />
-            <Route path="/multiplayer-game/:roomId" element={<MultiPlayerGame socket={socket} />} />
-          </Routes>
+          {catalogReady ? (
+            <Routes>
+              <Route path="/" element={<MainMenu />} />
+              {/* Pass the single socket instance to Lobby and Game components */}
+              <Route path="/multiplayer-lobby" element={<MultiPlayerLobby socket={socket} />} />
+              <Route path="/multiplayer-game/:roomId" element={<MultiPlayerGame socket={socket} />} />
+              <Route path="/spectate/:roomId" element={<SpectatorGame socket={socket} />} />
+            </Routes>
+          ) : (
+            <p className="loading-message">{catalogError || 'Loading cards...'}</p>
+          )}
         </div>
       </DndProvider>
     </Router>
@@ -4,6 +4,9 @@ import CharacterCard from '../components/CharacterCard';
 import HandCard from '../components/HandCard';
 import InformationPanel from '../components/InformationPanel';
 import PlayerZone from '../components/PlayerZone';
+import { applyStateDelta, withPrivateHand } from '../utils/stateSync';
+import { expandView } from '../utils/catalog';
+import { loadSession, saveSession, clearSession } from '../utils/session';
 import '../styles/Game.css';
 
 // Debounce utility function
@@ -36,6 +39,12 @@ function MultiPlayerGame({ socket }) {
 
   const [myPlayerId, setMyPlayerId] = useState(location.state?.playerId || null);
 
+  // Server's list of playable cards and their valid targets, for the revision it names
+  const [legalMoves, setLegalMoves] = useState(null);
+
+  // Latest applied state, so game_update deltas can be checked against its revision
+  const gameStateRef = useRef(null);
+
   // Derive isMyTurn from gameState
   const isMyTurn = gameState && gameState.current_turn === myPlayerId;
 
@@ -63,8 +72,13 @@ function MultiPlayerGame({ socket }) {
         return;
     }
 
-    if (location.state?.initialGameState && location.state?.playerId) {
-        setGameState(location.state.initialGameState);
+    const commitGameState = (newGameState) => {
+        gameStateRef.current = newGameState;
+        setGameState(newGameState);
+    };
+
+    if (location.state?.initialGameState && location.state?.playerId && !gameStateRef.current) {
+        commitGameState(location.state.initialGameState);
         setMyPlayerId(location.state.playerId);
         setMessage(location.state.initialGameState.message);
         setLogEntries(location.state.initialGameState.action_log || []);
@@ -75,14 +89,13 @@ function MultiPlayerGame({ socket }) {
     
     socket.on('game_start', (data) => {
         console.log("Game: Game start signal received. Setting state.", data);
-        const assignedPlayerId = Object.keys(data.initial_game_states).find(
-            playerId => data.initial_game_states[playerId].sid === socket.id
-        );
+        const assignedPlayerId = data.player_id;
         
         if (assignedPlayerId) {
+            saveSession(roomId, assignedPlayerId, data.resume_token);
             setMyPlayerId(assignedPlayerId);
-            const initialPlayerState = data.initial_game_states[assignedPlayerId].game_state;
-            setGameState(initialPlayerState);
+            const initialPlayerState = withPrivateHand(data.game_state, assignedPlayerId, data.hand);
+            commitGameState(initialPlayerState);
             setMessage(`Game started! It's ${initialPlayerState.current_turn === assignedPlayerId ? 'your' : initialPlayerState.players[initialPlayerState.current_turn].player_name + '\'s'} turn.`);
             setLogEntries(initialPlayerState.action_log || []);
             setSwapInProgress(initialPlayerState.swap_in_progress || false);
@@ -97,22 +110,22 @@ function MultiPlayerGame({ socket }) {
 
     socket.on('game_update', (data) => {
       console.log("Game update received:", data);
+      // Updates are sent to this socket only, so they always describe our own seat
+      const updateForPlayerId = data.player_id;
       if (!myPlayerId) {
-          console.warn("myPlayerId not set when game_update received. Attempting to infer from update.");
-          const inferredPlayerId = Object.keys(data.game_states_for_players).find(
-            playerId => data.game_states_for_players[playerId].sid === socket.id
-          );
-          if (inferredPlayerId) {
-            setMyPlayerId(inferredPlayerId);
-          } else {
-              console.error("Could not infer myPlayerId from game_update. Disconnecting.");
-              socket.disconnect();
-              navigate('/multiplayer-lobby');
-              return;
-          }
+          setMyPlayerId(updateForPlayerId);
       }
-      const updatedPlayerState = data.game_states_for_players[myPlayerId].game_state;
-      setGameState(updatedPlayerState);
+
+      const currentState = gameStateRef.current;
+      if (!currentState || currentState.revision !== data.base_revision) {
+          // Missed an update (or never had a base state): ask for the full view instead of guessing
+          console.warn(`Out of sync at revision ${currentState?.revision}, update is based on ${data.base_revision}. Requesting resync.`);
+          socket.emit('request_resync', { room_id: roomId, revision: currentState ? currentState.revision : null });
+          return;
+      }
+
+      const updatedPlayerState = applyStateDelta(currentState, data, updateForPlayerId);
+      commitGameState(updatedPlayerState);
 
       setSwapInProgress(updatedPlayerState.swap_in_progress || false);
       setSelectedCardsToSwap(updatedPlayerState.selected_cards_for_swap || []);
@@ -123,30 +136,116 @@ function MultiPlayerGame({ socket }) {
         setWinner(data.win_status.winner);
         setMessage(data.win_status.message);
       } else {
-        setMessage(data.message);
+        setMessage(updatedPlayerState.message);
       }
       setLogEntries(updatedPlayerState.action_log || []);
       setIsProcessing(false); 
     });
 
+    socket.on('game_resync', (data) => {
+      console.log("Game resync received:", data);
+      setMyPlayerId(data.player_id);
+      commitGameState(expandView(data.game_state));
+
+      setSwapInProgress(data.game_state.swap_in_progress || false);
+      setSelectedCardsToSwap(data.game_state.selected_cards_for_swap || []);
+      setPendingAttackDetails(data.game_state.pending_attack || null);
+
+      if (data.win_status.game_over) {
+        setGameOver(true);
+        setWinner(data.win_status.winner);
+        setMessage(data.win_status.message);
+      } else {
+        setMessage(data.game_state.message);
+      }
+      setLogEntries(data.game_state.action_log || []);
+      setIsProcessing(false);
+    });
+
+    socket.on('legal_moves', (data) => {
+      setLegalMoves(data);
+    });
+
     socket.on('player_disconnected', (data) => {
+      if (data.grace_seconds) {
+          setMessage(data.message); // Their seat is held; the game goes on
+          return;
+      }
       setMessage(`A player disconnected: ${data.message}. Returning to lobby...`);
       setTimeout(() => navigate('/multiplayer-lobby'), 3000);
     });
 
+    socket.on('player_reconnected', (data) => {
+      setMessage(data.message);
+    });
+
+    // After a dropped connection (or a reload) the socket has a new sid; reclaim our seat
+    // and get what we missed since the last revision we applied
+    const resumeSession = () => {
+      const session = loadSession(roomId);
+      if (!session) return;
+      socket.emit('resume_session', {
+          room_id: roomId,
+          player_id: session.playerId,
+          token: session.token,
+          revision: gameStateRef.current?.revision ?? null
+      });
+    };
+    socket.on('connect', resumeSession);
+    if (!gameStateRef.current && !location.state?.initialGameState && socket.connected) {
+        resumeSession();
+    }
+
+    socket.on('session_resumed', (data) => {
+      setMyPlayerId(data.player_id);
+      setMessage("Reconnected.");
+      setIsProcessing(false);
+    });
+
+    socket.on('resume_failed', (data) => {
+      clearSession(roomId);
+      setMessage(`${data.message} Returning to lobby...`);
+      setTimeout(() => navigate('/multiplayer-lobby'), 3000);
+    });
+
+    socket.on('room_closed', (data) => {
+      clearSession(roomId);
+      setMessage(`This room was closed (${data.reason}). Returning to lobby...`);
+      setTimeout(() => navigate('/multiplayer-lobby'), 3000);
+    });
+
     socket.on('error', (data) => {
       setMessage(`Game Error: ${data.message}`);
       setIsProcessing(false); 
+      if (data.code === 'stale_revision' && gameStateRef.current?.revision !== data.revision) {
+          // Our move was based on an old board; catch up in case the update got lost
+          socket.emit('request_resync', { room_id: roomId, revision: gameStateRef.current?.revision ?? null });
+      }
     });
 
     return () => {
       socket.off('game_start');
       socket.off('game_update');
+      socket.off('game_resync');
+      socket.off('legal_moves');
       socket.off('player_disconnected');
+      socket.off('player_reconnected');
+      socket.off('connect', resumeSession);
+      socket.off('session_resumed');
+      socket.off('resume_failed');
+      socket.off('room_closed');
       socket.off('error');
     };
   }, [roomId, navigate, socket, myPlayerId, location.state]);
 
+  // Fetch the valid moves whenever the board changes and we have something to decide
+  const revision = gameState?.revision;
+  const isDefending = pendingAttackDetails?.target_player_id === myPlayerId;
+  useEffect(() => {
+    if (!socket || revision === undefined || gameOver || !(isMyTurn || isDefending)) return;
+    socket.emit('get_legal_moves', { room_id: roomId });
+  }, [socket, roomId, revision, isMyTurn, isDefending, gameOver]);
+
   const handleCardDrop = useCallback((cardIndex, targetCharacterId, cardType, targetPlayerIdOfChar, playingPlayerId) => {
     if (isProcessing) { 
         setMessage("Please wait, an action is already being processed.");
@@ -167,12 +266,22 @@ function MultiPlayerGame({ socket }) {
         return; 
     }
 
+    if (legalMoves && legalMoves.revision === gameStateRef.current?.revision) {
+        // Known to be rejected; say so now instead of waiting for the server's error
+        const playable = legalMoves.cards.find((entry) => entry.card_index === cardIndex);
+        if (!playable || !playable.characters.includes(targetCharacterId)) {
+            setMessage("That card can't be played on that character.");
+            return;
+        }
+    }
+
     setIsProcessing(true); 
     setMessage("Playing card...");
 
     const finalTargetCharacterId = targetCharacterId || null; 
     socket.emit('play_card', {
         room_id: roomId,
+        revision: gameStateRef.current?.revision, // Lets the server reject moves chosen on an outdated board
         player_id: playingPlayerId,
         card_index: cardIndex,
         target_character_id: finalTargetCharacterId, 
@@ -180,7 +289,7 @@ function MultiPlayerGame({ socket }) {
         defending_card_index: null,
         target_player_for_thief_swap: targetPlayerIdOfChar // Pass the target player for potential Thief/Swap
     });
-  }, [roomId, gameState, gameOver, myPlayerId, swapInProgress, pendingAttackDetails, isProcessing, socket]);
+  }, [roomId, gameState, gameOver, myPlayerId, swapInProgress, pendingAttackDetails, isProcessing, socket, legalMoves]);
 
   const debouncedHandleCardDrop = useCallback(debounce(handleCardDrop, 300), [handleCardDrop]); 
 
@@ -208,6 +317,7 @@ function MultiPlayerGame({ socket }) {
         // Passing null for target_player_for_thief_swap lets backend choose for now.
         socket.emit('play_card', {
             room_id: roomId,
+            revision: gameStateRef.current?.revision,
             player_id: myPlayerId,
             card_index: cardIndex,
             target_character_id: null, 
@@ -324,6 +434,7 @@ function MultiPlayerGame({ socket }) {
 
       socket.emit('play_card', {
         room_id: roomId,
+        revision: gameStateRef.current?.revision,
         player_id: myPlayerId,
         card_index: swapCardPlayedIndex,
         target_character_id: null,
@@ -359,6 +470,7 @@ function MultiPlayerGame({ socket }) {
     setIsProcessing(true); 
     socket.emit('resolve_pending_attack', {
       room_id: roomId,
+      revision: gameStateRef.current?.revision,
       player_id: myPlayerId,
       useDefense: useDefense,
       defending_card_index: defendingCardIndex,
@@ -383,6 +495,7 @@ function MultiPlayerGame({ socket }) {
     setMessage("Ending your turn...");
     socket.emit('end_turn', {
         room_id: roomId,
+        revision: gameStateRef.current?.revision,
         player_id: myPlayerId,
     });
   }, [roomId, myPlayerId, gameState, gameOver, swapInProgress, pendingAttackDetails, isProcessing, socket]);
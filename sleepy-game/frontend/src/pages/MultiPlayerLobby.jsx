@@ -1,5 +1,8 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { withPrivateHand } from '../utils/stateSync';
+import { shardOfRoom, withShard } from '../utils/sharding';
+import { saveSession } from '../utils/session';
 import '../styles/MainMenu.css'; 
 
 function MultiPlayerLobby({ socket }) {
@@ -7,6 +10,7 @@ function MultiPlayerLobby({ socket }) {
   const [message, setMessage] = useState('');
   const [totalPlayers, setTotalPlayers] = useState(2); // Default to 2 players
   const [numBots, setNumBots] = useState(0); // Default to 0 bots
+  const [searching, setSearching] = useState(false); // Waiting in the matchmaking queue
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -24,27 +28,46 @@ function MultiPlayerLobby({ socket }) {
       setMessage(`Joined room ${data.room_id}. Waiting for game to start...`);
     });
 
+    socket.on('queued', (data) => {
+      const estimate = data.expected_wait_seconds != null ? ` Usual wait: ${Math.ceil(data.expected_wait_seconds)}s.` : '';
+      setMessage(`Looking for a ${data.total_players}-player game (${data.queue_depth} waiting)...${estimate}`);
+    });
+
+    socket.on('match_found', (data) => {
+      setSearching(false);
+      setMessage(`Match found! Starting room ${data.room_id}${data.num_bots ? ` with ${data.num_bots} bot(s)` : ''}...`);
+    });
+
+    socket.on('match_error', (data) => {
+      setSearching(false);
+      setMessage(`Matchmaking error: ${data.message}`);
+    });
+
     socket.on('game_start', (data) => {
         console.log("Lobby: Game start signal received. Navigating to game.", data);
-        const assignedPlayerId = Object.keys(data.initial_game_states).find(
-            playerId => data.initial_game_states[playerId].sid === socket.id
-        );
+        const assignedPlayerId = data.player_id;
         
         if (assignedPlayerId) {
+            saveSession(data.room_id, assignedPlayerId, data.resume_token);
             navigate(`/multiplayer-game/${data.room_id}`, { 
                 state: { 
                     playerId: assignedPlayerId,
-                    initialGameState: data.initial_game_states[assignedPlayerId].game_state
+                    initialGameState: withPrivateHand(data.game_state, assignedPlayerId, data.hand)
                 } 
             });
         } else {
             setMessage("Failed to determine your player ID. Returning to lobby.");
-            console.error("Lobby: Current socket.id not found in initial_game_states from game_start event.");
+            console.error("Lobby: player_id missing from game_start event.");
         }
     });
 
     socket.on('join_error', (data) => {
-      setMessage(`Error joining room: ${data.message}`);
+      if (data.shard !== undefined && data.room_id && socket.io.opts.query.shard !== data.shard) {
+        // Reached the wrong worker (e.g. shard count changed); retry on the one hosting the room
+        withShard(socket, data.shard, () => socket.emit('join_room', { room_id: data.room_id }));
+        return;
+      }
+      setMessage(`Error joining room: ${data.message}${data.can_spectate ? ' You can still watch it.' : ''}`);
     });
 
     socket.on('connect_error', (error) => {
@@ -57,6 +80,9 @@ function MultiPlayerLobby({ socket }) {
       socket.off('room_joined');
       socket.off('game_start'); 
       socket.off('join_error');
+      socket.off('queued');
+      socket.off('match_found');
+      socket.off('match_error');
       socket.off('connect_error');
     };
   }, [navigate, socket]);
@@ -66,10 +92,32 @@ function MultiPlayerLobby({ socket }) {
     socket.emit('create_room', { total_players: totalPlayers, num_bots: numBots });
   };
 
+  const handleFindMatch = () => {
+    // Number of Bots is the most bots we accept if no one else shows up in time
+    setSearching(true);
+    setMessage('Joining the matchmaking queue...');
+    socket.emit('find_match', { total_players: totalPlayers, max_bots: numBots });
+  };
+
+  const handleLeaveQueue = () => {
+    setSearching(false);
+    setMessage('Left the matchmaking queue.');
+    socket.emit('leave_queue', {});
+  };
+
   const handleJoinRoom = () => {
     if (roomId.trim()) {
-      setMessage(`Joining room ${roomId}...`);
-      socket.emit('join_room', { room_id: roomId.trim() });
+      const id = roomId.trim();
+      setMessage(`Joining room ${id}...`);
+      withShard(socket, shardOfRoom(id), () => socket.emit('join_room', { room_id: id }));
+    } else {
+      setMessage('Please enter a room ID.');
+    }
+  };
+
+  const handleWatchRoom = () => {
+    if (roomId.trim()) {
+      navigate(`/spectate/${roomId.trim()}`);
     } else {
       setMessage('Please enter a room ID.');
     }
@@ -111,6 +159,9 @@ function MultiPlayerLobby({ socket }) {
         </div>
 
         <button onClick={handleCreateRoom}>Create New Room</button>
+        {searching
+          ? <button onClick={handleLeaveQueue}>Cancel Search</button>
+          : <button onClick={handleFindMatch}>Find Match</button>}
         <div className="join-room-section">
           <input
             type="text"
@@ -120,6 +171,7 @@ function MultiPlayerLobby({ socket }) {
             className="room-input"
           />
           <button onClick={handleJoinRoom}>Join Room</button>
+          <button onClick={handleWatchRoom}>Watch Room</button>
         </div>
         {message && <p className="lobby-message">{message}</p>}
       </div>
@@ -0,0 +1,128 @@
+import React, { useState, useEffect, useCallback } from 'react';
+import { useParams, useNavigate } from 'react-router-dom';
+import InformationPanel from '../components/InformationPanel';
+import PlayerZone from '../components/PlayerZone';
+import { expandView } from '../utils/catalog';
+import { shardOfRoom, withShard } from '../utils/sharding';
+import '../styles/Game.css';
+
+// Read-only view of a room. The backend sends the public board (no hands) as whole
+// frames, rate-limited and possibly delayed (see backend/spectators.py), so there is
+// no delta bookkeeping here: each frame simply replaces the last one.
+function SpectatorGame({ socket }) {
+  const { roomId } = useParams();
+  const navigate = useNavigate();
+  const [gameState, setGameState] = useState(null);
+  const [winStatus, setWinStatus] = useState(null);
+  const [message, setMessage] = useState('Connecting to the game...');
+  const [information, setInformation] = useState({ name: 'Spectating', description: 'Click a character to see its details.' });
+
+  useEffect(() => {
+    if (!socket) {
+      setMessage("Socket connection not available. Please restart the app.");
+      return;
+    }
+
+    const spectate = () => socket.emit('spectate_room', { room_id: roomId });
+
+    socket.on('spectating', (data) => {
+      setMessage(data.delay_seconds > 0 ? `Watching with a ${data.delay_seconds} second delay.` : 'Watching live.');
+    });
+
+    socket.on('spectator_update', (data) => {
+      setGameState(expandView(data.game_state));
+      setWinStatus(data.win_status);
+    });
+
+    socket.on('spectate_error', (data) => {
+      if (data.shard !== undefined && socket.io.opts.query.shard !== data.shard) {
+        withShard(socket, data.shard, spectate);
+        return;
+      }
+      setMessage(`Cannot watch room ${roomId}: ${data.message}`);
+    });
+
+    socket.on('room_closed', () => {
+      setMessage('This room has closed.');
+    });
+
+    withShard(socket, shardOfRoom(roomId), spectate);
+
+    return () => {
+      socket.emit('stop_spectating', { room_id: roomId });
+      socket.off('spectating');
+      socket.off('spectator_update');
+      socket.off('spectate_error');
+      socket.off('room_closed');
+    };
+  }, [roomId, socket]);
+
+  const handleCharacterClick = useCallback((characterId) => {
+    for (const player of Object.values(gameState.players)) {
+      const character = player.characters.find(char => char.id === characterId);
+      if (character) {
+        setInformation({
+          name: character.name,
+          age: `${character.age} years old`,
+          description: `${character.description || ''} Current Sleep: ${character.current_sleep}/${character.max_sleep}. (Owner: ${player.player_name})`
+        });
+        return;
+      }
+    }
+  }, [gameState]);
+
+  if (!gameState) {
+    return (
+      <div className="game-container loading">
+        <p>{message}</p>
+        <button onClick={() => navigate('/multiplayer-lobby')} className="back-button">Back to Lobby</button>
+      </div>
+    );
+  }
+
+  const allPlayers = Object.values(gameState.players).sort((a, b) =>
+    gameState.player_turn_order.indexOf(a.player_id) - gameState.player_turn_order.indexOf(b.player_id));
+
+  return (
+    <div className="game-container">
+      <div className="game-board-area">
+        <div className={`game-board game-board--${allPlayers.length}-players`}>
+          {allPlayers.map(player => (
+            <PlayerZone
+              key={player.player_id}
+              player={`${player.player_name} ${player.is_bot ? '(AI)' : ''}`}
+              characters={player.characters}
+              sleepCount={player.sleep_count}
+              handSize={player.hand_size || 0}
+              onCharacterClick={handleCharacterClick}
+              onCardDrop={() => {}}
+              isCurrentTurn={gameState.current_turn === player.player_id}
+              isOpponentZone={true}
+              myPlayerId={null}
+              currentTurnPlayerId={gameState.current_turn}
+              swapInProgress={false}
+            />
+          ))}
+        </div>
+
+        <div className="info-and-log-area-combined">
+          <InformationPanel info={information} />
+          <div className="game-messages-area">
+            <h2>Game Log</h2>
+            <p>{message}</p>
+            <p className="opponent-turn">{gameState.message}</p>
+            <div className="action-log-display">
+              {(gameState.action_log || []).slice().reverse().map((log, index) => (
+                <p key={`log-${index}`} className="log-entry">{log}</p>
+              ))}
+            </div>
+            {winStatus?.game_over && <h2 className="game-over-message">{winStatus.message}</h2>}
+            <button onClick={() => navigate('/multiplayer-lobby')} className="back-button">Back to Lobby</button>
+          </div>
+        </div>
+      </div>
+    </div>
+  );
+}
+
+export default SpectatorGame;
@@ -0,0 +1,36 @@
+// Game payloads refer to cards and characters by id (see backend/catalog.py); their
+// names, descriptions and effects come from the backend's /catalog once per page load.
+// The helpers below turn ids back into the full objects the components render.
+let catalog = null;
+
+export async function loadCatalog(backendUrl) {
+  if (!catalog) {
+    // no-cache on the backend: the browser revalidates with the ETag and usually gets a 304
+    const response = await fetch(`${backendUrl}/catalog`);
+    if (!response.ok) {
+      throw new Error(`Could not load the card catalog (HTTP ${response.status}).`);
+    }
+    catalog = await response.json();
+  }
+  return catalog;
+}
+
+// Already-expanded entries pass through, so expanding twice is harmless
+export function expandHand(hand) {
+  return hand && hand.map(card => (typeof card === 'number' ? catalog.cards[card] : card));
+}
+
+export function expandCharacter(character) {
+  return { ...catalog.characters[character.template_id], ...character };
+}
+
+export function expandView(gameState) {
+  const players = {};
+  for (const [playerId, player] of Object.entries(gameState.players)) {
+    players[playerId] = { ...player, characters: player.characters.map(expandCharacter) };
+    if (player.hand) {
+      players[playerId].hand = expandHand(player.hand);
+    }
+  }
+  return { ...gameState, players };
+}
@@ -0,0 +1,21 @@
+// Resume tokens handed out with game_start (see backend resume_session). Kept per tab,
+// so a dropped connection or a page reload can reclaim the same seat.
+const keyFor = (roomId) => `sleepy-game-session-${roomId}`;
+
+export function saveSession(roomId, playerId, token) {
+  if (token) {
+    sessionStorage.setItem(keyFor(roomId), JSON.stringify({ playerId, token }));
+  }
+}
+
+export function loadSession(roomId) {
+  try {
+    return JSON.parse(sessionStorage.getItem(keyFor(roomId)));
+  } catch (e) {
+    return null;
+  }
+}
+
+export function clearSession(roomId) {
+  sessionStorage.removeItem(keyFor(roomId));
+}
@@ -0,0 +1,26 @@
+// Rooms are spread over several backend workers (see backend/sharding.py). A room id
+// says which worker hosts it (room id % shard count), and the proxy routes a socket by
+// its ?shard= query parameter, so joining a room may mean reconnecting to its shard.
+export const SHARD_COUNT = Number(process.env.REACT_APP_SHARD_COUNT || 1);
+
+// New sockets land on a random shard; rooms created there belong to it
+export function randomShard() {
+  return Math.floor(Math.random() * SHARD_COUNT);
+}
+
+export function shardOfRoom(roomId) {
+  const id = Number(roomId);
+  return Number.isInteger(id) ? id % SHARD_COUNT : null;
+}
+
+// Reconnects the socket to the given shard if it is not already there, then calls onReady
+export function withShard(socket, shard, onReady) {
+  if (shard === null || socket.io.opts.query.shard === shard) {
+    onReady();
+    return;
+  }
+  socket.io.opts.query = { ...socket.io.opts.query, shard };
+  socket.once('connect', onReady);
+  socket.disconnect();
+  socket.connect();
+}
@@ -0,0 +1,41 @@
+import { expandCharacter, expandHand, expandView } from './catalog';
+
+// Applies a game_update delta from the backend (see backend/state_sync.py) on top of
+// the last known player view. Returns a new object so React picks up the change.
+export function applyStateDelta(gameState, update, myPlayerId) {
+  const delta = update.delta;
+  const nextState = {
+    ...gameState,
+    ...delta.fields,
+    revision: update.revision,
+    players: { ...gameState.players },
+    action_log: [...(gameState.action_log || []), ...(delta.action_log || [])],
+    action_log_total: delta.action_log_total,
+  };
+
+  for (const [playerId, summary] of Object.entries(delta.players || {})) {
+    nextState.players[playerId] = { ...nextState.players[playerId], ...summary };
+  }
+
+  for (const compact of delta.characters || []) {
+    const character = expandCharacter(compact);
+    const owner = nextState.players[character.player_id];
+    nextState.players[character.player_id] = {
+      ...owner,
+      characters: owner.characters.map(char => (char.id === character.id ? character : char)),
+    };
+  }
+
+  if (update.hand) {
+    nextState.players[myPlayerId] = { ...nextState.players[myPlayerId], hand: expandHand(update.hand) };
+  }
+
+  return nextState;
+}
+
+// game_start sends the public board shared by everyone plus the receiving player's hand
+export function withPrivateHand(publicGameState, myPlayerId, hand) {
+  const gameState = expandView(publicGameState);
+  gameState.players[myPlayerId] = { ...gameState.players[myPlayerId], hand: expandHand(hand) };
+  return gameState;
+}